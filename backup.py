@@ -0,0 +1,151 @@
+import os
+import sqlite3
+from datetime import datetime
+
+from connection import ConnectionManager
+from database import DatabaseCRUD
+
+# snapshots go to this directory next to the database unless a backup location is set
+BACKUP_DIR_NAME = "backups"
+# pages copied per backup step (4 MB with the default page size); every step reports progress
+# and checks for cancellation
+BACKUP_STEP_PAGES = 1024
+
+# raised from the backup progress callback to abort the copy
+class BackupCancelled(Exception):
+    pass
+
+def backup_directory(db_name, location=None):
+    return location or os.path.join(os.path.dirname(os.path.abspath(db_name)), BACKUP_DIR_NAME)
+
+# snapshots of db_name in directory, newest first; names hold the time they were taken
+def list_backups(db_name, directory):
+    prefix = os.path.splitext(os.path.basename(db_name))[0] + "-"
+    try:
+        names = [name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith(".db")]
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, name) for name in sorted(names, reverse=True)]
+
+# copy db_name into a new snapshot in directory while other connections keep writing,
+# then delete all but the newest `keep` snapshots; progress(copied_pages, total_pages) is called
+# after every step and cancel is a threading.Event checked between steps
+# returns the snapshot path, None when cancelled or failed
+def create_backup(db_name, directory, keep=None, progress=None, cancel=None):
+    now = datetime.now()
+    stem = os.path.splitext(os.path.basename(db_name))[0]
+    path = os.path.join(directory, f"{stem}-{now.strftime('%Y%m%d-%H%M%S')}-{now.microsecond // 1000:03d}.db")
+    partial = path + ".partial"
+    source = target = None
+
+    def step(status, remaining, total):
+        if cancel is not None and cancel.is_set():
+            raise BackupCancelled()
+        if progress:
+            progress(total - remaining, total)
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # a separate connection, so the shared one stays free for the app; its read transaction
+        # pins one WAL snapshot for the whole copy. without it every commit by another
+        # connection restarts the backup, and frequent edits would keep it from ever finishing
+        source = sqlite3.connect(db_name, timeout=ConnectionManager.BUSY_TIMEOUT, isolation_level=None)
+        source.execute('BEGIN')
+        source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        target = sqlite3.connect(partial)
+        source.backup(target, pages=BACKUP_STEP_PAGES, progress=step)
+        source.execute('COMMIT')
+        # a single self-contained file
+        target.execute('PRAGMA journal_mode=DELETE')
+        target.close()
+        target = None
+        os.replace(partial, path)
+    except BackupCancelled:
+        return None
+    except (sqlite3.Error, OSError) as e:
+        print(f"Error creating backup: {e}")
+        return None
+    finally:
+        if target is not None:
+            target.close()
+        if source is not None:
+            source.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+    if keep:
+        rotate_backups(db_name, directory, keep)
+    return path
+
+# delete all but the newest `keep` snapshots, returns the deleted paths
+def rotate_backups(db_name, directory, keep):
+    removed = []
+    for path in list_backups(db_name, directory)[keep:]:
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError as e:
+            print(f"Error removing old backup: {e}")
+    return removed
+
+# whether path is an intact notes database, checked read-only
+def check_backup(path):
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        print(f"Error opening backup: {e}")
+        return False
+    try:
+        problems = [row[0] for row in conn.execute('PRAGMA integrity_check')]
+        if problems != ['ok']:
+            print(f"Backup failed the integrity check: {'; '.join(problems[:10])}")
+            return False
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes'").fetchone() is None:
+            print("Backup is not a notes database")
+            return False
+        return True
+    except sqlite3.Error as e:
+        print(f"Error checking backup: {e}")
+        return False
+    finally:
+        conn.close()
+
+# replace the contents of the database with the snapshot at path once it passed the integrity
+# check; the current contents are backed up to directory first, so the restore can be undone,
+# and all but the newest `keep` snapshots are deleted once the restore no longer reads path
+# (which may itself be the oldest one); snapshots of older schema versions are migrated afterwards
+def restore_backup(path, directory=None, progress=None, keep=None):
+    if not check_backup(path):
+        return False
+    if directory is not None and create_backup(DatabaseCRUD.DB_NAME, directory) is None:
+        return False
+    try:
+        return _restore_from(path, progress)
+    finally:
+        if directory is not None and keep:
+            rotate_backups(DatabaseCRUD.DB_NAME, directory, keep)
+
+def _restore_from(path, progress):
+    try:
+        source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        print(f"Error opening backup: {e}")
+        return False
+    conn = DatabaseCRUD._get_connection()
+    if conn:
+        try:
+            source.backup(conn, pages=BACKUP_STEP_PAGES,
+                          progress=lambda status, remaining, total: progress and progress(total - remaining, total))
+            if conn.execute('PRAGMA quick_check').fetchone()[0] != 'ok':
+                print("Restored database failed the integrity check")
+                return False
+            # cached notes and change sequence numbers belong to the replaced contents
+            DatabaseCRUD.close()
+        except sqlite3.Error as e:
+            print(f"Error restoring backup: {e}")
+            return False
+        finally:
+            DatabaseCRUD._release_connection()
+            source.close()
+        return bool(DatabaseCRUD.initialize_database())
+    source.close()
+    return False
@@ -0,0 +1,72 @@
+# time an online backup and a restore, and how much a backup running on another thread slows
+# down note edits made meanwhile (the edit latency is what the editor waits for on save)
+# run from the repository root: python -m benchmarks.bench_backup --sizes 100000 1000000
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from backup import create_backup, restore_backup
+from benchmarks.corpus import seed_database
+from database import DatabaseCRUD
+
+# milliseconds of every edit_note call made until stop is set
+def edit_latencies(note_count, stop, seed, limit=None):
+    rng = random.Random(seed)
+    latencies = []
+    while not stop.is_set() and (limit is None or len(latencies) < limit):
+        note_id = rng.randint(1, note_count)
+        start = time.perf_counter()
+        DatabaseCRUD.edit_note(note_id, f"edited {len(latencies)}", f"content {rng.random()}")
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)
+    return latencies
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Online backup benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--content-median", type=int, default=1000, help="median note length in characters")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    print(f"{'notes':>9}{'MB':>8}{'backup s':>10}{'MB/s':>8}{'restore s':>11}"
+          f"{'edits':>7}{'p50 ms':>8}{'p99 ms':>8}{'max ms':>8}{'idle p99':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            DatabaseCRUD.DB_NAME = os.path.join(tmp, "notes.db")
+            directory = os.path.join(tmp, "backups")
+            DatabaseCRUD.initialize_database()
+            seed_database(size, args.seed, content_median=args.content_median)
+            megabytes = os.path.getsize(DatabaseCRUD.DB_NAME) / 1048576
+
+            idle = edit_latencies(size, threading.Event(), args.seed, limit=200)
+
+            stop = threading.Event()
+            result = []
+            def run_backup():
+                start = time.perf_counter()
+                result.append(create_backup(DatabaseCRUD.DB_NAME, directory))
+                result.append(time.perf_counter() - start)
+                stop.set()
+            thread = threading.Thread(target=run_backup)
+            thread.start()
+            busy = edit_latencies(size, stop, args.seed + 1)
+            thread.join()
+            path, backup_time = result
+
+            start = time.perf_counter()
+            restore_backup(path)
+            restore_time = time.perf_counter() - start
+            DatabaseCRUD.close()
+        print(f"{size:>9}{megabytes:>8.0f}{backup_time:>10.1f}{megabytes / backup_time:>8.0f}{restore_time:>11.1f}"
+              f"{len(busy):>7}{percentile(busy, 0.5):>8.2f}{percentile(busy, 0.99):>8.2f}{max(busy, default=0):>8.2f}"
+              f"{percentile(idle, 0.99):>10.2f}")
+
+if __name__ == "__main__":
+    main()
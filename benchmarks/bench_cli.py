@@ -0,0 +1,83 @@
+# wall time of cli.py invocations (interpreter start, imports, opening the database and the
+# command itself), next to a bare interpreter, and a check that no GUI or numpy module is loaded
+# run from the repository root: python -m benchmarks.bench_cli --notes 100000 --runs 20
+# measured with 20000 notes and 30 runs per command: p50 45-70 ms (stats, get, list, search,
+# add, edit) and max 70-90 ms, next to 12-18 ms for a bare interpreter; on a slower machine,
+# search at p50 119 ms and add at up to 128 ms. the time goes almost all to interpreter start
+# and imports (sqlite3, re, json, argparse); initialize_database takes under 1 ms on a current
+# database and applying the stored profile under 0.1 ms, the query itself a few ms
+import argparse
+import compileall
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import seed_database
+from database import DatabaseCRUD
+
+CLI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cli.py")
+# modules the command-line interface must not pull in
+HEAVY_MODULES = ('tkinter', 'ttkbootstrap', 'numpy')
+
+def wall_times(command, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+# modules from HEAVY_MODULES that are loaded after running the CLI with argv in-process
+def loaded_heavy_modules(db_name, argv):
+    script = (f"import sys, contextlib, io; sys.path.insert(0, {os.path.dirname(CLI)!r}); import cli\n"
+              f"with contextlib.redirect_stdout(io.StringIO()): cli.main({['--db', db_name] + argv!r})\n"
+              f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    return subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout.split()
+
+def main():
+    parser = argparse.ArgumentParser(description="Command-line interface startup benchmark")
+    parser.add_argument("--notes", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    # up-to-date bytecode first: with PYTHONDONTWRITEBYTECODE set, every module edited since the
+    # last compile would otherwise be compiled again in each run (about 20 ms for database.py)
+    compileall.compile_dir(os.path.dirname(CLI), maxlevels=0, quiet=1)
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        DatabaseCRUD.DB_NAME = os.path.join(tmp, "notes.db")
+        DatabaseCRUD.initialize_database()
+        seed_database(args.notes, args.seed)
+        DatabaseCRUD.close()
+        note_id = str(rng.randint(1, args.notes))
+        commands = {
+            'stats': ['stats'],
+            'get': ['get', note_id],
+            'list 100': ['list', '--limit', '100'],
+            'search': ['search', DatabaseCRUD.get_note(int(note_id))['title'].split()[0]],
+            'add': ['add', 'benchmark', '--content', 'text'],
+            'edit': ['edit', note_id, '--content', 'edited'],
+        }
+        DatabaseCRUD.close()
+
+        print(f"{'command':<12}{'p50 ms':>9}{'min ms':>9}{'max ms':>9}")
+        baseline = wall_times([sys.executable, "-c", "pass"], args.runs)
+        print(f"{'(python)':<12}{statistics.median(baseline):>9.1f}{min(baseline):>9.1f}{max(baseline):>9.1f}")
+        for name, argv in commands.items():
+            times = wall_times([sys.executable, CLI, "--db", DatabaseCRUD.DB_NAME] + argv, args.runs)
+            print(f"{name:<12}{statistics.median(times):>9.1f}{min(times):>9.1f}{max(times):>9.1f}")
+
+        heavy = set()
+        for argv in commands.values():
+            heavy.update(loaded_heavy_modules(DatabaseCRUD.DB_NAME, argv))
+        print(f"heavy modules loaded: {', '.join(sorted(heavy)) or 'none'}")
+        if heavy:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# database size and read/write latency of note content stored plain, zlib or lzma
+# run from the repository root: python -m benchmarks.bench_compression
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from database import DatabaseCRUD
+
+LEVELS = ["INFO", "DEBUG", "WARN", "ERROR"]
+COMPONENTS = ["scheduler", "db.pool", "http.server", "cache", "auth", "worker-3"]
+
+# pasted-log style note between min_size and max_size bytes
+def log_note(rng, min_size, max_size):
+    target = rng.randint(min_size, max_size)
+    lines = []
+    size = 0
+    while size < target:
+        line = (f"2024-05-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d} "
+                f"{rng.choice(LEVELS)} [{rng.choice(COMPONENTS)}] request {rng.randint(1, 99999)} took {rng.randint(1, 900)}ms")
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+def database_size(path):
+    conn = DatabaseCRUD._get_connection()
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        DatabaseCRUD._release_connection()
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+
+def main():
+    parser = argparse.ArgumentParser(description="Note compression benchmark")
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--min-size", type=int, default=1000)
+    parser.add_argument("--max-size", type=int, default=200000)
+    parser.add_argument("--threshold", type=int, default=DatabaseCRUD.COMPRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    corpus = [log_note(rng, args.min_size, args.max_size) for _ in range(args.notes)]
+    raw_bytes = sum(len(content.encode("utf-8")) for content in corpus)
+    print(f"{args.notes} notes, {raw_bytes / 1024 / 1024:.1f} MiB of text, threshold {args.threshold} bytes")
+    print(f"{'codec':<8}{'db MiB':>10}{'ratio':>8}{'write ms':>11}{'read ms':>10}")
+
+    baseline_size = None
+    for codec in (None, 'zlib', 'lzma'):
+        DatabaseCRUD.COMPRESSION_CODEC = codec
+        DatabaseCRUD.COMPRESSION_THRESHOLD = args.threshold
+        with tempfile.TemporaryDirectory() as tmp:
+            DatabaseCRUD.DB_NAME = os.path.join(tmp, "bench.db")
+            DatabaseCRUD.initialize_database()
+
+            start = time.perf_counter()
+            ids = [DatabaseCRUD.add_note(f"Log {i}", content) for i, content in enumerate(corpus)]
+            write_ms = (time.perf_counter() - start) * 1000 / len(ids)
+
+            start = time.perf_counter()
+            for note_id in ids:
+                DatabaseCRUD.get_note(note_id)
+            read_ms = (time.perf_counter() - start) * 1000 / len(ids)
+
+            size = database_size(DatabaseCRUD.DB_NAME)
+            baseline_size = baseline_size or size
+            print(f"{codec or 'plain':<8}{size / 1024 / 1024:>10.1f}{baseline_size / size:>8.2f}{write_ms:>11.2f}{read_ms:>10.3f}")
+            DatabaseCRUD.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# compare DatabaseCRUD calls per second with the old connect-per-call
+# behaviour and the shared persistent connection
+# run from the repository root: python -m benchmarks.bench_connection
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from benchmarks.corpus import seed_database
+from compression import decompress_content
+from database import DatabaseCRUD
+
+# the query get_note runs, decompressing in Python so it works on a plain connection;
+# both sides run it, so they differ only in how they get their connection. DatabaseCRUD.get_note
+# itself is not timed: after the first call it is answered from the note cache
+def read_note(conn, note_id):
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT id, title, content, codec, date_added, date_last_edited FROM notes WHERE id = ?
+    ''', (note_id,))
+    row = cursor.fetchone()
+    if not row:
+        return None
+    columns = ['id', 'title', 'content', 'date_added', 'date_last_edited']
+    return dict(zip(columns, (row[0], row[1], decompress_content(row[2], row[3]), row[4], row[5])))
+
+# replica of the pre-pooling access pattern: open, query, close on every call
+def legacy_get_note(note_id):
+    conn = sqlite3.connect(DatabaseCRUD.DB_NAME)
+    try:
+        return read_note(conn, note_id)
+    finally:
+        conn.close()
+
+def shared_get_note(note_id):
+    conn = DatabaseCRUD._get_connection()
+    try:
+        return read_note(conn, note_id)
+    finally:
+        DatabaseCRUD._release_connection()
+
+def legacy_get_font_size():
+    conn = sqlite3.connect(DatabaseCRUD.DB_NAME)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT font_size FROM settings WHERE id = 1')
+        result = cursor.fetchone()
+        return result[0] if result else False
+    finally:
+        conn.close()
+
+def calls_per_second(func, note_count, seconds):
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        func(calls % note_count + 1)
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Connection pooling benchmark")
+    parser.add_argument("--notes", type=int, default=50000)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        DatabaseCRUD.DB_NAME = os.path.join(tmp, "bench.db")
+        DatabaseCRUD.initialize_database()
+        seed_database(args.notes)
+
+        cases = [
+            ("get_note", legacy_get_note, shared_get_note),
+            ("get_font_size", lambda _: legacy_get_font_size(), lambda _: DatabaseCRUD.get_font_size()),
+        ]
+        print(f"{args.notes} notes, {args.seconds:.1f}s per case")
+        print(f"{'call':<16}{'before/s':>12}{'after/s':>12}{'speedup':>10}")
+        for name, before, after in cases:
+            before_rate = calls_per_second(before, args.notes, args.seconds)
+            after_rate = calls_per_second(after, args.notes, args.seconds)
+            print(f"{name:<16}{before_rate:>12.0f}{after_rate:>12.0f}{after_rate / before_rate:>9.1f}x")
+        DatabaseCRUD.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# time signature backfill and corpus-wide near-duplicate detection, with planted copies
+# of some notes (a few words changed) to measure how many of them are found
+# run from the repository root: python -m benchmarks.bench_dedup --sizes 100000 500000
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.corpus import generate_notes
+from database import DatabaseCRUD
+
+# every note is followed by an edited copy with this probability
+DUPLICATE_SHARE = 0.01
+# share of the copy's words that are replaced
+EDIT_SHARE = 0.02
+
+# the corpus with planted copies; returns the notes and the (original, copy) position pairs
+def corpus_with_duplicates(size, seed):
+    rng = random.Random(seed)
+    notes = []
+    pairs = []
+    for note in generate_notes(size, seed, content_median=600, content_sigma=0.6):
+        notes.append(note)
+        if rng.random() < DUPLICATE_SHARE and len(notes) < size:
+            words = note['content'].split()
+            for _ in range(max(1, int(len(words) * EDIT_SHARE))):
+                words[rng.randrange(len(words))] = "edited"
+            notes.append(dict(note, content=" ".join(words)))
+            pairs.append((len(notes) - 1, len(notes)))
+    return notes[:size], [pair for pair in pairs if pair[1] <= size]
+
+def main():
+    parser = argparse.ArgumentParser(description="Near-duplicate detection benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    print(f"{'notes':>9}{'index s':>10}{'notes/s':>10}{'dedup s':>10}{'groups':>9}{'planted':>9}{'found':>8}{'similar ms':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            DatabaseCRUD.DB_NAME = os.path.join(tmp, "bench.db")
+            DatabaseCRUD.initialize_database()
+            notes, pairs = corpus_with_duplicates(size, args.seed)
+            # ids follow the import order in an empty database
+            DatabaseCRUD.import_notes(notes, batch_size=10000)
+
+            start = time.perf_counter()
+            DatabaseCRUD.index_signatures()
+            index_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            groups = DatabaseCRUD.find_duplicates(args.threshold)
+            dedup_time = time.perf_counter() - start
+            grouped = {note_id: i for i, group in enumerate(groups) for note_id in group}
+            found = sum(1 for a, b in pairs if a in grouped and grouped.get(b) == grouped[a])
+
+            latencies = []
+            for note_id, _ in pairs[:50]:
+                start = time.perf_counter()
+                DatabaseCRUD.find_similar_notes(note_id)
+                latencies.append((time.perf_counter() - start) * 1000)
+            similar_ms = sorted(latencies)[len(latencies) // 2] if latencies else 0.0
+            DatabaseCRUD.close()
+        print(f"{size:>9}{index_time:>10.1f}{size / index_time:>10.0f}{dedup_time:>10.1f}{len(groups):>9}"
+              f"{len(pairs):>9}{found:>8}{similar_ms:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# time streaming bulk import/export against one add_note call per note
+# run from the repository root: python -m benchmarks.bench_import
+import argparse
+import io
+import os
+import resource
+import tempfile
+import time
+
+import bulk_io
+from database import DatabaseCRUD
+
+def generate_notes(count, content_size):
+    for i in range(count):
+        yield {'title': f"Imported note {i}", 'content': f"line {i} " + "x" * content_size}
+
+def max_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# discards output so export timing measures reading and serialising only
+class NullWriter(io.TextIOBase):
+    def write(self, text):
+        return len(text)
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import/export benchmark")
+    parser.add_argument("--notes", type=int, default=1000000)
+    parser.add_argument("--content-size", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--single-sample", type=int, default=2000, help="notes added one by one for comparison")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        DatabaseCRUD.DB_NAME = os.path.join(tmp, "bench.db")
+        DatabaseCRUD.initialize_database()
+
+        start = time.perf_counter()
+        for note in generate_notes(args.single_sample, args.content_size):
+            DatabaseCRUD.add_note(note['title'], note['content'])
+        single_rate = args.single_sample / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        imported = DatabaseCRUD.import_notes(generate_notes(args.notes, args.content_size), args.batch_size)
+        import_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exported = bulk_io.export_notes(NullWriter(), 'jsonl')
+        export_seconds = time.perf_counter() - start
+
+        print(f"add_note one by one:  {single_rate:>10.0f} notes/s (estimated {args.notes / single_rate:.0f}s for {args.notes})")
+        print(f"import_notes:         {imported / import_seconds:>10.0f} notes/s ({import_seconds:.1f}s for {imported})")
+        print(f"export_notes (jsonl): {exported / export_seconds:>10.0f} notes/s ({export_seconds:.1f}s for {exported})")
+        print(f"peak RSS:             {max_rss_mib():>10.0f} MiB")
+        DatabaseCRUD.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# time opening the notes list: full get_notes() versus the first keyset page
+# run from the repository root: python -m benchmarks.bench_listing
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.corpus import seed_database
+from database import DatabaseCRUD
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed_ms, peak / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description="Notes listing benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--content-size", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'notes':>10}{'get_notes ms':>15}{'peak KiB':>12}{'first page ms':>16}{'peak KiB':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            DatabaseCRUD.DB_NAME = os.path.join(tmp, "bench.db")
+            DatabaseCRUD.initialize_database()
+            seed_database(size, content_median=args.content_size, content_sigma=0.5)
+            full_ms, full_kib = measure(DatabaseCRUD.get_notes)
+            page_ms, page_kib = measure(lambda: DatabaseCRUD.get_notes_page(limit=args.page_size))
+            print(f"{size:>10}{full_ms:>15.1f}{full_kib:>12.0f}{page_ms:>16.2f}{page_kib:>12.0f}")
+            DatabaseCRUD.close()
+
+if __name__ == "__main__":
+    main()
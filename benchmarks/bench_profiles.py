@@ -0,0 +1,31 @@
+# compare the connection performance profiles (safe, balanced, fast) on this machine,
+# the same measurement the settings window runs
+# run from the repository root: python -m benchmarks.bench_profiles --dir /path/on/the/disk/to/test
+import argparse
+
+from connection import ConnectionManager
+from profile_benchmark import PHASES, format_results, run_profile_benchmark
+
+def main():
+    parser = argparse.ArgumentParser(description="Performance profile benchmark")
+    parser.add_argument("--profiles", nargs="+", choices=list(ConnectionManager.PROFILES), default=None)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--notes", type=int, default=3000)
+    parser.add_argument("--commits", type=int, default=200)
+    parser.add_argument("--reads", type=int, default=10000)
+    parser.add_argument("--dir", default=None, help="where the temporary databases go (default: next to notes.db)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for phase, description in PHASES.items():
+        print(f"{phase:<12}  {description}")
+    print()
+    results = run_profile_benchmark(args.profiles, args.rounds, args.notes, args.commits, args.reads, args.dir, args.seed,
+                                    progress=lambda done, total: print(f"\rrun {done}/{total}", end=""))
+    print()
+    if results is None:
+        raise SystemExit(1)
+    print(format_results(results))
+
+if __name__ == "__main__":
+    main()
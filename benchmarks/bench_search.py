@@ -0,0 +1,58 @@
+# compare DatabaseCRUD.search_notes (FTS5) with a full-table LIKE scan
+# run from the repository root: python -m benchmarks.bench_search
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.corpus import make_vocabulary
+from database import DatabaseCRUD
+
+def seed(note_count, rng, words, weights):
+    DatabaseCRUD.import_notes({'title': " ".join(rng.choices(words, weights, k=3)),
+                               'content': " ".join(rng.choices(words, weights, k=80)) + f" token{i}"}
+                              for i in range(note_count))
+
+def like_search(query, limit):
+    conn = DatabaseCRUD._get_connection()
+    try:
+        pattern = f"%{query}%"
+        cursor = conn.execute('SELECT id, title FROM notes WHERE title LIKE ? OR content LIKE ? LIMIT ?', (pattern, pattern, limit))
+        return cursor.fetchall()
+    finally:
+        DatabaseCRUD._release_connection()
+
+def average_ms(func, queries, limit):
+    start = time.perf_counter()
+    for query in queries:
+        func(query, limit)
+    return (time.perf_counter() - start) * 1000 / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description="Full-text search benchmark")
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        DatabaseCRUD.DB_NAME = os.path.join(tmp, "bench.db")
+        DatabaseCRUD.initialize_database()
+        words, weights = make_vocabulary(rng)
+        seed(args.notes, rng, words, weights)
+
+        # unique terms hit one note, typical terms come from the middle of the frequency range
+        rare = [f"token{rng.randrange(args.notes)}" for _ in range(args.queries)]
+        common = [rng.choice(words[50:500]) for _ in range(args.queries)]
+        print(f"{args.notes} notes, {args.queries} queries per case, limit {args.limit}")
+        print(f"{'query':<10}{'LIKE ms':>12}{'FTS5 ms':>12}")
+        for name, queries in (("rare", rare), ("common", common)):
+            like_ms = average_ms(like_search, queries, args.limit)
+            fts_ms = average_ms(DatabaseCRUD.search_notes, queries, args.limit)
+            print(f"{name:<10}{like_ms:>12.2f}{fts_ms:>12.2f}")
+        DatabaseCRUD.close()
+
+if __name__ == "__main__":
+    main()
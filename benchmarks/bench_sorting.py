@@ -0,0 +1,73 @@
+# time the notes list in every sort order (first page and a page deep into the list),
+# and the conversion of a database with pre-6 string timestamps against its dry-run estimate
+# run from the repository root: python -m benchmarks.bench_sorting --sizes 100000 1000000
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.corpus import seed_database
+from database import DatabaseCRUD
+from note_list import SORT_FIELDS
+
+# turn the seeded database back into what schema version 5 stored
+def make_legacy():
+    conn = DatabaseCRUD._get_connection()
+    try:
+        for name in DatabaseCRUD.LIST_INDEXES:
+            conn.execute(f'DROP INDEX {name}')
+        conn.execute("DROP TRIGGER note_changes_update")
+        conn.execute('''
+            UPDATE notes SET date_added = datetime(date_added / 1000, 'unixepoch', 'localtime'),
+                             date_last_edited = datetime(date_last_edited / 1000, 'unixepoch', 'localtime'),
+                             size = NULL
+        ''')
+        conn.execute(DatabaseCRUD.CHANGE_UPDATE_TRIGGER)
+        conn.execute('CREATE INDEX idx_notes_last_edited ON notes (date_last_edited DESC, id DESC)')
+        conn.execute('PRAGMA user_version = 5')
+        conn.commit()
+    finally:
+        DatabaseCRUD._release_connection()
+
+# milliseconds for the first page and for the page after `depth` rows
+def time_pages(sort, descending, depth, page_size):
+    start = time.perf_counter()
+    DatabaseCRUD.get_notes_page(None, page_size, sort, descending)
+    first_ms = (time.perf_counter() - start) * 1000
+    before = None
+    for _ in range(depth // 1000):
+        rows = DatabaseCRUD.get_notes_page(before, 1000, sort, descending)
+        before = (rows[-1][SORT_FIELDS[sort]], rows[-1]['id'])
+    start = time.perf_counter()
+    DatabaseCRUD.get_notes_page(before, page_size, sort, descending)
+    return first_ms, (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Notes list sorting benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--depth", type=int, default=10000, help="rows skipped before the deep page")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    print(f"{'notes':>9}  {'order':<16}{'first ms':>10}{'deep ms':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            DatabaseCRUD.DB_NAME = os.path.join(tmp, "bench.db")
+            DatabaseCRUD.initialize_database()
+            seed_database(size, args.seed, content_median=200, content_sigma=0.5)
+            for sort in DatabaseCRUD.SORT_COLUMNS:
+                for descending in (False, True):
+                    first_ms, deep_ms = time_pages(sort, descending, min(args.depth, size - args.page_size), args.page_size)
+                    order = f"{sort} {'desc' if descending else 'asc'}"
+                    print(f"{size:>9}  {order:<16}{first_ms:>10.2f}{deep_ms:>10.2f}")
+            make_legacy()
+            estimated = sum(timing['estimated'] for timing in DatabaseCRUD.migrator().estimate())
+            start = time.perf_counter()
+            DatabaseCRUD.initialize_database()
+            print(f"{size:>9}  converting string timestamps and building indexes: {time.perf_counter() - start:.1f}s"
+                  f" (dry run estimate {estimated:.1f}s)")
+            DatabaseCRUD.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# time the first page of tag filters of different popularity against a tagged corpus
+# run from the repository root: python -m benchmarks.bench_tags --sizes 100000 1000000
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.corpus import seed_database
+from database import DatabaseCRUD
+
+# tag name -> share of notes carrying it
+TAG_SHARES = {'half': 0.5, 'tenth': 0.1, 'hundredth': 0.01, 'thousandth': 0.001}
+
+# tag the corpus directly, the note_tags triggers keep the counts as in normal use
+def tag_corpus(size, seed):
+    rng = random.Random(seed)
+    conn = DatabaseCRUD._get_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        for name, share in TAG_SHARES.items():
+            conn.execute("INSERT INTO tags (kind, name) VALUES ('tag', ?)", (name,))
+            tag_id = conn.execute("SELECT id FROM tags WHERE name = ?", (name,)).fetchone()[0]
+            conn.executemany('INSERT INTO note_tags (tag_id, note_id) VALUES (?, ?)',
+                             ((tag_id, note_id) for note_id in range(1, size + 1) if rng.random() < share))
+        conn.commit()
+    finally:
+        DatabaseCRUD._release_connection()
+
+def time_filter(tag_ids, match_all, repeat, limit):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        DatabaseCRUD.get_notes_by_tags(tag_ids, match_all, None, limit)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)[len(latencies) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description="Tag filter benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    print(f"{'notes':>9}  {'filter':<28}{'p50 ms':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            DatabaseCRUD.DB_NAME = os.path.join(tmp, "bench.db")
+            DatabaseCRUD.initialize_database()
+            seed_database(size, args.seed, content_median=200, content_sigma=0.5)
+            tag_corpus(size, args.seed)
+            tags = {tag['name']: tag['id'] for tag in DatabaseCRUD.get_tags()}
+            filters = [(name, [name], False) for name in TAG_SHARES]
+            filters += [("tenth or thousandth", ['tenth', 'thousandth'], False),
+                        ("half and hundredth", ['half', 'hundredth'], True),
+                        ("half and tenth", ['half', 'tenth'], True)]
+            for label, names, match_all in filters:
+                p50 = time_filter([tags[name] for name in names], match_all, args.repeat, args.page_size)
+                print(f"{size:>9}  {label:<28}{p50:>10.2f}")
+            DatabaseCRUD.close()
+
+if __name__ == "__main__":
+    main()
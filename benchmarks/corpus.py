@@ -0,0 +1,41 @@
+# seeded synthetic notes for benchmarks: the same arguments always produce the same corpus
+import math
+import random
+from datetime import datetime, timedelta
+
+from database import DatabaseCRUD
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "po", "da", "fe"]
+START_DATE = datetime(2024, 1, 1)
+
+# pseudo-words with Zipf-like frequencies, so a few terms are common and most are rare
+def make_vocabulary(rng, size=5000):
+    words = sorted({"".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(size * 2)})[:size]
+    rng.shuffle(words)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    return words, weights
+
+# content sizes follow a log-normal distribution around content_median bytes,
+# which gives many short notes and a long tail of large ones
+def generate_notes(count, seed=0, title_words=(2, 8), content_median=800, content_sigma=1.0,
+                   max_content=1000000, vocabulary_size=5000):
+    rng = random.Random(seed)
+    words, weights = make_vocabulary(rng, vocabulary_size)
+    cumulative = list(_accumulate(weights))
+    average_word = sum(len(word) + 1 for word in words[:100]) / 100
+    for i in range(count):
+        title = " ".join(rng.choices(words, cum_weights=cumulative, k=rng.randint(*title_words)))
+        size = min(max_content, int(rng.lognormvariate(math.log(content_median), content_sigma)))
+        content = " ".join(rng.choices(words, cum_weights=cumulative, k=max(1, int(size / average_word))))
+        created = int((START_DATE + timedelta(seconds=i * 30)).timestamp() * 1000)
+        yield {'title': title.capitalize(), 'content': content, 'date_added': created, 'date_last_edited': created}
+
+def _accumulate(weights):
+    total = 0
+    for weight in weights:
+        total += weight
+        yield total
+
+# fill the current DatabaseCRUD database, returns the number of notes inserted
+def seed_database(count, seed=0, **options):
+    return DatabaseCRUD.import_notes(generate_notes(count, seed, **options), batch_size=10000)
@@ -0,0 +1,116 @@
+# several processes add, edit, tag and delete notes in one database file at the same time
+# while this process follows their changes through get_changes; fails on any lost write
+# run from the repository root: python -m benchmarks.stress_multiprocess --processes 4 --operations 500
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from database import DatabaseCRUD
+
+# one writer process: returns the ids it left behind and how many calls failed
+def writer(db_name, worker, operations, seed):
+    DatabaseCRUD.DB_NAME = db_name
+    if not DatabaseCRUD.initialize_database():
+        return [], operations
+    rng = random.Random(seed + worker)
+    alive = []
+    failures = 0
+    for step in range(operations):
+        roll = rng.random()
+        if roll < 0.5 or not alive:
+            note_id = DatabaseCRUD.add_note(f"worker {worker} note {step}", f"written by {worker} at step {step}")
+            if note_id:
+                alive.append(note_id)
+            else:
+                failures += 1
+        elif roll < 0.75:
+            note_id = rng.choice(alive)
+            if not DatabaseCRUD.edit_note(note_id, f"worker {worker} edit {step}", f"edited by {worker} at step {step}"):
+                failures += 1
+        elif roll < 0.85:
+            if not DatabaseCRUD.tag_note(rng.choice(alive), [f"worker-{worker}", "shared"]):
+                failures += 1
+        else:
+            note_id = alive.pop(rng.randrange(len(alive)))
+            if not DatabaseCRUD.delete_note(note_id):
+                failures += 1
+    DatabaseCRUD.close()
+    return alive, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process write stress test")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--operations", type=int, default=500, help="operations per process")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "stress.db")
+        start = time.perf_counter()
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(args.processes) as pool:
+            pending = pool.starmap_async(writer, [(db_name, worker, args.operations, args.seed)
+                                                  for worker in range(args.processes)])
+            # follow the writers the way an open notes list does
+            DatabaseCRUD.DB_NAME = db_name
+            seen = {}
+            seq = 0
+            polls = 0
+            while True:
+                done = pending.ready()
+                changes = DatabaseCRUD.get_changes(seq)
+                if changes is not None:
+                    polls += 1
+                    seq = changes['seq']
+                    for note in changes['changed']:
+                        seen[note['id']] = note['title']
+                    for note_id in changes['deleted']:
+                        seen.pop(note_id, None)
+                if done:
+                    break
+                time.sleep(0.05)
+            results = pending.get()
+        elapsed = time.perf_counter() - start
+
+        expected = set()
+        failures = 0
+        for alive, failed in results:
+            expected.update(alive)
+            failures += failed
+        stored = {note['id']: note['title'] for note in DatabaseCRUD.get_notes()}
+        conn = DatabaseCRUD._get_connection()
+        try:
+            conn.execute("INSERT INTO notes_fts (notes_fts) VALUES ('integrity-check')")
+            tag_counts_ok = conn.execute('''
+                SELECT COUNT(*) FROM tags
+                WHERE note_count != (SELECT COUNT(*) FROM note_tags WHERE note_tags.tag_id = tags.id)
+            ''').fetchone()[0] == 0
+        finally:
+            DatabaseCRUD._release_connection()
+        DatabaseCRUD.close()
+
+    operations = args.processes * args.operations
+    print(f"{operations} operations from {args.processes} processes in {elapsed:.1f}s ({operations / elapsed:.0f} ops/s)")
+    print(f"failed calls: {failures}")
+    print(f"notes expected {len(expected)}, stored {len(stored)}, seen through get_changes {len(seen)} ({polls} polls)")
+    problems = []
+    if failures:
+        problems.append("some calls failed")
+    if set(stored) != expected:
+        problems.append("stored notes differ from what the writers left")
+    if seen != stored:
+        problems.append("the change feed missed updates")
+    if not tag_counts_ok:
+        problems.append("tag counts drifted")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# headless DatabaseCRUD benchmark at several corpus sizes, prints a table and optionally JSON
+# run from the repository root: python -m benchmarks.suite --sizes 1000 10000 --json results.json
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import generate_notes, seed_database
+from database import DatabaseCRUD
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+
+# call func(*arguments) once per tuple, returns per-call latencies in milliseconds
+def time_calls(func, arguments):
+    latencies = []
+    for argument in arguments:
+        start = time.perf_counter()
+        func(*argument)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def summarize(size, operation, latencies):
+    ordered = sorted(latencies)
+    return {
+        'notes': size,
+        'operation': operation,
+        'calls': len(ordered),
+        'mean_ms': statistics.fmean(ordered),
+        'p50_ms': ordered[len(ordered) // 2],
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        'ops_per_s': 1000 * len(ordered) / sum(ordered) if sum(ordered) else float('inf'),
+    }
+
+def run_size(size, args):
+    rng = random.Random(args.seed + size)
+    with tempfile.TemporaryDirectory() as tmp:
+        DatabaseCRUD.DB_NAME = os.path.join(tmp, "bench.db")
+        DatabaseCRUD.initialize_database()
+        seed_start = time.perf_counter()
+        seed_database(size, args.seed)
+        seed_seconds = time.perf_counter() - seed_start
+
+        existing = [(rng.randint(1, size),) for _ in range(args.repeat)]
+        fresh = [(note['title'], note['content']) for note in generate_notes(args.repeat, args.seed + 1)]
+        results = []
+
+        added = []
+        latencies = []
+        for title, content in fresh:
+            start = time.perf_counter()
+            added.append(DatabaseCRUD.add_note(title, content))
+            latencies.append((time.perf_counter() - start) * 1000)
+        results.append(summarize(size, 'add_note', latencies))
+        # get_note reads from SQLite: the note cache is emptied before each timed call
+        latencies = []
+        for (note_id,) in existing:
+            DatabaseCRUD.note_cache.clear()
+            start = time.perf_counter()
+            DatabaseCRUD.get_note(note_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+        results.append(summarize(size, 'get_note', latencies))
+        results.append(summarize(size, 'get_note cached', time_calls(DatabaseCRUD.get_note, existing * 2)))
+        edits = [(note_id, title, content) for (note_id,), (title, content) in zip(existing, reversed(fresh))]
+        results.append(summarize(size, 'edit_note', time_calls(DatabaseCRUD.edit_note, edits)))
+        results.append(summarize(size, 'delete_note', time_calls(DatabaseCRUD.delete_note, [(note_id,) for note_id in added])))
+        full_scans = max(1, min(args.repeat, args.full_scan_budget // size))
+        results.append(summarize(size, 'get_notes', time_calls(DatabaseCRUD.get_notes, [()] * full_scans)))
+        results.append(summarize(size, 'get_notes_page', time_calls(DatabaseCRUD.get_notes_page, [()] * args.repeat)))
+        for getter in (DatabaseCRUD.get_font_size, DatabaseCRUD.get_font_family, DatabaseCRUD.get_language, DatabaseCRUD.get_theme):
+            results.append(summarize(size, getter.__name__, time_calls(getter, [()] * args.repeat)))
+        DatabaseCRUD.close()
+    return seed_seconds, results
+
+def print_table(rows):
+    print(f"{'notes':>9}  {'operation':<16}{'calls':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'ops/s':>12}")
+    for row in rows:
+        print(f"{row['notes']:>9}  {row['operation']:<16}{row['calls']:>7}{row['mean_ms']:>10.3f}"
+              f"{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}{row['ops_per_s']:>12.0f}")
+
+# compare p50 latencies with an earlier --json report, returns the regressed rows
+def compare(rows, baseline_path, tolerance):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(row['notes'], row['operation']): row for row in json.load(f)['results']}
+    regressions = []
+    print(f"\n{'notes':>9}  {'operation':<16}{'base p50':>10}{'p50':>10}{'change':>9}")
+    for row in rows:
+        previous = baseline.get((row['notes'], row['operation']))
+        if previous is None or previous['p50_ms'] == 0:
+            continue
+        change = row['p50_ms'] / previous['p50_ms'] - 1
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"{row['notes']:>9}  {row['operation']:<16}{previous['p50_ms']:>10.3f}{row['p50_ms']:>10.3f}{change:>+9.0%}{flag}")
+        if flag:
+            regressions.append(row)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="DatabaseCRUD benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=200, help="calls per operation")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--full-scan-budget", type=int, default=200000,
+                        help="get_notes loads every note, so it runs budget // size times (at least once)")
+    parser.add_argument("--json", help="write results to this file for regression comparison")
+    parser.add_argument("--compare", help="earlier --json report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed p50 slowdown before failing, 0.25 = 25%%")
+    args = parser.parse_args()
+
+    rows = []
+    seeding = {}
+    for size in args.sizes:
+        seed_seconds, results = run_size(size, args)
+        seeding[size] = seed_seconds
+        rows.extend(results)
+        print(f"seeded {size} notes in {seed_seconds:.1f}s", file=sys.stderr)
+    print_table(rows)
+
+    if args.json:
+        report = {
+            'meta': {
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'platform': platform.platform(),
+                'seed': args.seed,
+                'repeat': args.repeat,
+                'seed_seconds': seeding,
+            },
+            'results': rows,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare and compare(rows, args.compare, args.tolerance):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
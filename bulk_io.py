@@ -0,0 +1,87 @@
+import csv
+import json
+import os
+import re
+
+from database import DatabaseCRUD
+
+FORMATS = ('jsonl', 'csv', 'markdown')
+CSV_COLUMNS = ['id', 'title', 'content', 'date_added', 'date_last_edited']
+
+# notes may hold pasted logs far bigger than the csv module's default field limit
+csv.field_size_limit(2 ** 31 - 1)
+
+# Readers: generators that yield note dictionaries one at a time
+
+def read_jsonl(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        yield row
+
+# one note per .md file, a leading "# " line is used as the title
+def read_markdown_dir(directory):
+    for entry in sorted(os.scandir(directory), key=lambda e: e.name):
+        if not entry.is_file() or not entry.name.endswith(".md"):
+            continue
+        with open(entry.path, "r", encoding="utf-8") as f:
+            text = f.read()
+        first_line, _, rest = text.partition("\n")
+        if first_line.startswith("# "):
+            title, content = first_line[2:].strip(), rest.lstrip("\n")
+        else:
+            title, content = os.path.splitext(entry.name)[0], text
+        modified = entry.stat().st_mtime_ns // 1000000
+        yield {'title': title, 'content': content, 'date_added': modified, 'date_last_edited': modified}
+
+# Writers: consume any iterable of notes without building a list
+
+def write_jsonl(notes, stream):
+    count = 0
+    for note in notes:
+        stream.write(json.dumps(note, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+def write_csv(notes, stream):
+    writer = csv.DictWriter(stream, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for note in notes:
+        writer.writerow(note)
+        count += 1
+    return count
+
+def write_markdown_dir(notes, directory):
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for note in notes:
+        slug = re.sub(r"[^\w-]+", "-", note['title']).strip("-")[:60] or "note"
+        path = os.path.join(directory, f"{note['id']}-{slug}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"# {note['title']}\n\n{note['content']}")
+        count += 1
+    return count
+
+# import a JSONL/CSV file or a markdown directory, returns the number of notes imported
+def import_notes(path, fmt, batch_size=5000, progress=None):
+    if fmt == 'markdown':
+        return DatabaseCRUD.import_notes(read_markdown_dir(path), batch_size, progress)
+    reader = {'jsonl': read_jsonl, 'csv': read_csv}.get(fmt)
+    if reader is None:
+        raise ValueError(f"Unsupported format: {fmt}")
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return DatabaseCRUD.import_notes(reader(f), batch_size, progress)
+
+# export every note to a stream (jsonl, csv) or a directory (markdown), returns the count
+def export_notes(target, fmt, batch_size=1000):
+    notes = DatabaseCRUD.iter_notes(batch_size)
+    if fmt == 'markdown':
+        return write_markdown_dir(notes, target)
+    writer = {'jsonl': write_jsonl, 'csv': write_csv}.get(fmt)
+    if writer is None:
+        raise ValueError(f"Unsupported format: {fmt}")
+    return writer(notes, target)
@@ -0,0 +1,266 @@
+# command-line access to the notes database without Tk, for scripts and shell pipelines
+# usage: python cli.py [--db notes.db] {add,get,list,search,edit,delete,import,export,stats} ...
+# notes and list rows are written as JSON, one object per line, as they are read; dates are
+# epoch milliseconds. messages go to stderr, so stdout can be piped into other tools
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+from database import DatabaseCRUD
+
+# rows fetched per query while listing
+LIST_BATCH = 1000
+# notes longer than this many UTF-8 bytes are written by `get` piece by piece
+STREAM_NOTE_SIZE = 1024 * 1024
+FORMATS = ('jsonl', 'csv', 'markdown')
+
+def write_json(out, value):
+    out.write(json.dumps(value, ensure_ascii=False) + "\n")
+
+# note content from --content, or from --content-file (a path, or - for stdin)
+def read_content(args):
+    if args.content_file is None:
+        return args.content or ""
+    if args.content_file == "-":
+        return sys.stdin.read()
+    with open(args.content_file, "r", encoding="utf-8") as f:
+        return f.read()
+
+def cmd_add(args, out):
+    note_id = DatabaseCRUD.add_note(args.title, read_content(args))
+    if note_id is False:
+        return 1
+    write_json(out, {'id': note_id})
+    return 0
+
+# a large note is written as its JSON object with the content encoded chunk by chunk,
+# so it never has to fit in memory as one string
+def cmd_get(args, out):
+    note = DatabaseCRUD.get_note(args.id, max_size=STREAM_NOTE_SIZE)
+    if note is None:
+        print(f"Note {args.id} not found")
+        return 1
+    if args.raw:
+        if note['content'] is not None:
+            out.write(note['content'])
+        else:
+            for chunk in DatabaseCRUD.iter_note_content(args.id):
+                out.write(chunk)
+        return 0
+    if note['content'] is not None:
+        write_json(out, note)
+        return 0
+    fields = json.dumps({key: value for key, value in note.items() if key != 'content'}, ensure_ascii=False)
+    out.write(fields[:-1] + ', "content": "')
+    for chunk in DatabaseCRUD.iter_note_content(args.id):
+        out.write(json.dumps(chunk, ensure_ascii=False)[1:-1])
+    out.write('"}\n')
+    return 0
+
+def cmd_list(args, out):
+    tag_ids = []
+    if args.tag:
+        tags = {tag['name'].lower(): tag['id'] for tag in DatabaseCRUD.get_tags()}
+        tag_ids = [tags[name.lower()] for name in args.tag if name.lower() in tags]
+        # an unknown tag matches no notes
+        if not tag_ids or (args.match_all and len(tag_ids) < len(args.tag)):
+            return 0
+    descending = not args.ascending
+    # the list field the keyset cursor continues from, e.g. notes.date_last_edited -> date_last_edited
+    sort_field = DatabaseCRUD.SORT_COLUMNS[args.sort][0].split('.')[-1]
+    before = None
+    written = 0
+    while args.limit == 0 or written < args.limit:
+        batch = LIST_BATCH if args.limit == 0 else min(LIST_BATCH, args.limit - written)
+        if tag_ids:
+            rows = DatabaseCRUD.get_notes_by_tags(tag_ids, args.match_all, before, batch, args.sort, descending)
+        else:
+            rows = DatabaseCRUD.get_notes_page(before, batch, args.sort, descending)
+        for row in rows:
+            write_json(out, row)
+        written += len(rows)
+        if len(rows) < batch:
+            break
+        before = (rows[-1][sort_field], rows[-1]['id'])
+    return 0
+
+def cmd_search(args, out):
+    for row in DatabaseCRUD.search_notes(args.query, args.limit):
+        write_json(out, row)
+    return 0
+
+# unchanged fields keep their stored value; --content-file and renames stream the text
+def cmd_edit(args, out):
+    if args.title is None and args.content is None and args.content_file is None:
+        print("Nothing to change: give --title, --content or --content-file")
+        return 2
+    summary = DatabaseCRUD.get_note_summary(args.id)
+    if summary is None:
+        print(f"Note {args.id} not found")
+        return 1
+    title = summary['title'] if args.title is None else args.title
+    if args.content is not None:
+        saved = DatabaseCRUD.edit_note(args.id, title, args.content)
+    elif args.content_file is not None:
+        with contextlib.ExitStack() as stack:
+            stream = sys.stdin if args.content_file == "-" else stack.enter_context(
+                open(args.content_file, "r", encoding="utf-8"))
+            saved = DatabaseCRUD.edit_note_chunks(args.id, title, iter(lambda: stream.read(1024 * 1024), ""))
+    else:
+        # a rename streams the stored text back instead of loading it as one string; the chunks
+        # are all read before edit_note_chunks writes the row
+        saved = DatabaseCRUD.edit_note_chunks(args.id, title, DatabaseCRUD.iter_note_content(args.id))
+    if not saved:
+        return 1
+    write_json(out, {'id': args.id})
+    return 0
+
+def cmd_delete(args, out):
+    status = 0
+    for note_id in args.ids:
+        deleted = DatabaseCRUD.delete_note(note_id)
+        write_json(out, {'id': note_id, 'deleted': deleted})
+        if not deleted:
+            status = 1
+    return status
+
+def guess_format(path, fmt):
+    if fmt:
+        return fmt
+    if path != "-" and os.path.isdir(path):
+        return 'markdown'
+    return 'csv' if path.lower().endswith(".csv") else 'jsonl'
+
+def cmd_import(args, out):
+    import bulk_io
+    fmt = guess_format(args.path, args.format)
+    progress = (lambda count: print(f"\r{count} notes imported", end="", file=sys.stderr)) if args.progress else None
+    if args.path == "-":
+        if fmt == 'markdown':
+            print("Markdown notes are imported from a directory, not stdin")
+            return 2
+        reader = bulk_io.read_csv if fmt == 'csv' else bulk_io.read_jsonl
+        imported = DatabaseCRUD.import_notes(reader(sys.stdin), args.batch_size, progress)
+    else:
+        imported = bulk_io.import_notes(args.path, fmt, args.batch_size, progress)
+    if progress:
+        print(file=sys.stderr)
+    if imported is False:
+        return 1
+    write_json(out, {'imported': imported})
+    return 0
+
+def cmd_export(args, out):
+    import bulk_io
+    fmt = guess_format(args.path, args.format) if args.path != "-" else (args.format or 'jsonl')
+    if fmt == 'markdown':
+        if args.path == "-":
+            print("Markdown notes are exported to a directory, not stdout")
+            return 2
+        count = bulk_io.export_notes(args.path, fmt)
+    elif args.path == "-":
+        count = bulk_io.export_notes(out, fmt)
+    else:
+        with open(args.path, "w", encoding="utf-8", newline="") as f:
+            count = bulk_io.export_notes(f, fmt)
+    print(f"{count} notes exported")
+    return 0
+
+def cmd_stats(args, out):
+    stats = DatabaseCRUD.get_stats()
+    if stats is None:
+        return 1
+    write_json(out, stats)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Notes from the command line")
+    parser.add_argument("--db", default=DatabaseCRUD.DB_NAME, help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def content_options(command):
+        source = command.add_mutually_exclusive_group()
+        source.add_argument("--content", help="note text")
+        source.add_argument("--content-file", help="file with the note text, - for stdin")
+
+    command = commands.add_parser("add", help="add a note, prints its id")
+    command.add_argument("title")
+    content_options(command)
+    command.set_defaults(func=cmd_add)
+
+    command = commands.add_parser("get", help="print one note")
+    command.add_argument("id", type=int)
+    command.add_argument("--raw", action="store_true", help="print only the content, as plain text")
+    command.set_defaults(func=cmd_get)
+
+    command = commands.add_parser("list", help="list notes without their content")
+    command.add_argument("--sort", choices=list(DatabaseCRUD.SORT_COLUMNS), default="edited")
+    command.add_argument("--ascending", action="store_true")
+    command.add_argument("--limit", type=int, default=0, help="at most this many notes, 0 for all")
+    command.add_argument("--tag", action="append", help="only notes with this tag or notebook, repeatable")
+    command.add_argument("--match-all", action="store_true", help="notes must have every --tag")
+    command.set_defaults(func=cmd_list)
+
+    command = commands.add_parser("search", help="full-text search, best matches first")
+    command.add_argument("query")
+    command.add_argument("--limit", type=int, default=50)
+    command.set_defaults(func=cmd_search)
+
+    command = commands.add_parser("edit", help="change a note's title and/or content")
+    command.add_argument("id", type=int)
+    command.add_argument("--title")
+    content_options(command)
+    command.set_defaults(func=cmd_edit)
+
+    command = commands.add_parser("delete", help="delete notes")
+    command.add_argument("ids", type=int, nargs="+")
+    command.set_defaults(func=cmd_delete)
+
+    command = commands.add_parser("import", help="import notes from a file, a markdown directory or stdin")
+    command.add_argument("path", help="JSONL/CSV file, markdown directory, or - for stdin")
+    command.add_argument("--format", choices=FORMATS, help="default: from the path, JSONL for stdin")
+    command.add_argument("--batch-size", type=int, default=5000)
+    command.add_argument("--progress", action="store_true", help="report progress on stderr")
+    command.set_defaults(func=cmd_import)
+
+    command = commands.add_parser("export", help="export every note")
+    command.add_argument("path", nargs="?", default="-", help="file or markdown directory, - for stdout (default)")
+    command.add_argument("--format", choices=FORMATS, help="default: from the path, JSONL for stdout")
+    command.set_defaults(func=cmd_export)
+
+    command = commands.add_parser("stats", help="note counts and database size")
+    command.set_defaults(func=cmd_stats)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    out = sys.stdout
+    # DatabaseCRUD reports errors with print, keep them out of the JSON on stdout
+    with contextlib.redirect_stdout(sys.stderr):
+        DatabaseCRUD.DB_NAME = args.db
+        # signatures are computed by the app's next similar-notes search instead
+        DatabaseCRUD.COMPUTE_SIGNATURES = False
+        if os.environ.get("NOTES_DB_INSTRUMENT") == "1":
+            from instrumentation import configure_from_environment
+            configure_from_environment(DatabaseCRUD)
+        if not DatabaseCRUD.initialize_database():
+            return 1
+        stored = DatabaseCRUD.get_settings() or {}
+        if stored.get('performance_profile'):
+            DatabaseCRUD.set_performance_profile(stored['performance_profile'])
+        try:
+            status = args.func(args, out)
+            out.flush()
+        except BrokenPipeError:
+            # the reader (e.g. head) stopped early, which is not an error
+            os.dup2(os.open(os.devnull, os.O_WRONLY), out.fileno())
+            return 0
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
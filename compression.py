@@ -0,0 +1,92 @@
+import zlib
+
+# lzma is imported on first use, it adds a few milliseconds to every start otherwise
+def _lzma():
+    import lzma
+    return lzma
+
+# codec name stored in notes.codec -> (compress, decompress); NULL means plain text
+CODECS = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lambda data: _lzma().compress(data, preset=6), lambda data: _lzma().decompress(data)),
+}
+
+# incremental (compressor, decompressor) factories for notes that are streamed in chunks
+STREAM_CODECS = {
+    'zlib': (lambda: zlib.compressobj(6), zlib.decompressobj),
+    'lzma': (lambda: _lzma().LZMACompressor(preset=6), lambda: _lzma().LZMADecompressor()),
+}
+
+# compress content with codec when it is at least threshold bytes and actually shrinks
+# returns the value to store and the codec used (None for plain text)
+def compress_content(content, codec, threshold):
+    if codec is None or content is None:
+        return content, None
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression codec: {codec}")
+    data = content.encode("utf-8")
+    if len(data) < threshold:
+        return content, None
+    packed = CODECS[codec][0](data)
+    if len(packed) >= len(data):
+        return content, None
+    return packed, codec
+
+def decompress_content(value, codec):
+    if codec is None or value is None:
+        return value
+    return CODECS[codec][1](value).decode("utf-8")
+
+# compress an iterable of text chunks without joining them first; like compress_content,
+# text of fewer than threshold bytes is stored plain (only that much is ever buffered)
+# returns the value to store and the codec used (None for plain text)
+def compress_chunks(chunks, codec, threshold=0):
+    if codec is None:
+        return "".join(chunks), None
+    if codec not in STREAM_CODECS:
+        raise ValueError(f"Unknown compression codec: {codec}")
+    chunks = iter(chunks)
+    head = []
+    buffered = 0
+    for chunk in chunks:
+        head.append(chunk)
+        buffered += len(chunk.encode("utf-8"))
+        if buffered >= threshold:
+            break
+    else:
+        if buffered < threshold:
+            return "".join(head), None
+    compressor = STREAM_CODECS[codec][0]()
+    packed = [compressor.compress(chunk.encode("utf-8")) for chunk in head]
+    packed.extend(compressor.compress(chunk.encode("utf-8")) for chunk in chunks)
+    packed.append(compressor.flush())
+    return b"".join(packed), codec
+
+# decompress an iterable of stored byte chunks, yields decompressed bytes in pieces of at most
+# max_length, so a small chunk of very repetitive text never expands into one huge piece
+def decompress_chunks(chunks, codec, max_length=1024 * 1024):
+    if codec is None:
+        yield from chunks
+        return
+    decompressor = STREAM_CODECS[codec][1]()
+    for chunk in chunks:
+        data = decompressor.decompress(chunk, max_length)
+        yield data
+        # zlib keeps the input it has not used yet, lzma buffers it internally
+        while len(data) == max_length:
+            if hasattr(decompressor, "unconsumed_tail"):
+                data = decompressor.decompress(decompressor.unconsumed_tail, max_length)
+            elif not decompressor.needs_input:
+                data = decompressor.decompress(b"", max_length)
+            else:
+                break
+            yield data
+    if hasattr(decompressor, "flush"):
+        yield decompressor.flush()
+
+# note_text(content, codec) lets triggers and views see the plain text; bulk_insert() is
+# what the notes insert triggers check, always 0 except on the shared connection during an
+# import (see ConnectionManager.bulk_insert)
+def register_functions(conn):
+    conn.create_function("note_text", 2, decompress_content, deterministic=True)
+    conn.create_function("bulk_insert", 0, lambda: 0)
@@ -0,0 +1,96 @@
+import atexit
+import sqlite3
+import threading
+
+from compression import register_functions
+
+class ConnectionManager:
+    # number of prepared statements sqlite3 keeps compiled per connection
+    CACHED_STATEMENTS = 256
+    # seconds a statement waits (SQLite retries with backoff) while another process holds the lock
+    BUSY_TIMEOUT = 10.0
+
+    # pragmas applied to every connection, by profile name. all of them keep WAL, which
+    # concurrent instances and online backups rely on; they differ in what a power loss or OS
+    # crash can cost: nothing (safe), the last commits but never consistency (balanced), or
+    # possibly a corrupt file (fast). cache_size is negative KiB, mmap_size bytes
+    PROFILES = {
+        'safe': {'journal_mode': 'WAL', 'synchronous': 'FULL', 'mmap_size': 0,
+                 'cache_size': -2000, 'temp_store': 'DEFAULT'},
+        'balanced': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'mmap_size': 256 * 1024 * 1024,
+                     'cache_size': -32 * 1024, 'temp_store': 'MEMORY'},
+        'fast': {'journal_mode': 'WAL', 'synchronous': 'OFF', 'mmap_size': 1024 * 1024 * 1024,
+                 'cache_size': -128 * 1024, 'temp_store': 'MEMORY'},
+    }
+    DEFAULT_PROFILE = 'balanced'
+
+    # while True the insert triggers of notes skip rows inserted on the shared connection,
+    # set by DatabaseCRUD._insert_batch inside its transaction, which indexes the batch itself;
+    # every other connection keeps bulk_insert() at 0, so their writes are never skipped
+    bulk_insert = False
+
+    _conn = None
+    _db_name = None
+    _trace_callback = None
+    profile = DEFAULT_PROFILE
+    lock = threading.RLock()
+
+    # return the long-lived connection, (re)opening it if the database path changed
+    @classmethod
+    def get_connection(cls, db_name):
+        with cls.lock:
+            if cls._conn is not None and cls._db_name == db_name:
+                return cls._conn
+            cls.close()
+            conn = sqlite3.connect(db_name, timeout=cls.BUSY_TIMEOUT, check_same_thread=False,
+                                   cached_statements=cls.CACHED_STATEMENTS)
+            cls.apply_profile(conn, cls.profile)
+            register_functions(conn)
+            conn.create_function("bulk_insert", 0, lambda: int(cls.bulk_insert))
+            if cls._trace_callback is not None:
+                conn.set_trace_callback(cls._trace_callback)
+            cls._conn = conn
+            cls._db_name = db_name
+            return conn
+
+    # set the pragmas of a profile on any connection, outside of a transaction
+    @classmethod
+    def apply_profile(cls, conn, name):
+        for pragma, value in cls.PROFILES[name].items():
+            conn.execute(f"PRAGMA {pragma}={value}")
+
+    # switch the shared connection, and the ones opened later, to another profile
+    @classmethod
+    def set_profile(cls, name):
+        if name not in cls.PROFILES:
+            raise ValueError(f"Unknown performance profile: {name}")
+        with cls.lock:
+            cls.profile = name
+            if cls._conn is not None:
+                cls.apply_profile(cls._conn, name)
+
+    # sqlite3 trace callback for the shared connection (None removes it); waits for the
+    # connection lock, so the GUI sets it from the database worker
+    @classmethod
+    def set_trace_callback(cls, callback):
+        with cls.lock:
+            cls._trace_callback = callback
+            if cls._conn is not None:
+                cls._conn.set_trace_callback(callback)
+
+    # close the shared connection, called automatically at interpreter shutdown
+    @classmethod
+    def close(cls):
+        with cls.lock:
+            if cls._conn is None:
+                return
+            try:
+                cls._conn.execute("PRAGMA optimize")
+                cls._conn.close()
+            except sqlite3.Error as e:
+                print(f"Error closing database: {e}")
+            finally:
+                cls._conn = None
+                cls._db_name = None
+
+atexit.register(ConnectionManager.close)
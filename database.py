@@ -1,88 +1,490 @@
+import codecs
+import re
 import sqlite3
-from datetime import datetime
 import os
+from connection import ConnectionManager
+from compression import compress_chunks, compress_content, decompress_chunks, decompress_content
+from revisions import apply_delta, encode_revision, unpack_text
+from note_cache import NoteCache
+from timestamps import now_ms, to_epoch_ms
+from migrations import Backfill, Migration, Migrator
+import dedup
 
 class DatabaseCRUD:
     DB_NAME = "notes.db"
+    # version of the newest step in migrations()
+    SCHEMA_VERSION = 10
+    SETTINGS_COLUMNS = ('font_size', 'font_family', 'language', 'theme',
+                        'backup_interval', 'backup_keep', 'backup_location', 'performance_profile')
 
-    # error handling and initializing database connection
+    # rows per transaction of migration backfills
+    MIGRATION_BATCH = 5000
+    # a pre-6 local-time date string column as epoch milliseconds, integers are kept
+    LEGACY_TIME_SQL = ("CASE WHEN typeof({0}) = 'integer' THEN {0} "
+                       "ELSE COALESCE(CAST(strftime('%s', {0}, 'utc') AS INTEGER) * 1000, 0) END")
+
+    # sortable list columns: column, collation and the covering index walking them
+    SORT_COLUMNS = {
+        'title': ('notes.title', 'NOCASE', 'idx_notes_title'),
+        'created': ('notes.date_added', None, 'idx_notes_added'),
+        'edited': ('notes.date_last_edited', None, 'idx_notes_last_edited'),
+        'size': ('notes.size', None, 'idx_notes_size'),
+    }
+    # the fields of a notes list row; every sort index holds all of them, so listing a page
+    # in any order reads the index alone
+    LIST_COLUMNS = ['id', 'title', 'date_added', 'date_last_edited', 'size']
+    LIST_SELECT = 'notes.id, notes.title, notes.date_added, notes.date_last_edited, notes.size'
+    LIST_INDEXES = {
+        'idx_notes_last_edited': 'date_last_edited, id, title, date_added, size',
+        'idx_notes_added': 'date_added, id, title, date_last_edited, size',
+        'idx_notes_title': 'title COLLATE NOCASE, id, date_added, date_last_edited, size',
+        'idx_notes_size': 'size, id, title, date_added, date_last_edited',
+    }
+
+    # note contents of at least COMPRESSION_THRESHOLD bytes are stored compressed,
+    # set COMPRESSION_CODEC to None to store everything as plain text
+    COMPRESSION_CODEC = 'zlib'
+    COMPRESSION_THRESHOLD = 4096
+
+    # notes added or edited while this is False get their signatures from index_signatures
+    # later, like imported notes; keeps numpy out of short-lived processes such as cli.py
+    COMPUTE_SIGNATURES = True
+    # notes of fewer bytes are re-indexed by the version 9 migration; a note with fewer than
+    # dedup.MIN_SHINGLES shingles has at most four words, so it is nearly always this short
+    SHORT_NOTE_BYTES = 64
+
+    # recently read notes, kept up to date by add_note, edit_note and delete_note
+    NOTE_CACHE_BYTES = 32 * 1024 * 1024
+    note_cache = NoteCache(NOTE_CACHE_BYTES)
+
+    # keeps the search index in sync for single inserts, bulk imports index per batch instead
+    FTS_INSERT_TRIGGER = '''
+        CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes WHEN NOT bulk_insert() BEGIN
+            INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, note_text(new.content, new.codec));
+        END
+    '''
+
+    # every insert, edit and delete moves the note to the end of note_changes, so other
+    # processes can fetch just the rows changed since the last sequence number they saw
+    CHANGE_INSERT_TRIGGER = '''
+        CREATE TRIGGER IF NOT EXISTS note_changes_insert AFTER INSERT ON notes WHEN NOT bulk_insert() BEGIN
+            INSERT OR REPLACE INTO note_changes (note_id, deleted) VALUES (new.id, 0);
+        END
+    '''
+
+    # converting timestamps runs without this trigger, so it does not log every note as edited
+    CHANGE_UPDATE_TRIGGER = '''
+        CREATE TRIGGER IF NOT EXISTS note_changes_update AFTER UPDATE OF title, date_last_edited ON notes BEGIN
+            INSERT OR REPLACE INTO note_changes (note_id, deleted) VALUES (new.id, 0);
+        END
+    '''
+
+    # recompressing keeps the text unchanged, so it runs without this trigger
+    FTS_UPDATE_TRIGGER = '''
+        CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, title, content)
+            VALUES ('delete', old.id, old.title, note_text(old.content, old.codec));
+            INSERT INTO notes_fts (rowid, title, content)
+            VALUES (new.id, new.title, note_text(new.content, new.codec));
+        END
+    '''
+
+    # error handling and borrowing the shared database connection
+    # the connection lock is held until _release_connection is called
     @staticmethod
     def _get_connection():
+        ConnectionManager.lock.acquire()
         try:
-            conn = sqlite3.connect(DatabaseCRUD.DB_NAME)
-            return conn
+            return ConnectionManager.get_connection(DatabaseCRUD.DB_NAME)
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
+            ConnectionManager.lock.release()
             return None
 
-    # create necessary tables
+    # give the shared connection back, it stays open for the next call
+    @staticmethod
+    def _release_connection():
+        ConnectionManager.lock.release()
+
+    # close the shared connection (also done automatically at exit)
+    @staticmethod
+    def close():
+        DatabaseCRUD.note_cache.clear()
+        DatabaseCRUD.seen_data_version = None
+        DatabaseCRUD.seen_change_seq = None
+        ConnectionManager.close()
+
+    # the schema history in version order; a fresh database goes through every step, later
+    # steps only change what older files lack. every schema change adds a step here
     @staticmethod
-    def initialize_database():
+    def migrations():
+        convert = DatabaseCRUD.LEGACY_TIME_SQL
+        return [
+            # versions 1 to 5 predate the migration steps, this one creates all of their tables
+            Migration(5, "notes, settings, search index, drafts, revisions, tags, change log, signatures",
+                      schema=DatabaseCRUD._create_tables),
+            Migration(6, "timestamps as epoch milliseconds, note sizes, list sort indexes",
+                      schema=DatabaseCRUD._add_note_sizes,
+                      backfills=[
+                          Backfill('notes', 'notes', f'''
+                              UPDATE notes SET date_added = {convert.format('date_added')},
+                                               date_last_edited = {convert.format('date_last_edited')},
+                                               size = COALESCE(size, length(CAST(note_text(content, codec) AS BLOB)))
+                              WHERE id > ? AND id <= ?
+                                    AND (typeof(date_added) != 'integer' OR typeof(date_last_edited) != 'integer' OR size IS NULL)
+                          ''', before=['DROP TRIGGER IF EXISTS note_changes_update'],
+                                after=[DatabaseCRUD.CHANGE_UPDATE_TRIGGER]),
+                          Backfill('revisions', 'revisions', f'''
+                              UPDATE revisions SET date_saved = {convert.format('date_saved')}
+                              WHERE id > ? AND id <= ? AND typeof(date_saved) != 'integer'
+                          '''),
+                      ],
+                      finish=DatabaseCRUD._create_list_indexes),
+            Migration(7, "backup settings", schema=DatabaseCRUD._add_backup_settings),
+            Migration(8, "performance profile setting", schema=DatabaseCRUD._add_performance_profile),
+            Migration(9, "no signatures for notes too short to compare", schema=DatabaseCRUD._drop_short_signatures),
+            Migration(10, "insert triggers that imports can skip", schema=DatabaseCRUD._recreate_insert_triggers),
+        ]
+
+    @staticmethod
+    def migrator():
+        return Migrator(DatabaseCRUD.migrations(), DatabaseCRUD._get_connection,
+                        DatabaseCRUD._release_connection, DatabaseCRUD.MIGRATION_BATCH)
+
+    # bring the schema up to SCHEMA_VERSION, returns right away when it is current
+    # with backfill=False it stops before the first large data update and returns None,
+    # the caller then finishes with migrator().upgrade(), e.g. on a background thread
+    @staticmethod
+    def initialize_database(backfill=True):
+        return DatabaseCRUD.migrator().upgrade(stop_before_backfill=not backfill)
+
+    # schema version 5
+    @staticmethod
+    def _create_tables(cursor):
+        # notes table, dates in epoch milliseconds and size in UTF-8 bytes of the text
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                content TEXT,
+                date_added INTEGER,
+                date_last_edited INTEGER,
+                size INTEGER
+            )
+        ''')
+        
+        # settings table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS settings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                font_size INTEGER DEFAULT 12,
+                font_family TEXT DEFAULT 'Helvetica',
+                language TEXT DEFAULT 'en',
+                theme TEXT DEFAULT 'superhero'
+            )
+        ''')
+        
+        # autosaved editor state, one row per open editor
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS drafts (
+                draft_key TEXT PRIMARY KEY,
+                note_id INTEGER,
+                title TEXT,
+                content TEXT,
+                content_hash TEXT,
+                date_saved TIMESTAMP
+            )
+        ''')
+
+        # earlier versions of notes: keyframes plus deltas against their keyframe
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS revisions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                note_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                base_id INTEGER,
+                title TEXT,
+                data BLOB,
+                date_saved TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_revisions_note ON revisions (note_id, id)')
+
+        # tags and notebooks (kind 'notebook', at most one per note) share one join table
+        # note_count is kept up to date by the note_tags triggers below
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tags (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL DEFAULT 'tag',
+                name TEXT NOT NULL COLLATE NOCASE,
+                note_count INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (kind, name)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS note_tags (
+                tag_id INTEGER NOT NULL,
+                note_id INTEGER NOT NULL,
+                PRIMARY KEY (tag_id, note_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_note_tags_note ON note_tags (note_id, tag_id)')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS note_tags_count_insert AFTER INSERT ON note_tags BEGIN
+                UPDATE tags SET note_count = note_count + 1 WHERE id = new.tag_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS note_tags_count_delete AFTER DELETE ON note_tags BEGIN
+                UPDATE tags SET note_count = note_count - 1 WHERE id = old.tag_id;
+            END
+        ''')
+
+        # latest change per note, deleted notes stay as tombstones for other processes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS note_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                note_id INTEGER NOT NULL UNIQUE,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute(DatabaseCRUD.CHANGE_INSERT_TRIGGER)
+        cursor.execute(DatabaseCRUD.CHANGE_UPDATE_TRIGGER)
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS note_changes_delete AFTER DELETE ON notes BEGIN
+                INSERT OR REPLACE INTO note_changes (note_id, deleted) VALUES (old.id, 1);
+            END
+        ''')
+
+        # MinHash signatures for near-duplicate detection and their LSH band buckets
+        # imported notes get theirs from index_signatures
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS note_signatures (
+                note_id INTEGER PRIMARY KEY,
+                signature BLOB NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS note_bands (
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                note_id INTEGER NOT NULL,
+                PRIMARY KEY (band, bucket, note_id)
+            ) WITHOUT ROWID
+        ''')
+
+        # insert default settings if does not exist
+        cursor.execute('INSERT OR IGNORE INTO settings (id) VALUES (1)')
+
+        # compression codec of notes.content, NULL for plain text
+        cursor.execute('PRAGMA table_info(notes)')
+        note_columns = [column[1] for column in cursor.fetchall()]
+        if 'codec' not in note_columns:
+            cursor.execute('ALTER TABLE notes ADD COLUMN codec TEXT')
+
+        # plain-text view of notes, the search index reads content through it
+        cursor.execute('''
+            CREATE VIEW IF NOT EXISTS notes_plain AS
+            SELECT id, title, note_text(content, codec) AS content FROM notes
+        ''')
+
+        # full-text index over notes, kept in sync by triggers
+        # an index created before compression read notes directly and is rebuilt
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'")
+        fts_row = cursor.fetchone()
+        fts_current = fts_row is not None and 'notes_plain' in fts_row[0]
+        if fts_row is not None and not fts_current:
+            for trigger in ('notes_fts_insert', 'notes_fts_delete', 'notes_fts_update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+            cursor.execute('DROP TABLE notes_fts')
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                title,
+                content,
+                content='notes_plain',
+                content_rowid='id',
+                prefix='2 3'
+            )
+        ''')
+        cursor.execute(DatabaseCRUD.FTS_INSERT_TRIGGER)
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+                INSERT INTO notes_fts (notes_fts, rowid, title, content)
+                VALUES ('delete', old.id, old.title, note_text(old.content, old.codec));
+            END
+        ''')
+        cursor.execute(DatabaseCRUD.FTS_UPDATE_TRIGGER)
+        # index notes that existed before the search index was (re)created
+        if not fts_current:
+            cursor.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+
+    # schema version 6: the size column, filled in by the notes backfill for older rows
+    @staticmethod
+    def _add_note_sizes(cursor):
+        cursor.execute('PRAGMA table_info(notes)')
+        if 'size' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE notes ADD COLUMN size INTEGER')
+        # replaced by the covering LIST_INDEXES once the timestamps are integers
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND name = 'idx_notes_last_edited'")
+        index_row = cursor.fetchone()
+        if index_row is not None and 'size' not in index_row[0]:
+            cursor.execute('DROP INDEX idx_notes_last_edited')
+
+    # schema version 7: hours between automatic backups (0 for none), snapshots kept,
+    # and their directory (NULL for a backups directory next to the database)
+    @staticmethod
+    def _add_backup_settings(cursor):
+        cursor.execute('PRAGMA table_info(settings)')
+        columns = [column[1] for column in cursor.fetchall()]
+        for column, definition in (('backup_interval', 'INTEGER DEFAULT 0'), ('backup_keep', 'INTEGER DEFAULT 5'),
+                                   ('backup_location', 'TEXT')):
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE settings ADD COLUMN {column} {definition}')
+
+    # schema version 8: name of the connection pragma profile (ConnectionManager.PROFILES)
+    @staticmethod
+    def _add_performance_profile(cursor):
+        cursor.execute('PRAGMA table_info(settings)')
+        if 'performance_profile' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE settings ADD COLUMN performance_profile TEXT DEFAULT '{ConnectionManager.DEFAULT_PROFILE}'")
+
+    # signatures of empty notes (all 0xFFFFFFFF) and of short ones are removed so that
+    # index_signatures computes them again under dedup.MIN_SHINGLES; runs without numpy
+    @staticmethod
+    def _drop_short_signatures(cursor):
+        stale = f'''
+            SELECT note_id FROM note_signatures WHERE signature = ?
+            UNION SELECT id FROM notes WHERE size < {DatabaseCRUD.SHORT_NOTE_BYTES}
+        '''
+        empty = b'\xff' * (4 * dedup.NUM_PERM)
+        cursor.execute(f'DELETE FROM note_bands WHERE note_id IN ({stale})', (empty,))
+        cursor.execute(f'DELETE FROM note_signatures WHERE note_id IN ({stale})', (empty,))
+
+    # schema version 10: the insert triggers gained their bulk_insert() condition
+    @staticmethod
+    def _recreate_insert_triggers(cursor):
+        cursor.execute('DROP TRIGGER IF EXISTS notes_fts_insert')
+        cursor.execute('DROP TRIGGER IF EXISTS note_changes_insert')
+        cursor.execute(DatabaseCRUD.FTS_INSERT_TRIGGER)
+        cursor.execute(DatabaseCRUD.CHANGE_INSERT_TRIGGER)
+
+    # built after the backfill instead of being updated row by row during it
+    @staticmethod
+    def _create_list_indexes(cursor):
+        convert = DatabaseCRUD.LEGACY_TIME_SQL
+        cursor.execute(f"UPDATE drafts SET date_saved = {convert.format('date_saved')} WHERE typeof(date_saved) != 'integer'")
+        for name, columns in DatabaseCRUD.LIST_INDEXES.items():
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON notes ({columns})')
+
+    # add new note, return id
+    @staticmethod
+    def add_note(title, content):
+        try:
+            DatabaseCRUD.validate_note_data(title, content)
+        except InputValidationError as e:
+            print(f"Validation Error: {e}")
+            return False
+
         conn = DatabaseCRUD._get_connection()
         if conn:
             try:
                 cursor = conn.cursor()
-                
-                # notes table
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS notes (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        title TEXT NOT NULL,
-                        content TEXT,
-                        date_added TIMESTAMP,
-                        date_last_edited TIMESTAMP
-                    )
-                ''')
-                
-                # settings table
+                current_time = now_ms()
+                stored, codec = DatabaseCRUD._compress(content)
+                size = len(content.encode('utf-8'))
                 cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS settings (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        font_size INTEGER DEFAULT 12,
-                        font_family TEXT DEFAULT 'Helvetica',
-                        language TEXT DEFAULT 'en',
-                        theme TEXT DEFAULT 'superhero'
-                    )
-                ''')
-                
-                # insert default settings if does not exist
-                cursor.execute('INSERT OR IGNORE INTO settings (id) VALUES (1)')
-                
+                    INSERT INTO notes (title, content, codec, date_added, date_last_edited, size)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (title, stored, codec, current_time, current_time, size))
+                note_id = cursor.lastrowid
+                DatabaseCRUD._store_signatures(cursor, [note_id], [content])
                 conn.commit()
-                return True
-            except sqlite3.Error as e:
-                print(f"Error initializing database: {e}")
+                DatabaseCRUD.note_cache.put({'id': note_id, 'title': title, 'content': content,
+                                             'date_added': current_time, 'date_last_edited': current_time, 'size': size})
+                return note_id
+            except sqlite3.Error:
+                conn.rollback()
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
-    # add new note, return id
+    # insert notes from any iterable of dictionaries with title and content
+    # (dates optional, epoch milliseconds or date strings), committing every batch_size notes;
+    # returns the number imported
     @staticmethod
-    def add_note(title, content):
-        try:
-            DatabaseCRUD.validate_note_data(title, content)
-        except InputValidationError as e:
-            print(f"Validation Error: {e}")
-            return False
+    def import_notes(notes, batch_size=5000, progress=None):
+        imported = 0
+        batch = []
+        for note in notes:
+            try:
+                DatabaseCRUD.validate_note_data(note.get('title'), note.get('content'))
+            except InputValidationError as e:
+                print(f"Validation Error: {e}")
+                continue
+            date_added = to_epoch_ms(note.get('date_added')) or now_ms()
+            stored, codec = DatabaseCRUD._compress(note['content'])
+            batch.append((note['title'], stored, codec, date_added,
+                          to_epoch_ms(note.get('date_last_edited')) or date_added,
+                          len(note['content'].encode('utf-8'))))
+            if len(batch) >= batch_size:
+                if not DatabaseCRUD._insert_batch(batch):
+                    return False
+                imported += len(batch)
+                batch = []
+                if progress:
+                    progress(imported)
+        if batch:
+            if not DatabaseCRUD._insert_batch(batch):
+                return False
+            imported += len(batch)
+            if progress:
+                progress(imported)
+        return imported
 
+    # one transaction per import batch; the per-row insert triggers are skipped (bulk_insert)
+    # for one bulk index insert, which is several times faster. nothing in the schema changes,
+    # so other connections keep their prepared statements and their inserts stay indexed
+    @staticmethod
+    def _insert_batch(rows):
         conn = DatabaseCRUD._get_connection()
         if conn:
             try:
                 cursor = conn.cursor()
-                current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('SELECT COALESCE(MAX(id), 0) FROM notes')
+                last_id = cursor.fetchone()[0]
+                ConnectionManager.bulk_insert = True
+                try:
+                    cursor.executemany('''
+                        INSERT INTO notes (title, content, codec, date_added, date_last_edited, size)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', rows)
+                finally:
+                    ConnectionManager.bulk_insert = False
+                cursor.execute('''
+                    INSERT INTO notes_fts (rowid, title, content)
+                    SELECT id, title, note_text(content, codec) FROM notes WHERE id > ?
+                ''', (last_id,))
                 cursor.execute('''
-                    INSERT INTO notes (title, content, date_added, date_last_edited)
-                    VALUES (?, ?, ?, ?)
-                ''', (title, content, current_time, current_time))
+                    INSERT OR REPLACE INTO note_changes (note_id, deleted)
+                    SELECT id, 0 FROM notes WHERE id > ?
+                ''', (last_id,))
                 conn.commit()
-                return cursor.lastrowid
-            except sqlite3.Error:
+                return True
+            except sqlite3.Error as e:
+                print(f"Error importing notes: {e}")
+                conn.rollback()
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
+    # apply the configured compression to note content, returns (stored value, codec)
+    @staticmethod
+    def _compress(content):
+        return compress_content(content, DatabaseCRUD.COMPRESSION_CODEC, DatabaseCRUD.COMPRESSION_THRESHOLD)
+
     # edit the existing note
     @staticmethod
     def edit_note(note_id, title, content):
@@ -90,18 +492,264 @@ class DatabaseCRUD:
         if conn:
             try:
                 cursor = conn.cursor()
-                current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                current_time = now_ms()
+                stored, codec = DatabaseCRUD._compress(content)
+                size = len(content.encode('utf-8'))
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('''
+                    SELECT title, note_text(content, codec), date_last_edited FROM notes WHERE id = ?
+                ''', (note_id,))
+                previous = cursor.fetchone()
                 cursor.execute('''
                     UPDATE notes 
-                    SET title = ?, content = ?, date_last_edited = ?
+                    SET title = ?, content = ?, codec = ?, date_last_edited = ?, size = ?
                     WHERE id = ?
-                ''', (title, content, current_time, note_id))
+                ''', (title, stored, codec, current_time, size, note_id))
+                updated = cursor.rowcount > 0
+                # keep the version being replaced in the note's history
+                if previous and (previous[0], previous[1]) != (title, content):
+                    DatabaseCRUD._record_revision(cursor, note_id, *previous)
+                if updated and (not previous or previous[1] != content):
+                    DatabaseCRUD._store_signatures(cursor, [note_id], [content])
                 conn.commit()
-                return cursor.rowcount > 0
+                DatabaseCRUD.note_cache.update(note_id, title=title, content=content, date_last_edited=current_time,
+                                              size=size)
+                return updated
+            except sqlite3.Error:
+                conn.rollback()
+                return False
+            finally:
+                DatabaseCRUD._release_connection()
+        return False
+
+    # edit_note for very large contents passed as an iterable of text chunks, which are
+    # compressed as they arrive instead of being joined into one string first
+    @staticmethod
+    def edit_note_chunks(note_id, title, chunks):
+        import hashlib
+        size = 0
+        digest = hashlib.blake2b(digest_size=16)
+        def measured(chunks):
+            nonlocal size
+            for chunk in chunks:
+                data = chunk.encode('utf-8')
+                size += len(data)
+                digest.update(data)
+                yield chunk
+        stored, codec = compress_chunks(measured(chunks), DatabaseCRUD.COMPRESSION_CODEC,
+                                        DatabaseCRUD.COMPRESSION_THRESHOLD)
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                current_time = now_ms()
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('''
+                    SELECT title, codec, date_last_edited, size, content IS NULL FROM notes WHERE id = ?
+                ''', (note_id,))
+                previous = cursor.fetchone()
+                # compare the text, not the stored values: the same text can be stored plain
+                # or under another codec, depending on the threshold and codec of the time.
+                # the previous text is only read in full when a revision has to keep it
+                content_changed = previous is not None and (
+                    previous[3] not in (None, size)
+                    or DatabaseCRUD._text_digest(conn, note_id, previous[1], previous[4]) != digest.digest())
+                if previous and (previous[0] != title or content_changed):
+                    cursor.execute('SELECT note_text(content, codec) FROM notes WHERE id = ?', (note_id,))
+                    DatabaseCRUD._record_revision(cursor, note_id, previous[0], cursor.fetchone()[0], previous[2])
+                # an unchanged text keeps its stored value, and a column left out of SET does
+                # not fire notes_fts_update, which would decompress the whole note twice
+                if previous is None or content_changed:
+                    cursor.execute('''
+                        UPDATE notes
+                        SET title = ?, content = ?, codec = ?, date_last_edited = ?, size = ?
+                        WHERE id = ?
+                    ''', (title, stored, codec, current_time, size, note_id))
+                elif previous[0] != title:
+                    cursor.execute('UPDATE notes SET title = ?, date_last_edited = ? WHERE id = ?',
+                                   (title, current_time, note_id))
+                else:
+                    cursor.execute('UPDATE notes SET date_last_edited = ? WHERE id = ?', (current_time, note_id))
+                updated = cursor.rowcount > 0
+                # the text only exists in pieces here, index_signatures picks the note up again
+                if content_changed:
+                    DatabaseCRUD._drop_signatures(cursor, [note_id])
+                conn.commit()
+                DatabaseCRUD.note_cache.invalidate(note_id)
+                return updated
+            except sqlite3.Error:
+                conn.rollback()
+                return False
+            finally:
+                DatabaseCRUD._release_connection()
+        return False
+
+    # blake2b digest of a stored note's text, read through incremental blob I/O and
+    # decompressed piece by piece inside the caller's transaction
+    @staticmethod
+    def _text_digest(conn, note_id, codec, is_null=False):
+        import hashlib
+        digest = hashlib.blake2b(digest_size=16)
+        if is_null:
+            return digest.digest()
+        with conn.blobopen('notes', 'content', note_id, readonly=True) as blob:
+            def read_blob():
+                while True:
+                    data = blob.read(1024 * 1024)
+                    if not data:
+                        return
+                    yield data
+            for data in decompress_chunks(read_blob(), codec):
+                digest.update(data)
+        return digest.digest()
+
+    # rewrite stored contents with another codec/threshold (codec None decompresses everything)
+    # works through the table in batches, returns the number of rows rewritten
+    @staticmethod
+    def recompress_notes(codec, threshold, batch_size=500, progress=None):
+        last_id = 0
+        rewritten = 0
+        while True:
+            conn = DatabaseCRUD._get_connection()
+            if not conn:
+                return False
+            try:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute('''
+                    SELECT id, note_text(content, codec), content, codec FROM notes
+                    WHERE id > ? ORDER BY id LIMIT ?
+                ''', (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    conn.commit()
+                    return rewritten
+                updates = []
+                for note_id, text, stored, stored_codec in rows:
+                    new_stored, new_codec = compress_content(text, codec, threshold)
+                    if new_codec != stored_codec or new_stored != stored:
+                        updates.append((new_stored, new_codec, note_id))
+                cursor.execute('DROP TRIGGER IF EXISTS notes_fts_update')
+                cursor.executemany('UPDATE notes SET content = ?, codec = ? WHERE id = ?', updates)
+                cursor.execute(DatabaseCRUD.FTS_UPDATE_TRIGGER)
+                conn.commit()
+                rewritten += len(updates)
+                last_id = rows[-1][0]
+            except sqlite3.Error as e:
+                print(f"Error recompressing notes: {e}")
+                conn.rollback()
+                return False
+            finally:
+                DatabaseCRUD._release_connection()
+            if progress:
+                progress(last_id, rewritten)
+
+    # store one earlier version of a note, as a keyframe or as a delta against the latest keyframe
+    @staticmethod
+    def _record_revision(cursor, note_id, title, content, date_saved):
+        cursor.execute('''
+            SELECT id, data FROM revisions
+            WHERE note_id = ? AND kind = 'full'
+            ORDER BY id DESC LIMIT 1
+        ''', (note_id,))
+        keyframe = cursor.fetchone()
+        keyframe_id, keyframe_text, deltas = None, None, 0
+        if keyframe:
+            keyframe_id, keyframe_text = keyframe[0], unpack_text(keyframe[1])
+            cursor.execute('SELECT COUNT(*) FROM revisions WHERE note_id = ? AND id > ?', (note_id, keyframe_id))
+            deltas = cursor.fetchone()[0]
+        kind, data = encode_revision(content or "", keyframe_text, deltas)
+        cursor.execute('''
+            INSERT INTO revisions (note_id, kind, base_id, title, data, date_saved)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (note_id, kind, keyframe_id if kind == 'delta' else None, title, data, date_saved))
+
+    # list the earlier versions of a note (without content), newest first
+    @staticmethod
+    def get_revisions(note_id):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, note_id, title, kind, date_saved FROM revisions
+                    WHERE note_id = ? ORDER BY id DESC
+                ''', (note_id,))
+                columns = ['id', 'note_id', 'title', 'kind', 'date_saved']
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            except sqlite3.Error:
+                return []
+            finally:
+                DatabaseCRUD._release_connection()
+        return []
+
+    # rebuild one revision: its keyframe plus at most one delta
+    @staticmethod
+    def get_revision(revision_id):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT revision.id, revision.note_id, revision.title, revision.kind, revision.data,
+                           revision.date_saved, keyframe.data
+                    FROM revisions AS revision
+                    LEFT JOIN revisions AS keyframe ON keyframe.id = revision.base_id
+                    WHERE revision.id = ?
+                ''', (revision_id,))
+                row = cursor.fetchone()
             except sqlite3.Error:
+                return None
+            finally:
+                DatabaseCRUD._release_connection()
+            if not row:
+                return None
+            revision_id, note_id, title, kind, data, date_saved, keyframe_data = row
+            if kind == 'full':
+                content = unpack_text(data)
+            else:
+                content = apply_delta(unpack_text(keyframe_data), data)
+            return {'id': revision_id, 'note_id': note_id, 'title': title, 'content': content, 'date_saved': date_saved}
+        return None
+
+    # drop old revisions: all but the newest keep_last per note and/or those older than max_age_days
+    # keyframes that surviving deltas are based on are kept; returns the number deleted
+    @staticmethod
+    def prune_revisions(note_id=None, keep_last=None, max_age_days=None):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                if note_id is None:
+                    cursor.execute('SELECT id, note_id, base_id, date_saved FROM revisions ORDER BY note_id, id DESC')
+                else:
+                    cursor.execute('''
+                        SELECT id, note_id, base_id, date_saved FROM revisions
+                        WHERE note_id = ? ORDER BY id DESC
+                    ''', (note_id,))
+                rows = cursor.fetchall()
+                cutoff = None
+                if max_age_days is not None:
+                    cutoff = now_ms() - max_age_days * 86400000
+                doomed = set()
+                position = {}
+                for revision_id, revision_note, base_id, date_saved in rows:
+                    position[revision_note] = position.get(revision_note, 0) + 1
+                    if keep_last is not None and position[revision_note] > keep_last:
+                        doomed.add(revision_id)
+                    elif cutoff is not None and date_saved is not None and date_saved < cutoff:
+                        doomed.add(revision_id)
+                needed = {base_id for revision_id, _, base_id, _ in rows if base_id is not None and revision_id not in doomed}
+                doomed -= needed
+                cursor.executemany('DELETE FROM revisions WHERE id = ?', ((revision_id,) for revision_id in doomed))
+                conn.commit()
+                return len(doomed)
+            except sqlite3.Error:
+                conn.rollback()
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
     # delete note by id
@@ -112,12 +760,19 @@ class DatabaseCRUD:
             try:
                 cursor = conn.cursor()
                 cursor.execute('DELETE FROM notes WHERE id = ?', (note_id,))
+                deleted = cursor.rowcount > 0
+                cursor.execute('DELETE FROM drafts WHERE note_id = ?', (note_id,))
+                cursor.execute('DELETE FROM revisions WHERE note_id = ?', (note_id,))
+                cursor.execute('DELETE FROM note_tags WHERE note_id = ?', (note_id,))
+                DatabaseCRUD._drop_signatures(cursor, [note_id])
                 conn.commit()
-                return cursor.rowcount > 0
+                DatabaseCRUD.note_cache.invalidate(note_id)
+                return deleted
             except sqlite3.Error:
+                conn.rollback()
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
     # save font size
@@ -131,9 +786,10 @@ class DatabaseCRUD:
                 conn.commit()
                 return True
             except sqlite3.Error:
+                conn.rollback()
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
     # save font family
@@ -147,9 +803,10 @@ class DatabaseCRUD:
                 conn.commit()
                 return True
             except sqlite3.Error:
+                conn.rollback()
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
     # save language
@@ -163,9 +820,10 @@ class DatabaseCRUD:
                 conn.commit()
                 return True
             except sqlite3.Error:
+                conn.rollback()
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
     # save theme
@@ -179,11 +837,80 @@ class DatabaseCRUD:
                 conn.commit()
                 return True
             except sqlite3.Error:
+                conn.rollback()
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
+    # save several settings in a single transaction
+    @staticmethod
+    def save_settings(changes):
+        unknown = set(changes) - set(DatabaseCRUD.SETTINGS_COLUMNS)
+        if unknown:
+            print(f"Validation Error: Unknown settings: {', '.join(sorted(unknown))}")
+            return False
+        try:
+            DatabaseCRUD.validate_settings(font_size=changes.get('font_size'), font_family=changes.get('font_family'),
+                                           save_location=changes.get('backup_location'),
+                                           backup_interval=changes.get('backup_interval'),
+                                           backup_keep=changes.get('backup_keep'),
+                                           performance_profile=changes.get('performance_profile'))
+        except InputValidationError as e:
+            print(f"Validation Error: {e}")
+            return False
+        if not changes:
+            return True
+
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                assignments = ", ".join(f"{column} = ?" for column in changes)
+                cursor.execute(f'UPDATE settings SET {assignments} WHERE id = 1', tuple(changes.values()))
+                conn.commit()
+                return True
+            except sqlite3.Error:
+                conn.rollback()
+                return False
+            finally:
+                DatabaseCRUD._release_connection()
+        return False
+
+    # switch the shared connection to a performance profile (ConnectionManager.PROFILES)
+    @staticmethod
+    def set_performance_profile(name):
+        try:
+            DatabaseCRUD.validate_settings(performance_profile=name)
+            ConnectionManager.set_profile(name)
+            return True
+        except InputValidationError as e:
+            print(f"Validation Error: {e}")
+            return False
+        except sqlite3.Error as e:
+            print(f"Error applying performance profile: {e}")
+            return False
+
+    # get the whole settings row as a dictionary; columns added by a migration still running
+    # in the background are left out, so the caller keeps their defaults
+    @staticmethod
+    def get_settings():
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT * FROM settings WHERE id = 1')
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                stored = dict(zip([column[0] for column in cursor.description], row))
+                return {column: stored[column] for column in DatabaseCRUD.SETTINGS_COLUMNS if column in stored}
+            except sqlite3.Error:
+                return None
+            finally:
+                DatabaseCRUD._release_connection()
+        return None
+
     # get all notes as list of dictionaries
     @staticmethod
     def get_notes():
@@ -191,33 +918,731 @@ class DatabaseCRUD:
         if conn:
             try:
                 cursor = conn.cursor()
-                cursor.execute('SELECT * FROM notes ORDER BY date_last_edited DESC')
+                cursor.execute('''
+                    SELECT id, title, note_text(content, codec), date_added, date_last_edited
+                    FROM notes ORDER BY date_last_edited DESC
+                ''')
                 columns = ['id', 'title', 'content', 'date_added', 'date_last_edited']
                 notes = [dict(zip(columns, row)) for row in cursor.fetchall()]
                 return notes
             except sqlite3.Error:
                 return []
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
+        return []
+
+    # yield every note in id order, batch_size rows at a time
+    # the connection is only held while a batch is fetched
+    @staticmethod
+    def iter_notes(batch_size=1000):
+        last_id = 0
+        columns = ['id', 'title', 'content', 'date_added', 'date_last_edited']
+        while True:
+            conn = DatabaseCRUD._get_connection()
+            if not conn:
+                return
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT id, title, note_text(content, codec), date_added, date_last_edited
+                    FROM notes WHERE id > ? ORDER BY id LIMIT ?
+                ''', (last_id, batch_size))
+                rows = cursor.fetchall()
+            except sqlite3.Error as e:
+                print(f"Error reading notes: {e}")
+                return
+            finally:
+                DatabaseCRUD._release_connection()
+            for row in rows:
+                yield dict(zip(columns, row))
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][0]
+
+    # ORDER BY clause and keyset condition (with its parameters) of a list sorted by one of
+    # SORT_COLUMNS; before is the (sort value, id) of the last row already shown
+    @staticmethod
+    def _list_order(sort, descending, before):
+        column, collation, _ = DatabaseCRUD.SORT_COLUMNS[sort]
+        collate = f' COLLATE {collation}' if collation else ''
+        direction = 'DESC' if descending else 'ASC'
+        order = f'ORDER BY {column}{collate} {direction}, notes.id {direction}'
+        if before is None:
+            return order, '1', []
+        # the collation goes on the parameter, with it on the column SQLite would not seek the index
+        return order, f"({column}, notes.id) {'<' if descending else '>'} (?{collate}, ?)", [before[0], before[1]]
+
+    # get one page of list rows (LIST_COLUMNS, no content) sorted by one of SORT_COLUMNS,
+    # newest edit first by default; pass the (sort value, id) of the last row already shown
+    # to get the next page; every order is a walk of its covering index
+    @staticmethod
+    def get_notes_page(before=None, limit=100, sort='edited', descending=True):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                order, page, params = DatabaseCRUD._list_order(sort, descending, before)
+                cursor.execute(f'''
+                    SELECT {DatabaseCRUD.LIST_SELECT}
+                    FROM notes INDEXED BY {DatabaseCRUD.SORT_COLUMNS[sort][2]}
+                    WHERE {page}
+                    {order}
+                    LIMIT ?
+                ''', params + [limit])
+                return [dict(zip(DatabaseCRUD.LIST_COLUMNS, row)) for row in cursor.fetchall()]
+            except sqlite3.Error:
+                return []
+            finally:
+                DatabaseCRUD._release_connection()
         return []
 
-    # get note by id
+    # the list fields of one note (no content), as returned by get_notes_page
     @staticmethod
-    def get_note(note_id):
+    def get_note_summary(note_id):
         conn = DatabaseCRUD._get_connection()
         if conn:
             try:
                 cursor = conn.cursor()
-                cursor.execute('SELECT * FROM notes WHERE id = ?', (note_id,))
-                columns = ['id', 'title', 'content', 'date_added', 'date_last_edited']
+                cursor.execute(f'SELECT {DatabaseCRUD.LIST_SELECT} FROM notes WHERE id = ?', (note_id,))
+                row = cursor.fetchone()
+                return dict(zip(DatabaseCRUD.LIST_COLUMNS, row)) if row else None
+            except sqlite3.Error:
+                return None
+            finally:
+                DatabaseCRUD._release_connection()
+        return None
+
+    # drop cached notes that another process changed; PRAGMA data_version only moves when
+    # another connection commits, so while nobody else writes this is one pragma per call
+    seen_data_version = None
+    seen_change_seq = None
+
+    @staticmethod
+    def _sync_note_cache(cursor):
+        cursor.execute('PRAGMA data_version')
+        # data_version is per connection, a reopened connection starts over
+        data_version = (cursor.connection, cursor.fetchone()[0])
+        if data_version == DatabaseCRUD.seen_data_version:
+            return
+        reopened = DatabaseCRUD.seen_data_version is None or DatabaseCRUD.seen_data_version[0] is not cursor.connection
+        DatabaseCRUD.seen_data_version = data_version
+        if reopened or DatabaseCRUD.seen_change_seq is None:
+            DatabaseCRUD.note_cache.clear()
+        else:
+            cursor.execute('SELECT note_id FROM note_changes WHERE seq > ?', (DatabaseCRUD.seen_change_seq,))
+            for (note_id,) in cursor.fetchall():
+                DatabaseCRUD.note_cache.invalidate(note_id)
+        cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM note_changes')
+        DatabaseCRUD.seen_change_seq = cursor.fetchone()[0]
+
+    # cheap "did anything change" check for open windows: data_version moves when another
+    # connection commits, seq is the latest change sequence number
+    @staticmethod
+    def get_change_state():
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('PRAGMA data_version')
+                data_version = cursor.fetchone()[0]
+                cursor.execute('SELECT COALESCE(MAX(seq), 0) FROM note_changes')
+                return {'data_version': data_version, 'seq': cursor.fetchone()[0]}
+            except sqlite3.Error:
+                return None
+            finally:
+                DatabaseCRUD._release_connection()
+        return None
+
+    # counts and sizes of the database contents; sizes are UTF-8 bytes of the note texts,
+    # file_bytes excludes the WAL file
+    @staticmethod
+    def get_stats():
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT count(*), COALESCE(sum(size), 0), COALESCE(max(size), 0) FROM notes')
+                stats = dict(zip(['notes', 'total_size', 'largest_size'], cursor.fetchone()))
+                cursor.execute("SELECT COALESCE(sum(kind = 'tag'), 0), COALESCE(sum(kind = 'notebook'), 0) FROM tags")
+                stats['tags'], stats['notebooks'] = cursor.fetchone()
+                for table in ('revisions', 'drafts', 'note_signatures'):
+                    cursor.execute(f'SELECT count(*) FROM {table}')
+                    stats[table] = cursor.fetchone()[0]
+                for pragma in ('user_version', 'page_size', 'page_count', 'freelist_count'):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    stats[pragma] = cursor.fetchone()[0]
+                stats['file_bytes'] = stats['page_size'] * stats['page_count']
+                stats['performance_profile'] = ConnectionManager.profile
+                return stats
+            except sqlite3.Error:
+                return None
+            finally:
+                DatabaseCRUD._release_connection()
+        return None
+
+    # notes changed after change sequence number since_seq: returns the new sequence number,
+    # the list fields of changed notes (as get_notes_page) and the ids of deleted notes
+    @staticmethod
+    def get_changes(since_seq):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT note_changes.seq, note_changes.note_id, note_changes.deleted, {DatabaseCRUD.LIST_SELECT}
+                    FROM note_changes LEFT JOIN notes ON notes.id = note_changes.note_id
+                    WHERE note_changes.seq > ?
+                    ORDER BY note_changes.seq
+                ''', (since_seq,))
+                seq = since_seq
+                changed = []
+                deleted = []
+                for row in cursor.fetchall():
+                    seq, note_id, is_deleted = row[:3]
+                    if is_deleted or row[3] is None:
+                        deleted.append(note_id)
+                    else:
+                        changed.append(dict(zip(DatabaseCRUD.LIST_COLUMNS, row[3:])))
+                return {'seq': seq, 'changed': changed, 'deleted': deleted}
+            except sqlite3.Error:
+                return None
+            finally:
+                DatabaseCRUD._release_connection()
+        return None
+
+    # get note by id; with max_size, content longer than max_size UTF-8 bytes (the size
+    # column, on both the cache and the query path) comes back as None so the caller can
+    # stream it with iter_note_content
+    @staticmethod
+    def get_note(note_id, max_size=None):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                DatabaseCRUD._sync_note_cache(cursor)
+                cached = DatabaseCRUD.note_cache.get(note_id)
+                if cached is not None and (max_size is None or cached['size'] <= max_size):
+                    return cached
+                cursor.execute('''
+                    SELECT id, title,
+                           CASE WHEN ? IS NULL OR size <= ? THEN note_text(content, codec) END,
+                           date_added, date_last_edited, size
+                    FROM notes WHERE id = ?
+                ''', (max_size, max_size, note_id))
+                columns = ['id', 'title', 'content', 'date_added', 'date_last_edited', 'size']
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                note = dict(zip(columns, row))
+                if note['content'] is not None:
+                    DatabaseCRUD.note_cache.put(note)
+                return note
+            except sqlite3.Error:
+                return None
+            finally:
+                DatabaseCRUD._release_connection()
+        return None
+
+    # stream a note's text through incremental blob I/O, decompressing as it goes, so a huge
+    # note never exists as one compressed and one decompressed copy at the same time;
+    # progress(bytes_read, total_bytes) is called per chunk; the connection stays borrowed
+    # until the generator is exhausted or closed
+    @staticmethod
+    def iter_note_content(note_id, chunk_size=1024 * 1024, progress=None):
+        conn = DatabaseCRUD._get_connection()
+        if not conn:
+            return
+        try:
+            row = conn.execute('SELECT codec FROM notes WHERE id = ?', (note_id,)).fetchone()
+            if row is None:
+                return
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            with conn.blobopen('notes', 'content', note_id, readonly=True) as blob:
+                total = len(blob)
+                def read_blob():
+                    while True:
+                        data = blob.read(chunk_size)
+                        if not data:
+                            return
+                        if progress:
+                            progress(blob.tell(), total)
+                        yield data
+                for data in decompress_chunks(read_blob(), row[0]):
+                    text = decoder.decode(data)
+                    if text:
+                        yield text
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+        finally:
+            DatabaseCRUD._release_connection()
+
+    # full-text search, best matches first, with a highlighted content snippet
+    @staticmethod
+    def search_notes(query, limit=50):
+        fts_query = DatabaseCRUD._build_fts_query(query)
+        if not fts_query:
+            return []
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT {DatabaseCRUD.LIST_SELECT}, snippet(notes_fts, 1, '[', ']', '...', 12),
+                           bm25(notes_fts, 10.0, 1.0) AS rank
+                    FROM notes_fts JOIN notes ON notes.id = notes_fts.rowid
+                    WHERE notes_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ?
+                ''', (fts_query, limit))
+                columns = DatabaseCRUD.LIST_COLUMNS + ['snippet', 'rank']
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            except sqlite3.Error:
+                return []
+            finally:
+                DatabaseCRUD._release_connection()
+        return []
+
+    # attach tags (created when missing) to a note, returns True on success
+    @staticmethod
+    def tag_note(note_id, names, kind='tag'):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                for tag_id in DatabaseCRUD._tag_ids(cursor, names, kind, create=True):
+                    cursor.execute('INSERT OR IGNORE INTO note_tags (tag_id, note_id) VALUES (?, ?)', (tag_id, note_id))
+                conn.commit()
+                return True
+            except sqlite3.Error:
+                conn.rollback()
+                return False
+            finally:
+                DatabaseCRUD._release_connection()
+        return False
+
+    @staticmethod
+    def untag_note(note_id, names, kind='tag'):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                for tag_id in DatabaseCRUD._tag_ids(cursor, names, kind, create=False):
+                    cursor.execute('DELETE FROM note_tags WHERE tag_id = ? AND note_id = ?', (tag_id, note_id))
+                conn.commit()
+                return True
+            except sqlite3.Error:
+                conn.rollback()
+                return False
+            finally:
+                DatabaseCRUD._release_connection()
+        return False
+
+    # replace all tags of one kind on a note; set_note_tags(id, [name], 'notebook') moves a note to a notebook
+    @staticmethod
+    def set_note_tags(note_id, names, kind='tag'):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                wanted = set(DatabaseCRUD._tag_ids(cursor, names, kind, create=True))
+                cursor.execute('''
+                    SELECT note_tags.tag_id FROM note_tags JOIN tags ON tags.id = note_tags.tag_id
+                    WHERE note_tags.note_id = ? AND tags.kind = ?
+                ''', (note_id, kind))
+                current = {row[0] for row in cursor.fetchall()}
+                cursor.executemany('DELETE FROM note_tags WHERE tag_id = ? AND note_id = ?',
+                                   [(tag_id, note_id) for tag_id in current - wanted])
+                cursor.executemany('INSERT INTO note_tags (tag_id, note_id) VALUES (?, ?)',
+                                   [(tag_id, note_id) for tag_id in wanted - current])
+                conn.commit()
+                return True
+            except sqlite3.Error:
+                conn.rollback()
+                return False
+            finally:
+                DatabaseCRUD._release_connection()
+        return False
+
+    # ids of the named tags, optionally creating the missing ones
+    @staticmethod
+    def _tag_ids(cursor, names, kind, create):
+        ids = []
+        for name in {name.strip() for name in names if name and name.strip()}:
+            if create:
+                cursor.execute('INSERT OR IGNORE INTO tags (kind, name) VALUES (?, ?)', (kind, name))
+            cursor.execute('SELECT id FROM tags WHERE kind = ? AND name = ?', (kind, name))
+            row = cursor.fetchone()
+            if row:
+                ids.append(row[0])
+        return ids
+
+    # every tag and notebook with its note count, the counts are stored, not computed
+    @staticmethod
+    def get_tags(kind=None):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                if kind is None:
+                    cursor.execute('SELECT id, kind, name, note_count FROM tags ORDER BY kind, name')
+                else:
+                    cursor.execute('SELECT id, kind, name, note_count FROM tags WHERE kind = ? ORDER BY name', (kind,))
+                columns = ['id', 'kind', 'name', 'note_count']
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            except sqlite3.Error:
+                return []
+            finally:
+                DatabaseCRUD._release_connection()
+        return []
+
+    @staticmethod
+    def get_note_tags(note_id):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT tags.id, tags.kind, tags.name, tags.note_count
+                    FROM note_tags JOIN tags ON tags.id = note_tags.tag_id
+                    WHERE note_tags.note_id = ?
+                    ORDER BY tags.kind, tags.name
+                ''', (note_id,))
+                columns = ['id', 'kind', 'name', 'note_count']
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            except sqlite3.Error:
+                return []
+            finally:
+                DatabaseCRUD._release_connection()
+        return []
+
+    # a page of notes carrying any (or with match_all, every) one of tag_ids, with the
+    # same sort options and keyset cursor as get_notes_page
+    @staticmethod
+    def get_notes_by_tags(tag_ids, match_all=False, before=None, limit=100, sort='edited', descending=True):
+        tag_ids = list(dict.fromkeys(tag_ids))
+        if not tag_ids:
+            return DatabaseCRUD.get_notes_page(before, limit, sort, descending)
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                marks = ", ".join("?" * len(tag_ids))
+                cursor.execute(f'SELECT id, note_count FROM tags WHERE id IN ({marks}) ORDER BY note_count', tag_ids)
+                counts = cursor.fetchall()
+                if len(counts) < len(tag_ids) and match_all:
+                    return []
+                # sorting all matches costs about `matches` rows, walking the sort index
+                # and probing note_tags about limit * notes / matches; pick the cheaper plan
+                matches = counts[0][1] if match_all and counts else sum(count for _, count in counts)
+                cursor.execute('SELECT max(id) FROM notes')
+                sort_matches = matches * matches <= limit * (cursor.fetchone()[0] or 0)
+                order, page, params = DatabaseCRUD._list_order(sort, descending, before)
+                index = DatabaseCRUD.SORT_COLUMNS[sort][2]
+                if match_all:
+                    # start from the rarest tag, the others are primary-key probes
+                    rarest = counts[0][0]
+                    others = [tag_id for tag_id, _ in counts[1:]]
+                    probes = "".join(" AND EXISTS (SELECT 1 FROM note_tags AS t WHERE t.tag_id = ? AND t.note_id = notes.id)"
+                                     for _ in others)
+                    if sort_matches:
+                        cursor.execute(f'''
+                            SELECT {DatabaseCRUD.LIST_SELECT}
+                            FROM note_tags CROSS JOIN notes ON notes.id = note_tags.note_id
+                            WHERE note_tags.tag_id = ? {probes} AND {page}
+                            {order}
+                            LIMIT ?
+                        ''', [rarest] + others + params + [limit])
+                    else:
+                        cursor.execute(f'''
+                            SELECT {DatabaseCRUD.LIST_SELECT}
+                            FROM notes INDEXED BY {index}
+                            WHERE EXISTS (SELECT 1 FROM note_tags AS t WHERE t.tag_id = ? AND t.note_id = notes.id)
+                                  {probes} AND {page}
+                            {order}
+                            LIMIT ?
+                        ''', [rarest] + others + params + [limit])
+                elif sort_matches:
+                    cursor.execute(f'''
+                        SELECT {DatabaseCRUD.LIST_SELECT}
+                        FROM notes
+                        WHERE notes.id IN (SELECT note_id FROM note_tags WHERE tag_id IN ({marks})) AND {page}
+                        {order}
+                        LIMIT ?
+                    ''', tag_ids + params + [limit])
+                else:
+                    cursor.execute(f'''
+                        SELECT {DatabaseCRUD.LIST_SELECT}
+                        FROM notes INDEXED BY {index}
+                        WHERE EXISTS (SELECT 1 FROM note_tags AS t WHERE t.tag_id IN ({marks}) AND t.note_id = notes.id)
+                              AND {page}
+                        {order}
+                        LIMIT ?
+                    ''', tag_ids + params + [limit])
+                return [dict(zip(DatabaseCRUD.LIST_COLUMNS, row)) for row in cursor.fetchall()]
+            except sqlite3.Error:
+                return []
+            finally:
+                DatabaseCRUD._release_connection()
+        return []
+
+    # (re)compute the MinHash signatures of notes inside the caller's transaction
+    @staticmethod
+    def _store_signatures(cursor, note_ids, texts):
+        DatabaseCRUD._drop_signatures(cursor, note_ids)
+        if DatabaseCRUD.COMPUTE_SIGNATURES and dedup.available():
+            DatabaseCRUD._insert_signatures(cursor, note_ids, dedup.signatures(texts))
+
+    # notes that already have a signature keep it, so a backfill never overwrites the
+    # signature an edit stored in the meantime
+    @staticmethod
+    def _insert_signatures(cursor, note_ids, signatures):
+        indexed = set()
+        for start in range(0, len(note_ids), 500):
+            chunk = note_ids[start:start + 500]
+            cursor.execute(f'SELECT note_id FROM note_signatures WHERE note_id IN ({", ".join("?" * len(chunk))})',
+                           chunk)
+            indexed.update(row[0] for row in cursor.fetchall())
+        keep = [i for i, note_id in enumerate(note_ids) if note_id not in indexed]
+        keys = dedup.band_keys(signatures).tolist()
+        empty = dedup.empty(signatures).tolist()
+        # notes too short to compare are stored with an empty signature and no buckets, so
+        # index_signatures skips them and they are never candidates
+        cursor.executemany('INSERT INTO note_signatures (note_id, signature) VALUES (?, ?)',
+                           ((note_ids[i], b'' if empty[i] else dedup.pack(signatures[i])) for i in keep))
+        cursor.executemany('INSERT OR IGNORE INTO note_bands (band, bucket, note_id) VALUES (?, ?, ?)',
+                           ((band, key, note_ids[i]) for i in keep if not empty[i] for band, key in enumerate(keys[i])))
+
+    # remove signatures and their band rows; the band keys are recomputed from the stored
+    # signature, so every row is deleted through the primary key
+    @staticmethod
+    def _drop_signatures(cursor, note_ids):
+        for note_id in note_ids:
+            cursor.execute('SELECT signature FROM note_signatures WHERE note_id = ?', (note_id,))
+            row = cursor.fetchone()
+            if row is None:
+                continue
+            # empty signatures have no band rows; numpy is only imported once there is a
+            # signature to remove, without it the band rows are found by scanning
+            if row[0] and dedup.available():
+                keys = dedup.band_keys(dedup.unpack(row[0]))[0].tolist()
+                cursor.executemany('DELETE FROM note_bands WHERE band = ? AND bucket = ? AND note_id = ?',
+                                   [(band, key, note_id) for band, key in enumerate(keys)])
+            elif row[0]:
+                cursor.execute('DELETE FROM note_bands WHERE note_id = ?', (note_id,))
+            cursor.execute('DELETE FROM note_signatures WHERE note_id = ?', (note_id,))
+
+    # compute missing signatures (imported notes, notes from before signatures existed)
+    # batch_size notes at a time; the signatures are computed without holding the connection
+    # returns the number of notes indexed, progress(indexed) is called per batch
+    @staticmethod
+    def index_signatures(batch_size=2000, progress=None):
+        if not dedup.available():
+            return 0
+        last_id = 0
+        indexed = 0
+        while True:
+            conn = DatabaseCRUD._get_connection()
+            if not conn:
+                return indexed
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT notes.id, note_text(notes.content, notes.codec) FROM notes
+                    LEFT JOIN note_signatures ON note_signatures.note_id = notes.id
+                    WHERE notes.id > ? AND note_signatures.note_id IS NULL
+                    ORDER BY notes.id LIMIT ?
+                ''', (last_id, batch_size))
+                rows = cursor.fetchall()
+            except sqlite3.Error:
+                return indexed
+            finally:
+                DatabaseCRUD._release_connection()
+            if not rows:
+                return indexed
+            last_id = rows[-1][0]
+            signatures = dedup.signatures([row[1] for row in rows])
+            conn = DatabaseCRUD._get_connection()
+            if not conn:
+                return indexed
+            try:
+                cursor = conn.cursor()
+                cursor.execute('BEGIN IMMEDIATE')
+                DatabaseCRUD._insert_signatures(cursor, [row[0] for row in rows], signatures)
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                return indexed
+            finally:
+                DatabaseCRUD._release_connection()
+            indexed += len(rows)
+            if progress:
+                progress(indexed)
+
+    # notes whose estimated similarity to note_id is at least threshold, most similar first;
+    # candidates come from shared LSH buckets, so this never compares against every note
+    @staticmethod
+    def find_similar_notes(note_id, threshold=0.5, limit=20):
+        if not dedup.available():
+            return []
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('SELECT signature FROM note_signatures WHERE note_id = ?', (note_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute('SELECT note_text(content, codec) FROM notes WHERE id = ?', (note_id,))
+                    text = cursor.fetchone()
+                    if text is None:
+                        return []
+                    signature = dedup.signatures([text[0]])[0]
+                elif not row[0]:
+                    return []
+                else:
+                    signature = dedup.unpack(row[0])
+                if dedup.empty(signature)[0]:
+                    return []
+                keys = dedup.band_keys(signature)[0].tolist()
+                lookups = " UNION ".join(["SELECT note_id FROM note_bands WHERE band = ? AND bucket = ?"] * len(keys))
+                cursor.execute(f'''
+                    SELECT notes.id, notes.title, notes.date_last_edited, note_signatures.signature
+                    FROM ({lookups}) AS candidates
+                    JOIN notes ON notes.id = candidates.note_id
+                    JOIN note_signatures ON note_signatures.note_id = candidates.note_id
+                    WHERE candidates.note_id != ? AND length(note_signatures.signature) > 0
+                ''', [value for band, key in enumerate(keys) for value in (band, key)] + [note_id])
+                candidates = cursor.fetchall()
+            except sqlite3.Error:
+                return []
+            finally:
+                DatabaseCRUD._release_connection()
+            if not candidates:
+                return []
+            scores = dedup.similarity(signature, [dedup.unpack(candidate[3]) for candidate in candidates]).tolist()
+            similar = [{'id': candidate[0], 'title': candidate[1], 'date_last_edited': candidate[2], 'similarity': score}
+                       for candidate, score in zip(candidates, scores) if score >= threshold]
+            similar.sort(key=lambda note: note['similarity'], reverse=True)
+            return similar[:limit]
+        return []
+
+    # groups of near-duplicate note ids (estimated similarity >= threshold), largest first
+    # each LSH bucket is checked against its first note only, so the work is linear in the
+    # number of bucket entries rather than quadratic in the bucket sizes
+    @staticmethod
+    def find_duplicates(threshold=0.8):
+        if not dedup.available():
+            return []
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT group_concat(note_id) FROM note_bands
+                    GROUP BY band, bucket HAVING COUNT(*) > 1
+                ''')
+                buckets = [[int(note_id) for note_id in row[0].split(",")] for row in cursor.fetchall()]
+                involved = sorted({note_id for bucket in buckets for note_id in bucket})
+                signatures = {}
+                for start in range(0, len(involved), 500):
+                    chunk = involved[start:start + 500]
+                    marks = ", ".join("?" * len(chunk))
+                    cursor.execute(f'''
+                        SELECT note_id, signature FROM note_signatures
+                        WHERE note_id IN ({marks}) AND length(signature) > 0
+                    ''', chunk)
+                    signatures.update((note_id, dedup.unpack(data)) for note_id, data in cursor.fetchall())
+            except sqlite3.Error:
+                return []
+            finally:
+                DatabaseCRUD._release_connection()
+            parent = {}
+            def root(note_id):
+                while parent.get(note_id, note_id) != note_id:
+                    parent[note_id] = parent.get(parent[note_id], parent[note_id])
+                    note_id = parent[note_id]
+                return note_id
+            for bucket in buckets:
+                first, others = bucket[0], [note_id for note_id in bucket[1:] if note_id in signatures]
+                if first not in signatures or not others:
+                    continue
+                scores = dedup.similarity(signatures[first], [signatures[note_id] for note_id in others])
+                for note_id, score in zip(others, scores.tolist()):
+                    if score >= threshold:
+                        parent[root(note_id)] = root(first)
+            groups = {}
+            for note_id in parent:
+                groups.setdefault(root(note_id), set()).add(note_id)
+            return sorted((sorted(group) for group in groups.values()), key=len, reverse=True)
+        return []
+
+    # turn free text into an FTS5 query: every word must match as a prefix
+    @staticmethod
+    def _build_fts_query(query):
+        words = re.findall(r"\w+", query or "")
+        return " ".join(f'"{word}"*' for word in words)
+
+    # save (or replace) the autosaved draft of an editor
+    @staticmethod
+    def save_draft(draft_key, note_id, title, content, content_hash):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                current_time = now_ms()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO drafts (draft_key, note_id, title, content, content_hash, date_saved)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (draft_key, note_id, title, content, content_hash, current_time))
+                conn.commit()
+                return True
+            except sqlite3.Error:
+                conn.rollback()
+                return False
+            finally:
+                DatabaseCRUD._release_connection()
+        return False
+
+    # get a draft by key
+    @staticmethod
+    def get_draft(draft_key):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT draft_key, note_id, title, content, content_hash, date_saved
+                    FROM drafts WHERE draft_key = ?
+                ''', (draft_key,))
+                columns = ['draft_key', 'note_id', 'title', 'content', 'content_hash', 'date_saved']
                 row = cursor.fetchone()
                 return dict(zip(columns, row)) if row else None
             except sqlite3.Error:
                 return None
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return None
 
+    # delete a draft once it was saved as a note or discarded
+    @staticmethod
+    def delete_draft(draft_key):
+        conn = DatabaseCRUD._get_connection()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('DELETE FROM drafts WHERE draft_key = ?', (draft_key,))
+                conn.commit()
+                return cursor.rowcount > 0
+            except sqlite3.Error:
+                conn.rollback()
+                return False
+            finally:
+                DatabaseCRUD._release_connection()
+        return False
+
     # get font size
     @staticmethod
     def get_font_size():
@@ -231,7 +1656,7 @@ class DatabaseCRUD:
             except sqlite3.Error:
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
     # get font family
@@ -247,7 +1672,7 @@ class DatabaseCRUD:
             except sqlite3.Error:
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
     # get language
@@ -263,7 +1688,7 @@ class DatabaseCRUD:
             except sqlite3.Error:
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
 
     # get theme
@@ -279,7 +1704,7 @@ class DatabaseCRUD:
             except sqlite3.Error:
                 return False
             finally:
-                conn.close()
+                DatabaseCRUD._release_connection()
         return False
     
     # Validation Methods
@@ -291,7 +1716,8 @@ class DatabaseCRUD:
             raise InputValidationError("Content must be a string.")
 
     # settings input validation
-    def validate_settings(font_size=None, font_family=None, save_location=None):
+    def validate_settings(font_size=None, font_family=None, save_location=None, backup_interval=None, backup_keep=None,
+                          performance_profile=None):
         if font_size is not None:
             if not isinstance(font_size, int) or font_size < 8 or font_size > 72:
                 raise InputValidationError("Font size must be an integer between 8 and 72.")
@@ -301,6 +1727,14 @@ class DatabaseCRUD:
         if save_location is not None:
             if not os.path.isdir(save_location):
                 raise InputValidationError("Save location must be a valid directory path.")
+        if backup_interval is not None:
+            if not isinstance(backup_interval, int) or backup_interval < 0:
+                raise InputValidationError("Backup interval must be a non-negative number of hours.")
+        if backup_keep is not None:
+            if not isinstance(backup_keep, int) or backup_keep < 1:
+                raise InputValidationError("At least one backup must be kept.")
+        if performance_profile is not None and performance_profile not in ConnectionManager.PROFILES:
+            raise InputValidationError(f"Performance profile must be one of {', '.join(ConnectionManager.PROFILES)}.")
 
 # exception class for input validation errors
 class InputValidationError(Exception):
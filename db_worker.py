@@ -0,0 +1,86 @@
+import atexit
+import queue
+import threading
+import time
+import tkinter as tk
+from concurrent.futures import Future
+
+# runs database calls on one background thread so the Tk mainloop never waits on disk
+class DatabaseWorker:
+    POLL_INTERVAL_MS = 15
+    # operations running longer than this show a busy cursor
+    BUSY_DELAY_MS = 150
+
+    def __init__(self):
+        self.requests = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="database-worker", daemon=True)
+                self.thread.start()
+
+    # finish the queued requests and stop the thread
+    def stop(self):
+        with self.lock:
+            if self.thread is None:
+                return
+            self.requests.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                break
+            future, func, args, kwargs = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+    # queue func(*args, **kwargs) on the worker thread, returns a Future
+    def submit(self, func, *args, **kwargs):
+        self.start()
+        future = Future()
+        self.requests.put((future, func, args, kwargs))
+        return future
+
+    # run func on the worker and hand the result to callback on the Tk thread
+    # the callback is skipped if the widget was destroyed in the meantime
+    def call(self, widget, func, *args, callback=None, on_error=None, busy=False):
+        future = self.submit(func, *args)
+        started = time.perf_counter()
+        widget.after(self.POLL_INTERVAL_MS, self._poll, widget, future, callback, on_error, busy, started, False)
+        return future
+
+    def _poll(self, widget, future, callback, on_error, busy, started, busy_shown):
+        try:
+            if not widget.winfo_exists():
+                return
+            if not future.done():
+                if busy and not busy_shown and (time.perf_counter() - started) * 1000 >= self.BUSY_DELAY_MS:
+                    widget.winfo_toplevel().config(cursor="watch")
+                    busy_shown = True
+                widget.after(self.POLL_INTERVAL_MS, self._poll, widget, future, callback, on_error, busy, started, busy_shown)
+                return
+            if busy_shown:
+                widget.winfo_toplevel().config(cursor="")
+        except tk.TclError:
+            return # the application is shutting down
+        error = future.exception()
+        if error is not None:
+            if on_error:
+                on_error(error)
+            else:
+                print(f"Database worker error: {error}")
+        elif callback:
+            callback(future.result())
+
+db_worker = DatabaseWorker()
+atexit.register(db_worker.stop)
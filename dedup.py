@@ -0,0 +1,108 @@
+import zlib
+
+# MinHash signatures of word shingles, split into LSH bands: two notes become candidates
+# when all ROWS values of any band agree, which is likely above ~(1/BANDS)**(1/ROWS) similarity
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+# notes with fewer distinct shingles get no signature: empty and very short notes would
+# otherwise share every bucket and all look like duplicates of each other
+MIN_SHINGLES = 3
+# multiply-shift hashing: h(x) = ((a * x + b) mod 2**64) >> 32 for 32-bit x and odd a,
+# uint64 arithmetic wraps for free so no modulo is needed
+SEED = 20240601
+# shingles hashed per block, bounds the temporary (block x NUM_PERM) matrix to 2 MB
+BLOCK_SHINGLES = 4096
+
+_parameters = None
+
+# numpy is optional, without it notes are simply stored without signatures
+def available():
+    try:
+        import numpy
+    except ImportError:
+        return False
+    return True
+
+def _hash_parameters():
+    global _parameters
+    if _parameters is None:
+        import numpy as np
+        rng = np.random.default_rng(SEED)
+        _parameters = (rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1),
+                       rng.integers(0, 1 << 63, NUM_PERM, dtype=np.uint64))
+    return _parameters
+
+# distinct 32-bit hashes of the note's overlapping SHINGLE_WORDS-word sequences
+# words are split on whitespace only, several times faster than a regex and just as
+# stable for copies of the same text; word_hashes caches crc32 values across a batch
+def shingle_hashes(text, word_hashes=None):
+    import numpy as np
+    words = text.lower().split()
+    if word_hashes is None:
+        word_hashes = {}
+    for word in set(words).difference(word_hashes):
+        word_hashes[word] = zlib.crc32(word.encode("utf-8"))
+    tokens = np.fromiter(map(word_hashes.__getitem__, words), dtype=np.uint64, count=len(words))
+    if len(tokens) >= SHINGLE_WORDS:
+        shingles = np.zeros(len(tokens) - SHINGLE_WORDS + 1, dtype=np.uint64)
+        for offset in range(SHINGLE_WORDS):
+            shingles = shingles * np.uint64(1000003) + tokens[offset:len(tokens) - SHINGLE_WORDS + 1 + offset]
+    else:
+        shingles = tokens
+    return np.unique((shingles ^ (shingles >> np.uint64(32))) & np.uint64(0xFFFFFFFF))
+
+# (len(texts), NUM_PERM) uint32 signatures; all notes of a batch are hashed together,
+# block by block, and reduced per note with minimum.reduceat; notes below MIN_SHINGLES
+# are all 0xFFFFFFFF, see empty()
+def signatures(texts):
+    import numpy as np
+    a, b = _hash_parameters()
+    word_hashes = {}
+    hashes = [shingle_hashes(text or "", word_hashes) for text in texts]
+    # notes without words keep the maximum everywhere
+    result = np.full((len(hashes), NUM_PERM), 0xFFFFFFFF, dtype=np.uint64)
+    if not hashes:
+        return result.astype(np.uint32)
+    owners = np.repeat(np.arange(len(hashes)), [len(h) for h in hashes])
+    flat = np.concatenate(hashes)
+    buffer = np.empty((BLOCK_SHINGLES, NUM_PERM), dtype=np.uint64)
+    for start in range(0, len(flat), BLOCK_SHINGLES):
+        block = flat[start:start + BLOCK_SHINGLES]
+        block_owners = owners[start:start + BLOCK_SHINGLES]
+        values = buffer[:len(block)]
+        np.multiply(block[:, None], a, out=values)
+        values += b
+        values >>= np.uint64(32)
+        starts = np.flatnonzero(np.r_[True, block_owners[1:] != block_owners[:-1]])
+        notes = block_owners[starts]
+        result[notes] = np.minimum(result[notes], np.minimum.reduceat(values, starts, axis=0))
+    result[np.array([len(h) for h in hashes]) < MIN_SHINGLES] = 0xFFFFFFFF
+    return result.astype(np.uint32)
+
+# which rows of signatures() stand for notes too short to have a signature
+def empty(signature_rows):
+    import numpy as np
+    return (np.asarray(signature_rows).reshape(-1, NUM_PERM) == 0xFFFFFFFF).all(axis=1)
+
+# (n, BANDS) int64 bucket keys, one per band of each signature
+def band_keys(signature_rows):
+    import numpy as np
+    rows = np.asarray(signature_rows, dtype=np.uint64).reshape(-1, BANDS, ROWS)
+    keys = np.zeros(rows.shape[:2], dtype=np.uint64)
+    for row in range(ROWS):
+        keys = keys * np.uint64(0x100000001B3) + rows[:, :, row]
+    return keys.view(np.int64)
+
+def pack(signature):
+    return signature.astype("<u4").tobytes()
+
+def unpack(data):
+    import numpy as np
+    return np.frombuffer(data, dtype="<u4")
+
+# estimated Jaccard similarity of one signature against each row of others
+def similarity(signature, others):
+    import numpy as np
+    return (np.asarray(others) == signature).mean(axis=-1)
@@ -1,31 +1,152 @@
+import time
+IMPORT_STARTED = time.perf_counter()
+
+import os
+import sys
 import tkinter as tk
-from tkinter import messagebox
+import hashlib
+import queue
+import threading
+from functools import partial
+from tkinter import messagebox, filedialog
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 from window_utils import center_window
 from database import DatabaseCRUD
 from langpack import I18N
-
-temp_tk = tk.Tk()
-SCREEN_WIDTH = temp_tk.winfo_screenwidth()
-SCREEN_HEIGHT = temp_tk.winfo_screenheight()
-temp_tk.destroy()
+from settings import settings
+from db_worker import db_worker, DatabaseWorker
+from startup_profile import StartupProfile
+from note_list import NoteListModel, SORT_FIELDS, SORT_KEYS
+from window_pool import PooledWindow, WindowPool
+from timestamps import format_timestamp
+from connection import ConnectionManager
 
 THEMES = ['superhero', 'darkly', 'solar', 'cyborg', 'vapor', 'cosmo', 'flatly', 'journal', 'litera', 'lumen', 'minty', 'pulse', 'sandstone', 'united', 'yeti', 'morph', 'simplex', 'cerculean']
 
-DatabaseCRUD.initialize_database()
-lang = I18N(DatabaseCRUD.get_language())
+SEARCH_DELAY_MS = 200
+SEARCH_RESULT_LIMIT = 200
+NOTES_PAGE_SIZE = 100
+AUTOSAVE_INTERVAL_MS = 2000
+DIAGNOSTICS_REFRESH_MS = 1000
+# how often an open notes list checks for changes made by other instances
+CHANGE_POLL_MS = 1000
+# notes stored in more than STREAM_NOTE_SIZE bytes are streamed into the editor, STREAM_INSERT_CHARS per callback
+STREAM_NOTE_SIZE = 512 * 1024
+STREAM_INSERT_CHARS = 256 * 1024
+STREAM_SAVE_LINES = 5000
+STREAM_POLL_MS = 10
+# longer notes only open as a read-only preview of their first PREVIEW_CHARS characters
+EDITABLE_NOTE_CHARS = 5000000
+PREVIEW_CHARS = 1000000
+NEW_NOTE_DRAFT_KEY = "new"
+# sortable columns of the notes list: lang key and width
+NOTE_COLUMNS = {'title': ("title", 220), 'created': ("created", 120), 'edited': ("edited", 120), 'size': ("size", 80)}
+LOAD_MORE_THRESHOLD = 0.9
+# how often the main window shows the progress of a background upgrade or backup
+PROGRESS_POLL_MS = 200
+# how often the main window checks whether an automatic backup is due
+BACKUP_CHECK_MS = 60 * 1000
+# automatic backup choices in the settings: hours between backups and lang key
+BACKUP_INTERVALS = {0: "backup_off", 1: "backup_hourly", 24: "backup_daily", 168: "backup_weekly"}
+
+# runs the performance profile measurement, which uses databases of its own, besides db_worker
+benchmark_worker = DatabaseWorker()
+
+
+# set by main() once the settings are loaded
+lang = None
+
+# font used by the note title and content fields
+def editor_font():
+    return (settings.get("font_family"), settings.get("font_size"))
+
+# debounced draft autosave for an editor window, writes at most once per AUTOSAVE_INTERVAL_MS
+# and only when the title or content hash differs from the last saved draft
+class DraftAutosaver:
+    def __init__(self, window, draft_key, note_id=None):
+        self.window = window
+        self.draft_key = draft_key
+        self.note_id = note_id
+        self.after_id = None
+        self.last_hash = None
+        # set while a note is still being streamed into the editor
+        self.paused = False
+        window.note_content.bind("<<Modified>>", self.handle_modified)
+        window.note_title.bind("<KeyRelease>", self.handle_modified, add="+")
+
+    @staticmethod
+    def content_hash(title, content):
+        return hashlib.blake2b(f"{title}\0{content}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def current_fields(self):
+        return self.window.note_title.get(), self.window.note_content.get("1.0", "end-1c")
+
+    def handle_modified(self, event=None):
+        # <<Modified>> fires again when the flag is reset, ignore that one
+        if event is not None and event.widget is self.window.note_content:
+            if not self.window.note_content.edit_modified():
+                return
+            self.window.note_content.edit_modified(False)
+        if self.after_id is None and not self.paused:
+            self.after_id = self.window.after(AUTOSAVE_INTERVAL_MS, self.save)
+
+    def save(self):
+        self.after_id = None
+        title, content = self.current_fields()
+        content_hash = self.content_hash(title, content)
+        if content_hash == self.last_hash:
+            return
+        self.last_hash = content_hash
+        db_worker.submit(DatabaseCRUD.save_draft, self.draft_key, self.note_id, title, content, content_hash)
+
+    # treat the current field contents as already saved
+    def mark_clean(self):
+        self.last_hash = self.content_hash(*self.current_fields())
+
+    def restore(self, draft):
+        self.window.note_title.delete(0, tk.END)
+        self.window.note_title.insert(0, draft["title"])
+        self.window.note_content.delete("1.0", tk.END)
+        self.window.note_content.insert("1.0", draft["content"])
+        self.last_hash = draft["content_hash"]
+
+    def cancel(self):
+        if self.after_id is not None:
+            self.window.after_cancel(self.after_id)
+            self.after_id = None
+
+    # point a reused editor at another note's draft
+    def retarget(self, draft_key, note_id=None):
+        self.cancel()
+        self.draft_key = draft_key
+        self.note_id = note_id
+        self.last_hash = None
+        self.paused = False
+
+    # drop the draft after the note was saved or the editor was cancelled
+    def discard(self):
+        self.cancel()
+        db_worker.submit(DatabaseCRUD.delete_draft, self.draft_key)
 
 class MainWindow(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title(lang.trn.get("notes_app"))
-        self.style = ttk.Style(theme=DatabaseCRUD.get_theme())
-        dimensions = center_window(SCREEN_WIDTH, SCREEN_HEIGHT, 400, 150)
+        self.style = ttk.Style(theme=settings.get("theme"))
+        dimensions = center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 400, 150)
         self.geometry(dimensions)
         self.create_widgets()
         self.create_layout()
-        self.child_windows = {}
+        # secondary windows are built once and hidden between uses
+        self.windows = WindowPool()
+        # background upgrade and backup threads with the events that cancel them
+        self.migration_thread = self.migration_cancel = None
+        self.backup_thread = self.backup_cancel = None
+        self.last_backup_attempt = 0
+        settings.subscribe(self.handle_settings_changed)
+        self.after_idle(self.check_drafts)
+        self.after(BACKUP_CHECK_MS, self.check_backup_schedule)
     
     def create_widgets(self):
         self.title_label = ttk.Label(self, text=lang.trn.get("welcome"), font=("Helvetica", 16))
@@ -33,6 +154,7 @@ class MainWindow(tk.Tk):
         self.list_notes_button = ttk.Button(self, text=lang.trn.get("list_notes"), command=self.handle_list_notes_button)
         self.settings_button = ttk.Button(self, text=lang.trn.get("settings"), command=self.handle_settings_button, bootstyle='secondary')
         self.help_button = ttk.Button(self, text=lang.trn.get("help"), command=self.handle_help_button, bootstyle='info')
+        self.diagnostics_button = ttk.Button(self, text=lang.trn.get("diagnostics"), command=self.handle_diagnostics_button, bootstyle='secondary')
         self.exit_button = ttk.Button(self, text=lang.trn.get("exit"), command=self.quit, bootstyle='danger')
 
     def create_layout(self):
@@ -43,39 +165,175 @@ class MainWindow(tk.Tk):
         self.list_notes_button.grid(row=1, column=1, pady=5, padx=5, sticky='nswe')
         self.settings_button.grid(row=2, column=0, pady=5, padx=5, sticky='nswe')
         self.help_button.grid(row=2, column=1, pady=5, padx=5, sticky='nswe')
-        self.exit_button.grid(row=3, column=0, pady=5, padx=5, sticky='nswe', columnspan=2)
+        self.diagnostics_button.grid(row=3, column=0, pady=5, padx=5, sticky='nswe')
+        self.exit_button.grid(row=3, column=1, pady=5, padx=5, sticky='nswe')
 
     def handle_settings_button(self):
-        if 'settings' in self.child_windows and self.child_windows['settings'].winfo_exists():
-            self.child_windows['settings'].lift()
-            self.child_windows['settings'].focus_force()
-        else:
-            settings_window = SettingsWindow(self)
-            self.child_windows['settings'] = settings_window
+        self.windows.open('settings', SettingsWindow, self)
 
     def handle_new_note_button(self):
-        if 'new_note' in self.child_windows and self.child_windows['new_note'].winfo_exists():
-            self.child_windows['new_note'].lift()
-            self.child_windows['new_note'].focus_force()
+        self.windows.open('new_note', NewNoteWindow, self)
+
+    # offer to restore a new note that was not saved before the app closed
+    def check_drafts(self):
+        db_worker.call(self, DatabaseCRUD.get_draft, NEW_NOTE_DRAFT_KEY, callback=self.offer_draft)
+
+    def offer_draft(self, draft):
+        if draft is None:
+            return
+        if messagebox.askyesno(lang.trn.get("unsaved_draft"), lang.trn.get("restore_draft")):
+            self.windows.open('new_note', NewNoteWindow, self, draft)
         else:
-            new_note_window = NewNoteWindow(self)
-            self.child_windows['new_note'] = new_note_window
+            db_worker.submit(DatabaseCRUD.delete_draft, NEW_NOTE_DRAFT_KEY)
 
     def handle_help_button(self):
-        if 'help' in self.child_windows and self.child_windows['help'].winfo_exists():
-            self.child_windows['help'].lift()
-            self.child_windows['help'].focus_force()
-        else:
-            help_window = HelpWindow(self)
-            self.child_windows['help'] = help_window
+        self.windows.open('help', HelpWindow, self)
+
+    def handle_diagnostics_button(self):
+        self.windows.open('diagnostics', DiagnosticsWindow, self)
 
     def handle_list_notes_button(self):
-        if 'list_notes' in self.child_windows and self.child_windows['list_notes'].winfo_exists():
-            self.child_windows['list_notes'].lift()
-            self.child_windows['list_notes'].focus_force()
+        self.windows.open('list_notes', ListNotesWindow, self)
+
+    # progress of background work (an upgrade or a backup) below the buttons
+    def show_progress(self, text):
+        self.progress_label = ttk.Label(self, text=text)
+        self.progress_bar = ttk.Progressbar(self, maximum=1.0)
+        self.progress_label.grid(row=4, columnspan=2, padx=5, sticky='w')
+        self.progress_bar.grid(row=5, columnspan=2, pady=5, padx=5, sticky='we')
+        self.geometry(center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 400, 210))
+
+    def update_progress(self, text, fraction):
+        self.progress_label.config(text=text)
+        self.progress_bar.config(value=fraction)
+
+    def hide_progress(self):
+        self.progress_label.destroy()
+        self.progress_bar.destroy()
+        self.geometry(center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 400, 150))
+
+    def busy(self):
+        return self.migration_thread is not None or self.backup_thread is not None
+
+    # finish the data updates of a schema upgrade on a background thread; only the notes list
+    # needs the converted data, the rest of the app stays usable meanwhile
+    def start_migration(self):
+        self.migration_cancel = threading.Event()
+        self.migration_progress = None
+        self.migration_result = []
+        self.list_notes_button.config(state=DISABLED)
+        self.show_progress(lang.trn.get("upgrading_database").format(step="", percent=0))
+        self.migration_thread = DatabaseCRUD.migrator().upgrade_in_background(
+            self.record_migration_progress, self.migration_cancel, self.migration_result.append)
+        self.after(PROGRESS_POLL_MS, self.poll_migration)
+
+    # called on the migration thread, shown by poll_migration
+    def record_migration_progress(self, migration, backfill, done, total):
+        self.migration_progress = (backfill.name, done / total if total else 1.0)
+
+    def poll_migration(self):
+        if not self.migration_result:
+            if self.migration_progress is not None:
+                step, fraction = self.migration_progress
+                self.update_progress(lang.trn.get("upgrading_database").format(step=step, percent=int(fraction * 100)), fraction)
+            self.after(PROGRESS_POLL_MS, self.poll_migration)
+            return
+        self.migration_thread = None
+        self.hide_progress()
+        if self.migration_result[0]:
+            self.list_notes_button.config(state=NORMAL)
         else:
-            list_notes_window = ListNotesWindow(self)
-            self.child_windows['list_notes'] = list_notes_window
+            messagebox.showerror("Error", lang.trn.get("database_upgrade_failed"))
+
+    # snapshot the database on a background thread; the backup reads through its own
+    # connection, so saving and editing notes go on meanwhile
+    def start_backup(self, notify=False):
+        if self.busy():
+            if notify:
+                messagebox.showerror("Error", lang.trn.get("background_work_running"))
+            return
+        self.last_backup_attempt = time.time()
+        self.backup_cancel = threading.Event()
+        self.backup_progress = None
+        self.backup_result = []
+        from backup import backup_directory
+        directory = backup_directory(DatabaseCRUD.DB_NAME, settings.get("backup_location"))
+        self.show_progress(lang.trn.get("backing_up").format(percent=0))
+        self.backup_thread = threading.Thread(target=self.run_backup, args=(directory, settings.get("backup_keep")),
+                                              name="database-backup", daemon=True)
+        self.backup_thread.start()
+        self.after(PROGRESS_POLL_MS, self.poll_backup, notify)
+
+    # runs on the backup thread
+    def run_backup(self, directory, keep):
+        from backup import create_backup
+        self.backup_result.append(create_backup(DatabaseCRUD.DB_NAME, directory, keep,
+                                                self.record_backup_progress, self.backup_cancel))
+
+    def record_backup_progress(self, copied, total):
+        self.backup_progress = copied / total if total else 1.0
+
+    def poll_backup(self, notify):
+        if not self.backup_result:
+            if self.backup_progress is not None:
+                self.update_progress(lang.trn.get("backing_up").format(percent=int(self.backup_progress * 100)), self.backup_progress)
+            self.after(PROGRESS_POLL_MS, self.poll_backup, notify)
+            return
+        self.backup_thread = None
+        self.hide_progress()
+        path = self.backup_result[0]
+        if path is None:
+            messagebox.showerror("Error", lang.trn.get("backup_failed"))
+        elif notify:
+            messagebox.showinfo(lang.trn.get("success"), lang.trn.get("backup_created").format(path=path))
+
+    # start an automatic backup once the newest snapshot (or failed attempt) is older than the interval
+    def check_backup_schedule(self):
+        interval = settings.get("backup_interval")
+        if interval and not self.busy():
+            from backup import backup_directory, list_backups
+            directory = backup_directory(DatabaseCRUD.DB_NAME, settings.get("backup_location"))
+            last = self.last_backup_attempt
+            for path in list_backups(DatabaseCRUD.DB_NAME, directory)[:1]:
+                try:
+                    last = max(last, os.path.getmtime(path))
+                except OSError:
+                    pass # removed by another instance's rotation
+            if time.time() - last >= interval * 3600:
+                self.start_backup()
+        self.after(BACKUP_CHECK_MS, self.check_backup_schedule)
+
+    # replace the database with a snapshot; secondary windows show notes that are about to be
+    # replaced, so they are closed first. the current contents are backed up before the restore
+    def start_restore(self, path):
+        if self.busy():
+            messagebox.showerror("Error", lang.trn.get("background_work_running"))
+            return
+        self.windows.close_all()
+        from backup import backup_directory, restore_backup
+        directory = backup_directory(DatabaseCRUD.DB_NAME, settings.get("backup_location"))
+        db_worker.call(self, restore_backup, path, directory, None, settings.get("backup_keep"),
+                       callback=self.handle_restored, busy=True)
+
+    def handle_restored(self, success):
+        if not success:
+            messagebox.showerror("Error", lang.trn.get("restore_failed"))
+            return
+        db_worker.call(self, DatabaseCRUD.get_settings, callback=self.apply_restored_settings)
+        messagebox.showinfo(lang.trn.get("success"), lang.trn.get("backup_restored"))
+
+    def apply_restored_settings(self, stored):
+        if stored:
+            settings.apply(settings.changes(**{key: value for key, value in stored.items() if value is not None}))
+
+    # stop running upgrades and backups, an upgrade resumes on the next start
+    def stop_background_work(self):
+        for thread, cancel in ((self.migration_thread, self.migration_cancel), (self.backup_thread, self.backup_cancel)):
+            if thread is not None:
+                cancel.set()
+                thread.join()
+        self.migration_thread = None
+        self.backup_thread = None
 
     def open_window(self):
         self.mainloop()
@@ -87,9 +345,24 @@ class MainWindow(tk.Tk):
         self.list_notes_button.config(text=lang.trn.get("list_notes"))
         self.settings_button.config(text=lang.trn.get("settings"))
         self.help_button.config(text=lang.trn.get("help"))
+        self.diagnostics_button.config(text=lang.trn.get("diagnostics"))
         self.exit_button.config(text=lang.trn.get("exit"))
 
-class HelpWindow(tk.Toplevel):
+    # re-apply language and theme after the settings were saved
+    def handle_settings_changed(self, changes):
+        if "language" in changes:
+            lang.set_language(changes["language"])
+            self.update_translations()
+            self.windows.clear()
+        if "performance_profile" in changes:
+            db_worker.submit(DatabaseCRUD.set_performance_profile, changes["performance_profile"])
+        if "theme" in changes:
+            try:
+                self.style.theme_use(changes["theme"])
+            except:
+                pass # addressing occasional bug upon second theme change
+
+class HelpWindow(PooledWindow):
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
@@ -98,7 +371,7 @@ class HelpWindow(tk.Toplevel):
         self.grab_set()
         self.focus_force()
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
-        dimensions = center_window(SCREEN_WIDTH, SCREEN_HEIGHT, 400, 300)
+        dimensions = center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 400, 300)
         self.geometry(dimensions)
         self.create_widgets()
         self.create_layout()
@@ -115,11 +388,10 @@ class HelpWindow(tk.Toplevel):
         self.mainloop()
 
     def on_closing(self):
-        self.grab_release()
-        self.destroy()
+        self.hide()
 
-class NewNoteWindow(tk.Toplevel):
-    def __init__(self, parent):
+class NewNoteWindow(PooledWindow):
+    def __init__(self, parent, draft=None):
         super().__init__(parent)
         self.parent = parent
         self.title("New Note")
@@ -127,17 +399,21 @@ class NewNoteWindow(tk.Toplevel):
         self.grab_set() # Make modal
         self.focus_force() # Ensure focus
         self.protocol("WM_DELETE_WINDOW", self.on_closing) # Handle window close
-        dimensions = center_window(SCREEN_WIDTH, SCREEN_HEIGHT, 400, 350)
+        dimensions = center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 400, 350)
         self.geometry(dimensions)
         self.create_widgets()
         self.create_layout()
+        self.autosaver = DraftAutosaver(self, NEW_NOTE_DRAFT_KEY)
+        if draft:
+            self.autosaver.restore(draft)
+        settings.subscribe(self.handle_settings_changed)
     
     def create_widgets(self):
         self.title_label = ttk.Label(self, text=lang.trn.get("add_new_note"), font=("Helvetica", 16))
         self.note_title_label = ttk.Label(self, text=lang.trn.get("title"))
-        self.note_title = ttk.Entry(self, font=(DatabaseCRUD.get_font_family(), DatabaseCRUD.get_font_size()))
+        self.note_title = ttk.Entry(self, font=editor_font())
         self.note_content_label = ttk.Label(self, text=lang.trn.get("content"))
-        self.note_content= tk.Text(self, font=(DatabaseCRUD.get_font_family(), DatabaseCRUD.get_font_size()))
+        self.note_content= tk.Text(self, font=editor_font())
         self.save_button = ttk.Button(self, text=lang.trn.get("save"), command=self.handle_save_button)
         self.cancel_button = ttk.Button(self, text=lang.trn.get("cancel"), command=self.on_closing, bootstyle='secondary')
     
@@ -155,43 +431,103 @@ class NewNoteWindow(tk.Toplevel):
 
     def handle_save_button(self):
         title = self.note_title.get()
-        content = self.note_content.get("1.0", tk.END)
-        success = DatabaseCRUD.add_note(title, content)
+        content = self.note_content.get("1.0", "end-1c")
+        self.save_button.config(state=DISABLED)
+        self.autosaver.cancel()
+        db_worker.call(self, DatabaseCRUD.add_note, title, content, callback=self.handle_saved, busy=True)
+
+    def handle_saved(self, success):
         self.grab_release()
         if not success:
             messagebox.showerror("Error", lang.trn.get("failed_to_save"))
         else:
+            self.autosaver.discard()
             messagebox.showinfo("Success", lang.trn.get("saved_successfully")) 
-        self.destroy()
+        self.hide()
+
+    # empty fields for the next note, or the fields of a restored draft
+    def reset(self, draft=None):
+        self.note_title.delete(0, tk.END)
+        self.note_content.delete("1.0", tk.END)
+        self.note_content.edit_modified(False)
+        self.save_button.config(state=NORMAL)
+        self.autosaver.cancel()
+        self.autosaver.mark_clean()
+        if draft:
+            self.autosaver.restore(draft)
 
     def open_window(self):
         self.mainloop()
 
     def on_closing(self):
-        self.grab_release()
-        self.destroy()
+        self.autosaver.discard()
+        self.hide()
+
+    def handle_settings_changed(self, changes):
+        if "font_size" in changes or "font_family" in changes:
+            self.note_title.config(font=editor_font())
+            self.note_content.config(font=editor_font())
+
+    def destroy(self):
+        settings.unsubscribe(self.handle_settings_changed)
+        super().destroy()
 
-class ListNotesWindow(tk.Toplevel):
+class ListNotesWindow(PooledWindow):
     def __init__(self, parent):
         super().__init__(parent)
-        self.note_ids = {}
+        # None keeps the default order: newest edits first, or best match first while searching
+        self.sort = None
+        self.descending = True
+        self.model = self.new_model(False)
+        self.page_cursor = None
+        self.page_end_key = None
+        self.has_more_notes = False
+        self.page_pending = False
+        self.load_generation = 0
+        self.tag_ids = []
+        self.data_version = None
+        self.change_seq = None
+        self.change_after_id = None
+        self.polling = True
         self.parent = parent
         self.title("List Notes")
         self.transient(parent)
         self.grab_set()
         self.focus_force()
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
-        dimensions = center_window(SCREEN_WIDTH, SCREEN_HEIGHT, 400, 325)
+        dimensions = center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 800, 380)
         self.geometry(dimensions)
         self.create_widgets()
         self.create_layout()
+        # queued first, so no change made while the first page loads is missed
+        self.check_changes()
         self.load_notes()
+        self.load_tags()
     
     def create_widgets(self):
         self.title_label = ttk.Label(self, text=lang.trn.get("your_notes"), font=("Helvetica", 16))
-        self.notes_list = tk.Listbox(self, height=10, width=40)
+        self.search_label = ttk.Label(self, text=lang.trn.get("search"))
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(self, textvariable=self.search_var)
+        self.search_entry.bind("<KeyRelease>", self.handle_search_input)
+        self.search_after_id = None
+        self.list_frame = ttk.Frame(self)
+        # rows are keyed by note id
+        self.notes_list = ttk.Treeview(self.list_frame, columns=list(NOTE_COLUMNS), show='headings', height=10, selectmode='browse')
+        for column, (key, width) in NOTE_COLUMNS.items():
+            self.notes_list.heading(column, text=lang.trn.get(key), command=partial(self.handle_sort, column))
+            self.notes_list.column(column, width=width, anchor='e' if column == 'size' else 'w')
+        self.notes_scrollbar = ttk.Scrollbar(self.list_frame, orient=VERTICAL, command=self.notes_list.yview)
+        self.notes_list.config(yscrollcommand=self.handle_list_scroll)
+        self.tags_label = ttk.Label(self, text=lang.trn.get("tags"))
+        # exportselection=False keeps the note selection when tags are picked and vice versa
+        self.tags_list = tk.Listbox(self, selectmode=MULTIPLE, height=10, width=20, exportselection=False)
+        self.tags_list.bind("<<ListboxSelect>>", lambda event: self.load_notes())
+        self.match_all_var = tk.BooleanVar(value=False)
+        self.match_all_check = ttk.Checkbutton(self, text=lang.trn.get("match_all_tags"), variable=self.match_all_var, command=self.load_notes)
         self.edit_button = ttk.Button(self, text=lang.trn.get("edit_note"), command=self.handle_edit_button)
         self.delete_button = ttk.Button(self, text=lang.trn.get("delete_note"), command=self.handle_delete_button, bootstyle='danger')
+        self.similar_button = ttk.Button(self, text=lang.trn.get("similar_notes"), command=self.handle_similar_button, bootstyle='info')
         self.go_back_button = ttk.Button(self, text=lang.trn.get("go_back"), command=self.on_closing, bootstyle='secondary')
     
     def create_layout(self):
@@ -199,80 +535,357 @@ class ListNotesWindow(tk.Toplevel):
         self.grid_columnconfigure(1, weight=1)
         
         self.title_label.grid(row=0, column=0, pady=10, padx=5, columnspan=2, sticky='n')
-        self.notes_list.grid(row=1, column=0, pady=10, padx=5, columnspan=2)
-        self.edit_button.grid(row=2, column=0, pady=10, padx=5, sticky='e')
-        self.delete_button.grid(row=2, column=1, pady=10, padx=5, sticky='w')
-        self.go_back_button.grid(row=3, column=0, pady=10, padx=5, columnspan=2)
+        self.search_label.grid(row=1, column=0, padx=5, sticky='e')
+        self.search_entry.grid(row=1, column=1, padx=5, sticky='ew')
+        self.list_frame.grid(row=2, column=0, pady=10, padx=5, columnspan=2)
+        self.notes_list.pack(side=LEFT, fill=BOTH, expand=True)
+        self.notes_scrollbar.pack(side=RIGHT, fill=Y)
+        self.tags_label.grid(row=1, column=2, padx=5, sticky='w')
+        self.tags_list.grid(row=2, column=2, pady=10, padx=5, sticky='ns')
+        self.match_all_check.grid(row=3, column=2, padx=5, sticky='w')
+        self.edit_button.grid(row=3, column=0, pady=10, padx=5, sticky='e')
+        self.delete_button.grid(row=3, column=1, pady=10, padx=5, sticky='w')
+        self.similar_button.grid(row=4, column=0, pady=10, padx=5, sticky='e')
+        self.go_back_button.grid(row=4, column=1, pady=10, padx=5, sticky='w')
+
+    def selected_note(self):
+        selection = self.notes_list.selection()
+        return self.model.notes.get(int(selection[0])) if selection else None
 
     def handle_edit_button(self):
-        selected_note = self.notes_list.curselection()
+        selected_note = self.selected_note()
         if selected_note:
-            note = DatabaseCRUD.get_note(self.note_ids[self.notes_list.get(selected_note)])
-            if 'edit_note' in self.parent.child_windows and self.parent.child_windows['edit_note'].winfo_exists():
-                self.parent.child_windows['edit_note'].lift()
-                self.parent.child_windows['edit_note'].focus_force()
+            edit_note_window = self.parent.windows.visible('edit_note')
+            if edit_note_window is not None:
+                edit_note_window.lift()
+                edit_note_window.focus_force()
             else:
-                edit_note_window = EditNoteWindow(self, note)
-                self.parent.child_windows['edit_note'] = edit_note_window
+                note_id = selected_note["id"]
+                # open latency counts from the click, including the read of the note
+                db_worker.call(self, DatabaseCRUD.get_note, note_id, STREAM_NOTE_SIZE,
+                               callback=partial(self.open_edit_window, time.perf_counter()), busy=True)
         else:
             messagebox.showerror("Error", "No note selected!")
 
+    # one editor is reused for every note
+    def open_edit_window(self, started, note):
+        if note is None:
+            messagebox.showerror("Error", lang.trn.get("no_note_selected"))
+            return
+        self.parent.windows.open('edit_note', EditNoteWindow, self, note, started=started)
+
     def handle_delete_button(self):
-        selected_note = self.notes_list.curselection()
+        selected_note = self.selected_note()
         if selected_note:
             confirm = messagebox.askyesno(lang.trn.get("delete_note"), lang.trn.get("are_you_sure_delete"))
             if not confirm:
                 return
             else:
-                note = self.notes_list.get(selected_note)
-                success = DatabaseCRUD.delete_note(self.note_ids[note])
-                if success:
-                    messagebox.showinfo(lang.trn.get("success"), lang.trn.get("deleted_successfully"))
-                else:
-                    messagebox.showerror("Error", lang.trn.get("failed_to_delete"))
-                self.notes_list.delete(selected_note)
+                note_id = selected_note["id"]
+                db_worker.call(self, DatabaseCRUD.delete_note, note_id,
+                               callback=lambda success: self.handle_deleted(success, note_id), busy=True)
         else:
             messagebox.showerror("Error", lang.trn.get("no_note_selected"))
 
+    def handle_similar_button(self):
+        selected_note = self.selected_note()
+        if not selected_note:
+            messagebox.showerror("Error", lang.trn.get("no_note_selected"))
+            return
+        import dedup
+        if not dedup.available():
+            messagebox.showerror("Error", lang.trn.get("similar_notes_unavailable"))
+            return
+        SimilarNotesWindow(self, selected_note)
+
+    def handle_deleted(self, success, note_id):
+        if success:
+            messagebox.showinfo(lang.trn.get("success"), lang.trn.get("deleted_successfully"))
+            if self.model.remove(note_id) is not None:
+                self.notes_list.delete(str(note_id))
+            self.load_tags()
+        else:
+            messagebox.showerror("Error", lang.trn.get("failed_to_delete"))
+
+    # reload from the first page (or the search results) in the background
+    # results of an older load that arrive late are dropped
+    # a search covers all notes, the tag filter applies while browsing
     def load_notes(self):
-        self.note_ids = {}
-        self.notes_list.delete(0, tk.END)
-        notes = DatabaseCRUD.get_notes()
-        self.note_ids = {note["title"]: note["id"] for note in notes}
+        self.load_generation += 1
+        self.page_cursor = None
+        self.page_pending = True
+        query = self.search_var.get().strip()
+        if query:
+            db_worker.call(self, DatabaseCRUD.search_notes, query, SEARCH_RESULT_LIMIT,
+                           callback=partial(self.receive_notes, self.load_generation, True, False), busy=True)
+        else:
+            self.fetch_page(None, partial(self.receive_notes, self.load_generation, True, True), busy=True)
+
+    # fetch the next page of titles, content is only read when a note is opened
+    def load_more_notes(self):
+        if not self.has_more_notes or self.page_pending:
+            return
+        self.page_pending = True
+        self.fetch_page(self.page_cursor, partial(self.receive_notes, self.load_generation, False, True))
+
+    def fetch_page(self, before, callback, busy=False):
+        tag_ids = self.selected_tag_ids()
+        sort, descending = self.list_order()
+        if tag_ids:
+            db_worker.call(self, DatabaseCRUD.get_notes_by_tags, tag_ids, self.match_all_var.get(), before, NOTES_PAGE_SIZE,
+                           sort, descending, callback=callback, busy=busy)
+        else:
+            db_worker.call(self, DatabaseCRUD.get_notes_page, before, NOTES_PAGE_SIZE, sort, descending,
+                           callback=callback, busy=busy)
+
+    # the column and direction pages are fetched in
+    def list_order(self):
+        return (self.sort, self.descending) if self.sort else ('edited', True)
+
+    # a heading sorts by its column, a second click reverses the order; the pages come
+    # sorted from the column's index, so this is a reload rather than a sort of the rows
+    def handle_sort(self, column):
+        if column == self.sort:
+            self.descending = not self.descending
+        else:
+            self.sort = column
+            self.descending = column != 'title'
+        for name, (key, _) in NOTE_COLUMNS.items():
+            arrow = (" ▼" if self.descending else " ▲") if name == self.sort else ""
+            self.notes_list.heading(name, text=lang.trn.get(key) + arrow)
+        self.load_notes()
+
+    def selected_tag_ids(self):
+        return [self.tag_ids[index] for index in self.tags_list.curselection()]
+
+    # tag pane, notebooks first; the counts come stored with the tags
+    def load_tags(self):
+        db_worker.call(self, DatabaseCRUD.get_tags, callback=self.show_tags)
+
+    def show_tags(self, tags):
+        selected = set(self.selected_tag_ids())
+        tags = [tag for tag in tags if tag["note_count"] > 0 or tag["id"] in selected]
+        self.tags_list.delete(0, tk.END)
+        self.tag_ids = [tag["id"] for tag in tags]
+        for index, tag in enumerate(tags):
+            name = f"[{tag['name']}]" if tag["kind"] == "notebook" else tag["name"]
+            self.tags_list.insert(tk.END, f"{name} ({tag['note_count']})")
+            if tag["id"] in selected:
+                self.tags_list.selection_set(index)
+
+    def receive_notes(self, generation, reset, paged, notes):
+        if generation != self.load_generation:
+            return
+        self.page_pending = False
+        if reset:
+            self.model = self.new_model(not paged)
+            self.notes_list.delete(*self.notes_list.get_children())
+        self.has_more_notes = paged and len(notes) == NOTES_PAGE_SIZE
+        if paged and notes:
+            self.page_cursor = (notes[-1][SORT_FIELDS[self.list_order()[0]]], notes[-1]["id"])
+            self.page_end_key = self.model.key(notes[-1])
+        self.show_notes(notes)
+
+    # search results (at most SEARCH_RESULT_LIMIT) are ranked unless a column was picked
+    def new_model(self, searching):
+        if searching and self.sort is None:
+            return NoteListModel(lambda note: note["rank"])
+        sort, descending = self.list_order()
+        return NoteListModel(SORT_KEYS[sort], descending)
+
+    def show_notes(self, notes):
         for note in notes:
-            self.notes_list.insert(tk.END, note["title"])
+            self.place_note(note)
+
+    # put one note at its sorted position, replacing its old row if it was listed
+    def place_note(self, note):
+        old_index, index = self.model.update(note)
+        if old_index is not None:
+            self.notes_list.delete(str(note["id"]))
+        self.notes_list.insert('', index, iid=str(note["id"]), values=NoteListModel.row(note))
+        return index
+
+    # move just the edited note's row; search and tag results are re-run since the note may
+    # have stopped matching
+    def handle_note_edited(self, note_id):
+        self.load_tags()
+        if self.search_var.get().strip() or self.selected_tag_ids():
+            self.load_notes()
+        else:
+            db_worker.call(self, DatabaseCRUD.get_note_summary, note_id, callback=self.show_edited_note)
+
+    def show_edited_note(self, note):
+        if note is None:
+            return
+        self.place_note(note)
+        self.notes_list.selection_set(str(note["id"]))
+        self.notes_list.see(str(note["id"]))
+
+    # pick up changes made by other instances: a data_version check every CHANGE_POLL_MS,
+    # and only when it moved, the rows changed since the last sequence number seen
+    def check_changes(self):
+        self.change_after_id = None
+        db_worker.call(self, DatabaseCRUD.get_change_state, callback=self.handle_change_state)
+
+    def handle_change_state(self, state):
+        if not self.polling:
+            return
+        if state is not None:
+            if self.data_version is None:
+                self.data_version = state["data_version"]
+                self.change_seq = state["seq"]
+            elif state["data_version"] != self.data_version:
+                self.data_version = state["data_version"]
+                db_worker.call(self, DatabaseCRUD.get_changes, self.change_seq, callback=self.apply_changes)
+        self.change_after_id = self.after(CHANGE_POLL_MS, self.check_changes)
+
+    def apply_changes(self, changes):
+        if changes is None or changes["seq"] <= self.change_seq:
+            return
+        self.change_seq = changes["seq"]
+        self.load_tags()
+        if self.search_var.get().strip() or self.selected_tag_ids():
+            self.load_notes()
+            return
+        for note_id in changes["deleted"]:
+            if self.model.remove(note_id) is not None:
+                self.notes_list.delete(str(note_id))
+        for note in changes["changed"]:
+            if note["id"] in self.model or self.in_loaded_range(note):
+                self.place_note(note)
+
+    # notes older than the last loaded page arrive with the next page instead
+    def in_loaded_range(self, note):
+        if not self.has_more_notes or self.page_end_key is None:
+            return True
+        key = self.model.key(note)
+        return key > self.page_end_key if self.model.descending else key < self.page_end_key
+
+    # load the next page once the user scrolls close to the end of the list
+    def handle_list_scroll(self, first, last):
+        self.notes_scrollbar.set(first, last)
+        if float(last) >= LOAD_MORE_THRESHOLD:
+            self.load_more_notes()
+
+    # filter as the user types, waiting for a short pause between keystrokes
+    def handle_search_input(self, event=None):
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+        self.search_after_id = self.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self.search_after_id = None
+        self.load_notes()
+
+    # the rows loaded before the window was hidden are kept and brought up to date through
+    # get_changes (own writes do not move data_version, so it is asked directly); a search
+    # or tag filter is cleared and the list reloaded instead
+    def reset(self):
+        self.notes_list.selection_remove(self.notes_list.selection())
+        if self.search_var.get() or self.selected_tag_ids() or self.change_seq is None:
+            self.search_var.set("")
+            self.tags_list.selection_clear(0, tk.END)
+            self.load_notes()
+        else:
+            self.notes_list.yview_moveto(0)
+            db_worker.call(self, DatabaseCRUD.get_changes, self.change_seq, callback=self.apply_changes)
+        self.match_all_var.set(False)
+        self.load_tags()
+        self.polling = True
+        self.check_changes()
 
     def open_window(self):
         self.mainloop()
 
     def on_closing(self):
-        self.grab_release()
-        self.destroy()
+        if self.search_after_id is not None:
+            self.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        if self.change_after_id is not None:
+            self.after_cancel(self.change_after_id)
+            self.change_after_id = None
+        self.polling = False
+        self.hide()
 
-class EditNoteWindow(tk.Toplevel):
+class EditNoteWindow(PooledWindow):
     def __init__(self, parent, note):
         super().__init__(parent)
         self.parent = parent
-        self.note = note
         self.title(lang.trn.get("edit_note"))
         self.transient(parent)
         self.grab_set()
         self.focus_force()
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
-        dimensions = center_window(SCREEN_WIDTH, SCREEN_HEIGHT, 400, 350)
+        dimensions = center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 400, 460)
         self.geometry(dimensions)
         self.create_widgets()
         self.create_layout()
-        self.populate_fields()
+        # bumped for every note shown, results that arrive for an earlier one are dropped
+        self.session = 0
+        self.stream_after_id = None
+        self.autosaver = DraftAutosaver(self, f"note-{note['id']}", note["id"])
+        self.load_note(note)
+        settings.subscribe(self.handle_settings_changed)
+
+    def load_note(self, note):
+        self.session += 1
+        self.note = note
+        # tags are only written back once they were loaded, so an early save cannot clear them
+        self.tags_loaded = False
+        db_worker.call(self, DatabaseCRUD.get_tags, 'notebook', callback=self.show_notebooks)
+        db_worker.call(self, DatabaseCRUD.get_note_tags, note["id"], callback=partial(self.show_note_tags, self.session))
+        self.autosaver.retarget(f"note-{note['id']}", note["id"])
+        # content is None for large notes, they are streamed in after the window opens
+        self.streamed = note["content"] is None
+        if self.streamed:
+            self.start_streaming()
+        else:
+            self.populate_fields()
+            self.autosaver.mark_clean()
+            db_worker.call(self, DatabaseCRUD.get_draft, self.autosaver.draft_key, callback=partial(self.offer_draft, self.session))
+
+    # empty every field and stop a stream still running for the previous note
+    def clear_fields(self):
+        self.session += 1
+        if self.stream_after_id is not None:
+            self.after_cancel(self.stream_after_id)
+            self.stream_after_id = None
+        self.stream_chunks = None
+        self.stream_text = ""
+        self.autosaver.cancel()
+        self.autosaver.paused = True
+        self.note_title.config(state=NORMAL)
+        self.note_title.delete(0, tk.END)
+        self.note_content.config(state=NORMAL)
+        self.note_content.delete("1.0", tk.END)
+        self.note_content.edit_modified(False)
+        self.note_tags.delete(0, tk.END)
+        self.notebook.set("")
+        self.save_button.config(state=NORMAL)
+        self.history_button.config(state=NORMAL)
+        self.progress.grid_remove()
+        self.progress.config(value=0)
+        self.status_label.grid_remove()
+
+    def reset(self, note):
+        self.clear_fields()
+        self.load_note(note)
     
     def create_widgets(self):
         self.title_label = ttk.Label(self, text=lang.trn.get("edit_note"), font=("Helvetica", 16))
         self.note_title_label = ttk.Label(self, text=lang.trn.get("title"))
-        self.note_title = ttk.Entry(self, font=(DatabaseCRUD.get_font_family(), DatabaseCRUD.get_font_size()))
+        self.note_title = ttk.Entry(self, font=editor_font())
         self.note_content_label = ttk.Label(self, text=lang.trn.get("content"))
-        self.note_content= tk.Text(self, font=(DatabaseCRUD.get_font_family(), DatabaseCRUD.get_font_size()))
+        self.note_content= tk.Text(self, font=editor_font())
+        self.note_tags_label = ttk.Label(self, text=lang.trn.get("tags"))
+        self.note_tags = ttk.Entry(self)
+        self.notebook_label = ttk.Label(self, text=lang.trn.get("notebook"))
+        self.notebook = ttk.Combobox(self)
         self.save_button = ttk.Button(self, text=lang.trn.get("save"), command=self.handle_save_button)
         self.cancel_button = ttk.Button(self, text=lang.trn.get("cancel"), command=self.on_closing, bootstyle='secondary')
+        self.history_button = ttk.Button(self, text=lang.trn.get("history"), command=self.handle_history_button, bootstyle='info')
+        self.progress = ttk.Progressbar(self, maximum=1.0)
+        self.status_label = ttk.Label(self, bootstyle='warning')
     
     def create_layout(self):
         self.grid_columnconfigure(0, weight=1)
@@ -283,33 +896,457 @@ class EditNoteWindow(tk.Toplevel):
         self.note_title.grid(row=2, columnspan=2, sticky='ew', padx=20)
         self.note_content_label.grid(row=3, column=0, sticky='w', padx=20)
         self.note_content.grid(row=4, columnspan=2, sticky='nsew', padx=20)
-        self.save_button.grid(row=5, column=0, sticky='e', padx=5, pady=20)
-        self.cancel_button.grid(row=5, column=1, sticky='w', padx=5, pady=20)
+        self.note_tags_label.grid(row=5, column=0, sticky='w', padx=20, pady=(10,0))
+        self.notebook_label.grid(row=5, column=1, sticky='w', padx=20, pady=(10,0))
+        self.note_tags.grid(row=6, column=0, sticky='ew', padx=(20,5))
+        self.notebook.grid(row=6, column=1, sticky='ew', padx=(5,20))
+        self.save_button.grid(row=7, column=0, sticky='e', padx=5, pady=(20,5))
+        self.cancel_button.grid(row=7, column=1, sticky='w', padx=5, pady=(20,5))
+        self.history_button.grid(row=8, columnspan=2, pady=(5,20))
+
+    def handle_history_button(self):
+        HistoryWindow(self, self.note["id"])
+
+    # put an earlier version into the fields, it is stored once the user saves
+    def restore_revision(self, revision):
+        self.note_title.delete(0, tk.END)
+        self.note_title.insert(0, revision["title"])
+        self.note_content.delete("1.0", tk.END)
+        self.note_content.insert("1.0", revision["content"])
 
     def handle_save_button(self):
         title = self.note_title.get()
-        content = self.note_content.get("1.0", tk.END)
-        success = DatabaseCRUD.edit_note(self.note["id"], title, content)
+        self.save_button.config(state=DISABLED)
+        self.autosaver.cancel()
+        # queued ahead of the note itself, so they are stored by the time the list reloads
+        if self.tags_loaded:
+            db_worker.submit(DatabaseCRUD.set_note_tags, self.note["id"], self.note_tags.get().split(","))
+            db_worker.submit(DatabaseCRUD.set_note_tags, self.note["id"], [self.notebook.get()], 'notebook')
+        if self.streamed:
+            self.progress.grid(row=3, column=1, sticky='ew', padx=20)
+            self.collect_chunks(title, [], 1)
+            return
+        content = self.note_content.get("1.0", "end-1c")
+        db_worker.call(self, DatabaseCRUD.edit_note, self.note["id"], title, content,
+                       callback=partial(self.handle_saved, self.session, self.note["id"]), busy=True)
+
+    # read a large note back out of the editor STREAM_SAVE_LINES lines per callback
+    def collect_chunks(self, title, chunks, line):
+        last_line = int(self.note_content.index(tk.END).split(".")[0])
+        # the last chunk stops before the newline the Text widget always ends with
+        end = f"{line + STREAM_SAVE_LINES}.0" if line + STREAM_SAVE_LINES < last_line else "end-1c"
+        chunks.append(self.note_content.get(f"{line}.0", end))
+        line += STREAM_SAVE_LINES
+        self.progress.config(value=min(1.0, line / last_line))
+        if line < last_line:
+            self.stream_after_id = self.after(STREAM_POLL_MS, self.collect_chunks, title, chunks, line)
+            return
+        self.stream_after_id = None
+        db_worker.call(self, DatabaseCRUD.edit_note_chunks, self.note["id"], title, chunks,
+                       callback=partial(self.handle_saved, self.session, self.note["id"]), busy=True)
+
+    # a save that finishes after the editor moved on still updates the notes list
+    def handle_saved(self, session, note_id, success):
+        if session != self.session:
+            if success:
+                self.parent.handle_note_edited(note_id)
+            return
         if success:
+            self.autosaver.discard()
             messagebox.showinfo(lang.trn.get("success"), lang.trn.get("saved_successfully"))
-            self.parent.load_notes()
+            self.parent.handle_note_edited(note_id)
         else:
             messagebox.showerror("Error", lang.trn.get("failed_to_save"))
-        self.grab_release()
-        self.destroy()
+        # a failed save keeps its draft
+        self.clear_fields()
+        self.hide()
 
     def populate_fields(self):
         self.note_title.insert(0, self.note["title"])
         self.note_content.insert(tk.END, self.note["content"])
 
+    def show_notebooks(self, notebooks):
+        self.notebook.config(values=[notebook["name"] for notebook in notebooks])
+
+    def show_note_tags(self, session, tags):
+        if session != self.session:
+            return
+        self.note_tags.insert(0, ", ".join(tag["name"] for tag in tags if tag["kind"] == "tag"))
+        self.notebook.set(next((tag["name"] for tag in tags if tag["kind"] == "notebook"), ""))
+        self.tags_loaded = True
+
+    # the worker reads the note into a queue while the editor takes STREAM_INSERT_CHARS
+    # per callback, so the window stays responsive and shows how far it got
+    def start_streaming(self):
+        self.note_title.insert(0, self.note["title"])
+        self.autosaver.paused = True
+        self.save_button.config(state=DISABLED)
+        self.note_content.config(state=DISABLED)
+        self.progress.grid(row=3, column=1, sticky='ew', padx=20)
+        self.stream_chunks = queue.Queue()
+        self.stream_text = ""
+        self.stream_offset = 0
+        self.stream_read_fraction = 0.0
+        self.stream_queued = 0
+        self.stream_inserted = 0
+        self.stream_reading = True
+        self.stream_truncated = False
+        session = self.session
+        db_worker.call(self, self.read_note_stream, session, self.note["id"], self.stream_chunks,
+                       callback=partial(self.handle_stream_read, session), on_error=partial(self.handle_stream_error, session))
+        self.stream_after_id = self.after(STREAM_POLL_MS, self.insert_next_chunk)
+
+    # runs on the database worker; returns True when the note is too long to edit
+    # stops early once the editor was closed or moved on to another note
+    def read_note_stream(self, session, note_id, chunks_queue):
+        chunks = DatabaseCRUD.iter_note_content(note_id, progress=partial(self.handle_stream_progress, session))
+        try:
+            for text in chunks:
+                if session != self.session:
+                    return False
+                chunks_queue.put(text)
+                self.stream_queued += len(text)
+                if self.stream_queued > EDITABLE_NOTE_CHARS:
+                    return True
+            return False
+        finally:
+            chunks.close()
+
+    def handle_stream_progress(self, session, read, total):
+        if session == self.session:
+            self.stream_read_fraction = read / total if total else 1.0
+
+    def handle_stream_read(self, session, truncated):
+        if session != self.session:
+            return
+        self.stream_reading = False
+        self.stream_truncated = truncated
+
+    def handle_stream_error(self, session, error):
+        if session != self.session:
+            return
+        messagebox.showerror("Error", lang.trn.get("failed_to_load"), parent=self)
+        self.on_closing()
+
+    def insert_next_chunk(self):
+        self.stream_after_id = None
+        if self.stream_offset >= len(self.stream_text):
+            try:
+                self.stream_text = self.stream_chunks.get_nowait()
+                self.stream_offset = 0
+            except queue.Empty:
+                if self.stream_reading:
+                    self.stream_after_id = self.after(STREAM_POLL_MS, self.insert_next_chunk)
+                else:
+                    self.finish_streaming()
+                return
+        size = STREAM_INSERT_CHARS
+        if self.stream_inserted < PREVIEW_CHARS:
+            size = min(size, PREVIEW_CHARS - self.stream_inserted)
+        elif self.stream_reading:
+            # past the preview length, wait until it is known whether the note is editable
+            self.stream_after_id = self.after(STREAM_POLL_MS, self.insert_next_chunk)
+            return
+        elif self.stream_truncated:
+            self.finish_streaming()
+            return
+        piece = self.stream_text[self.stream_offset:self.stream_offset + size]
+        self.stream_offset += len(piece)
+        self.note_content.config(state=NORMAL)
+        self.note_content.insert(tk.END, piece)
+        self.note_content.config(state=DISABLED)
+        self.stream_inserted += len(piece)
+        self.progress.config(value=self.stream_read_fraction * self.stream_inserted / max(self.stream_queued, 1))
+        self.stream_after_id = self.after(1, self.insert_next_chunk)
+
+    def finish_streaming(self):
+        self.progress.grid_remove()
+        self.stream_chunks = None
+        self.stream_text = ""
+        if self.stream_truncated:
+            # too long to edit safely: keep it read-only and never autosave it
+            self.note_title.config(state=DISABLED)
+            self.history_button.config(state=DISABLED)
+            self.status_label.config(text=lang.trn.get("preview_only").format(chars=PREVIEW_CHARS))
+            self.status_label.grid(row=3, column=1, sticky='e', padx=20)
+            return
+        self.note_content.config(state=NORMAL)
+        self.note_content.edit_modified(False)
+        self.save_button.config(state=NORMAL)
+        self.autosaver.mark_clean()
+        self.autosaver.paused = False
+        db_worker.call(self, DatabaseCRUD.get_draft, self.autosaver.draft_key, callback=partial(self.offer_draft, self.session))
+
+    # an autosaved draft that differs from the stored note is left over from a crash
+    def offer_draft(self, session, draft):
+        if session != self.session:
+            return
+        if draft is None or draft["content_hash"] == self.autosaver.last_hash:
+            return
+        if messagebox.askyesno(lang.trn.get("unsaved_draft"), lang.trn.get("restore_draft"), parent=self):
+            self.autosaver.restore(draft)
+        else:
+            self.autosaver.discard()
+
+    def open_window(self):
+        self.mainloop()
+
+    # the fields are emptied right away, so a hidden editor does not hold on to a large note
+    def on_closing(self):
+        self.autosaver.discard()
+        self.clear_fields()
+        self.hide()
+
+    def handle_settings_changed(self, changes):
+        if "font_size" in changes or "font_family" in changes:
+            self.note_title.config(font=editor_font())
+            self.note_content.config(font=editor_font())
+
+    def destroy(self):
+        settings.unsubscribe(self.handle_settings_changed)
+        if self.stream_after_id is not None:
+            self.after_cancel(self.stream_after_id)
+        super().destroy()
+
+class HistoryWindow(tk.Toplevel):
+    def __init__(self, parent, note_id):
+        super().__init__(parent)
+        self.parent = parent
+        self.note_id = note_id
+        self.revision_ids = []
+        self.selected_revision = None
+        self.title(lang.trn.get("history"))
+        self.transient(parent)
+        self.grab_set()
+        self.focus_force()
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        dimensions = center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 500, 450)
+        self.geometry(dimensions)
+        self.create_widgets()
+        self.create_layout()
+        db_worker.call(self, DatabaseCRUD.get_revisions, note_id, callback=self.show_revisions, busy=True)
+
+    def create_widgets(self):
+        self.title_label = ttk.Label(self, text=lang.trn.get("history"), font=("Helvetica", 16))
+        self.revisions_list = tk.Listbox(self, height=8)
+        self.revisions_list.bind("<<ListboxSelect>>", self.handle_select)
+        self.preview = tk.Text(self, height=10, state=DISABLED, font=editor_font())
+        self.restore_button = ttk.Button(self, text=lang.trn.get("restore"), command=self.handle_restore_button)
+        self.go_back_button = ttk.Button(self, text=lang.trn.get("go_back"), command=self.on_closing, bootstyle='secondary')
+
+    def create_layout(self):
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+        self.title_label.grid(row=0, columnspan=2, pady=(20,10))
+        self.revisions_list.grid(row=1, columnspan=2, sticky='ew', padx=20)
+        self.preview.grid(row=2, columnspan=2, sticky='nsew', padx=20, pady=10)
+        self.restore_button.grid(row=3, column=0, sticky='e', padx=5, pady=20)
+        self.go_back_button.grid(row=3, column=1, sticky='w', padx=5, pady=20)
+
+    def show_revisions(self, revisions):
+        self.revision_ids = [revision["id"] for revision in revisions]
+        for revision in revisions:
+            self.revisions_list.insert(tk.END, f"{format_timestamp(revision['date_saved'])}  {revision['title']}")
+
+    def handle_select(self, event=None):
+        selected = self.revisions_list.curselection()
+        if selected:
+            db_worker.call(self, DatabaseCRUD.get_revision, self.revision_ids[selected[0]], callback=self.show_preview)
+
+    def show_preview(self, revision):
+        self.selected_revision = revision
+        self.preview.config(state=NORMAL)
+        self.preview.delete("1.0", tk.END)
+        if revision:
+            self.preview.insert("1.0", revision["content"])
+        self.preview.config(state=DISABLED)
+
+    def handle_restore_button(self):
+        if self.selected_revision is None:
+            messagebox.showerror("Error", lang.trn.get("no_revision_selected"), parent=self)
+            return
+        self.parent.restore_revision(self.selected_revision)
+        self.on_closing()
+
+    def open_window(self):
+        self.mainloop()
+
+    def on_closing(self):
+        self.grab_release()
+        self.destroy()
+        self.parent.grab_set()
+
+# notes that are near-duplicates of one note, found through their MinHash signatures
+class SimilarNotesWindow(tk.Toplevel):
+    def __init__(self, parent, note):
+        super().__init__(parent)
+        self.parent = parent
+        self.note = note
+        self.similar = []
+        self.title(lang.trn.get("similar_notes"))
+        self.transient(parent)
+        self.grab_set()
+        self.focus_force()
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        dimensions = center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 500, 360)
+        self.geometry(dimensions)
+        self.create_widgets()
+        self.create_layout()
+        # notes imported since the last search get their signatures first, the queue keeps the order
+        db_worker.call(self, DatabaseCRUD.index_signatures, busy=True)
+        db_worker.call(self, DatabaseCRUD.find_similar_notes, note["id"], callback=self.show_similar, busy=True)
+
+    def create_widgets(self):
+        self.title_label = ttk.Label(self, text=lang.trn.get("similar_notes"), font=("Helvetica", 16))
+        self.note_label = ttk.Label(self, text=self.note["title"])
+        self.similar_list = tk.Listbox(self, height=10)
+        self.delete_button = ttk.Button(self, text=lang.trn.get("delete_note"), command=self.handle_delete_button, bootstyle='danger')
+        self.go_back_button = ttk.Button(self, text=lang.trn.get("go_back"), command=self.on_closing, bootstyle='secondary')
+
+    def create_layout(self):
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_columnconfigure(1, weight=1)
+        self.grid_rowconfigure(2, weight=1)
+        self.title_label.grid(row=0, columnspan=2, pady=(20,5))
+        self.note_label.grid(row=1, columnspan=2, pady=(0,10))
+        self.similar_list.grid(row=2, columnspan=2, sticky='nsew', padx=20)
+        self.delete_button.grid(row=3, column=0, sticky='e', padx=5, pady=20)
+        self.go_back_button.grid(row=3, column=1, sticky='w', padx=5, pady=20)
+
+    def show_similar(self, similar):
+        self.similar = similar
+        self.similar_list.delete(0, tk.END)
+        if not similar:
+            self.similar_list.insert(tk.END, lang.trn.get("no_similar_notes"))
+        for note in similar:
+            self.similar_list.insert(tk.END, f"{note['similarity']:.0%}  {NoteListModel.label(note)}")
+
+    def handle_delete_button(self):
+        selected = self.similar_list.curselection()
+        if not selected or not self.similar:
+            messagebox.showerror("Error", lang.trn.get("no_note_selected"), parent=self)
+            return
+        if not messagebox.askyesno(lang.trn.get("delete_note"), lang.trn.get("are_you_sure_delete"), parent=self):
+            return
+        note_id = self.similar[selected[0]]["id"]
+        db_worker.call(self, DatabaseCRUD.delete_note, note_id,
+                       callback=lambda success: self.handle_deleted(success, note_id), busy=True)
+
+    # the notes list drops the row too
+    def handle_deleted(self, success, note_id):
+        self.parent.handle_deleted(success, note_id)
+        if success:
+            self.show_similar([note for note in self.similar if note["id"] != note_id])
+
     def open_window(self):
         self.mainloop()
 
     def on_closing(self):
         self.grab_release()
         self.destroy()
+        self.parent.grab_set()
+
+# per-method database statistics; not modal so it can stay open while the app is used
+class DiagnosticsWindow(PooledWindow):
+    COLUMNS = ('method', 'calls', 'mean_ms', 'p95_ms', 'max_ms', 'rows')
+    modal = False
+
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.parent = parent
+        self.title(lang.trn.get("diagnostics"))
+        self.transient(parent)
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        dimensions = center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 600, 450)
+        self.geometry(dimensions)
+        self.create_widgets()
+        self.create_layout()
+        self.refresh_job = None
+        self.refresh()
+
+    def create_widgets(self):
+        self.title_label = ttk.Label(self, text=lang.trn.get("diagnostics"), font=("Helvetica", 16))
+        self.stats_table = ttk.Treeview(self, columns=self.COLUMNS, show='headings', height=8)
+        for column in self.COLUMNS:
+            self.stats_table.heading(column, text=column)
+            self.stats_table.column(column, width=70, anchor='e')
+        self.stats_table.column('method', width=160, anchor='w')
+        self.cache_label = ttk.Label(self)
+        self.slow_label = ttk.Label(self, text=lang.trn.get("slow_queries"))
+        self.slow_text = tk.Text(self, height=8, state=DISABLED, wrap='none')
+        self.toggle_button = ttk.Button(self, command=self.handle_toggle_button)
+        self.export_button = ttk.Button(self, text=lang.trn.get("export"), command=self.handle_export_button, bootstyle='secondary')
+        self.go_back_button = ttk.Button(self, text=lang.trn.get("go_back"), command=self.on_closing, bootstyle='secondary')
+
+    def create_layout(self):
+        for column in range(3):
+            self.grid_columnconfigure(column, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_rowconfigure(4, weight=1)
+        self.title_label.grid(row=0, columnspan=3, pady=(20,10))
+        self.stats_table.grid(row=1, columnspan=3, sticky='nsew', padx=20)
+        self.cache_label.grid(row=2, columnspan=3, sticky='w', padx=20, pady=(10,0))
+        self.slow_label.grid(row=3, columnspan=3, sticky='w', padx=20, pady=(10,0))
+        self.slow_text.grid(row=4, columnspan=3, sticky='nsew', padx=20)
+        self.toggle_button.grid(row=5, column=0, padx=5, pady=20)
+        self.export_button.grid(row=5, column=1, padx=5, pady=20)
+        self.go_back_button.grid(row=5, column=2, padx=5, pady=20)
+
+    def refresh(self):
+        from instrumentation import instrumentation
+        self.toggle_button.config(text=lang.trn.get("disable_instrumentation" if instrumentation.enabled else "enable_instrumentation"))
+        self.stats_table.delete(*self.stats_table.get_children())
+        for row in instrumentation.snapshot():
+            self.stats_table.insert('', tk.END, values=[row[column] for column in self.COLUMNS])
+        cache = DatabaseCRUD.note_cache.stats()
+        self.cache_label.config(text=lang.trn.get("note_cache").format(**cache, megabytes=cache['bytes'] / 1048576))
+        self.slow_text.config(state=NORMAL)
+        self.slow_text.delete("1.0", tk.END)
+        for call in reversed(instrumentation.slow_calls):
+            self.slow_text.insert(tk.END, f"{call['time']}  {call['method']}  {call['elapsed_ms']:.1f} ms\n")
+            for statement in call['statements']:
+                self.slow_text.insert(tk.END, "    " + " ".join(statement.split()) + "\n")
+        self.slow_text.config(state=DISABLED)
+        self.refresh_job = self.after(DIAGNOSTICS_REFRESH_MS, self.refresh)
+
+    # switching the trace callback takes the connection lock, which a backup, migration or import
+    # can hold for minutes, so it runs on the database worker instead of the Tk thread
+    def handle_toggle_button(self):
+        from instrumentation import instrumentation
+        toggle = instrumentation.disable if instrumentation.enabled else partial(instrumentation.enable, DatabaseCRUD)
+        self.toggle_button.config(state=DISABLED)
+        db_worker.call(self, toggle, callback=lambda result: self.toggle_button.config(state=NORMAL),
+                       on_error=lambda error: self.toggle_button.config(state=NORMAL))
 
-class SettingsWindow(tk.Toplevel):
+    def handle_export_button(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json"), ("CSV", "*.csv")])
+        if path:
+            from instrumentation import instrumentation
+            instrumentation.dump(path)
+
+    def reset(self):
+        self.refresh()
+
+    def open_window(self):
+        self.mainloop()
+
+    # refreshing stops while the window is hidden
+    def on_closing(self):
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        self.hide()
+
+    # WindowPool.close_all destroys the window without on_closing
+    def destroy(self):
+        if self.refresh_job is not None:
+            self.after_cancel(self.refresh_job)
+            self.refresh_job = None
+        super().destroy()
+
+class SettingsWindow(PooledWindow):
     def __init__(self, parent):
         super().__init__(parent)
         self.parent = parent
@@ -318,7 +1355,7 @@ class SettingsWindow(tk.Toplevel):
         self.grab_set()
         self.focus_force()
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
-        dimensions = center_window(SCREEN_WIDTH, SCREEN_HEIGHT, 450, 225)
+        dimensions = center_window(self.winfo_screenwidth(), self.winfo_screenheight(), 450, 450)
         self.geometry(dimensions)
         self.create_widgets()
         self.create_layout()
@@ -326,23 +1363,42 @@ class SettingsWindow(tk.Toplevel):
     def create_widgets(self):
         self.title_label = ttk.Label(self, text=lang.trn.get("settings"), font=("Helvetica", 16))
         self.language_label = ttk.Label(self, text=lang.trn.get("language_label"))
+        self.language_names = I18N.language_names()
         self.language_var = tk.StringVar()
-        self.language_var.set(lang.trn.get("language"))
-        self.language_combobox = ttk.Combobox(self, textvariable=self.language_var, values=['English', 'Türkçe'], state='readonly')
+        self.language_var.set(self.language_names[lang.lang])
+        self.language_combobox = ttk.Combobox(self, textvariable=self.language_var, values=list(self.language_names.values()), state='readonly')
         self.theme_label = ttk.Label(self, text=lang.trn.get("theme"))
         self.theme_var = tk.StringVar()
         self.theme_var.set(self.parent.style.theme_use())
         self.font_size_label = ttk.Label(self, text=lang.trn.get("font_size"))
         self.font_size_var = tk.StringVar()
-        self.font_size_var.set(str(DatabaseCRUD.get_font_size()))
+        self.font_size_var.set(str(settings.get("font_size")))
         self.font_family_label = ttk.Label(self, text=lang.trn.get("font_family"))
         self.font_family_var = tk.StringVar()
-        self.font_family_var.set(str(DatabaseCRUD.get_font_family()))
+        self.font_family_var.set(str(settings.get("font_family")))
         self.theme_combobox = ttk.Combobox(self, textvariable=self.theme_var, values=THEMES, state='readonly')
         self.font_size_combobox = ttk.Combobox(self, textvariable=self.font_size_var, values=['10', '12', '14', '16', '18', '20'])
         self.font_family_combobox = ttk.Combobox(self, textvariable=self.font_family_var, values=['Helvetica', 'Arial', 'Times New Roman', 'Courier New'], state='readonly')
+        self.profile_label = ttk.Label(self, text=lang.trn.get("performance_profile"))
+        self.profile_names = {name: lang.trn.get(f"profile_{name}") for name in ConnectionManager.PROFILES}
+        self.profile_var = tk.StringVar()
+        self.profile_var.set(self.profile_names.get(settings.get("performance_profile"), settings.get("performance_profile")))
+        self.profile_combobox = ttk.Combobox(self, textvariable=self.profile_var, values=list(self.profile_names.values()), state='readonly')
+        self.measure_button = ttk.Button(self, text=lang.trn.get("measure_profiles"), command=self.handle_measure_button, bootstyle='secondary-outline')
+        self.backup_interval_label = ttk.Label(self, text=lang.trn.get("automatic_backup"))
+        self.backup_interval_names = {hours: lang.trn.get(key) for hours, key in BACKUP_INTERVALS.items()}
+        self.backup_interval_var = tk.StringVar()
+        self.backup_interval_combobox = ttk.Combobox(self, textvariable=self.backup_interval_var, values=list(self.backup_interval_names.values()), state='readonly')
+        self.backup_keep_label = ttk.Label(self, text=lang.trn.get("backups_to_keep"))
+        self.backup_keep_var = tk.StringVar()
+        self.backup_keep_combobox = ttk.Combobox(self, textvariable=self.backup_keep_var, values=['1', '3', '5', '10', '20'])
+        self.backup_location_label = ttk.Label(self, text=lang.trn.get("backup_folder"))
+        self.backup_location_button = ttk.Button(self, command=self.handle_backup_location_button, bootstyle='secondary-outline')
+        self.backup_now_button = ttk.Button(self, text=lang.trn.get("backup_now"), command=self.handle_backup_now_button, bootstyle='info')
+        self.restore_button = ttk.Button(self, text=lang.trn.get("restore_backup"), command=self.handle_restore_button, bootstyle='warning')
         self.save_button = ttk.Button(self, text=lang.trn.get("save"), command=self.handle_save_button)
         self.cancel_button = ttk.Button(self, text=lang.trn.get("cancel"), command=self.on_closing, bootstyle='secondary')
+        self.show_backup_settings()
     
     def create_layout(self):
         self.grid_columnconfigure(0, weight=1)
@@ -356,53 +1412,146 @@ class SettingsWindow(tk.Toplevel):
         self.font_size_combobox.grid(row=3, column=1, sticky='ew', padx=20)
         self.font_family_label.grid(row=4, column=0, sticky='w', padx=20)
         self.font_family_combobox.grid(row=4, column=1, sticky='ew', padx=20)
-        self.save_button.grid(row=5, column=0, sticky='we', padx=5, pady=20)
-        self.cancel_button.grid(row=5, column=1, sticky='we', padx=5, pady=20)
+        self.profile_label.grid(row=5, column=0, sticky='w', padx=20)
+        self.profile_combobox.grid(row=5, column=1, sticky='ew', padx=20)
+        self.measure_button.grid(row=6, column=1, sticky='ew', padx=20, pady=(5,0))
+        self.backup_interval_label.grid(row=7, column=0, sticky='w', padx=20, pady=(15,0))
+        self.backup_interval_combobox.grid(row=7, column=1, sticky='ew', padx=20, pady=(15,0))
+        self.backup_keep_label.grid(row=8, column=0, sticky='w', padx=20)
+        self.backup_keep_combobox.grid(row=8, column=1, sticky='ew', padx=20)
+        self.backup_location_label.grid(row=9, column=0, sticky='w', padx=20)
+        self.backup_location_button.grid(row=9, column=1, sticky='ew', padx=20)
+        self.backup_now_button.grid(row=10, column=0, sticky='we', padx=5, pady=(10,0))
+        self.restore_button.grid(row=10, column=1, sticky='we', padx=5, pady=(10,0))
+        self.save_button.grid(row=11, column=0, sticky='we', padx=5, pady=20)
+        self.cancel_button.grid(row=11, column=1, sticky='we', padx=5, pady=20)
+
+    # run the same workload under every profile on this machine (takes a while) and show the rates
+    def handle_measure_button(self):
+        self.measure_button.config(state=DISABLED)
+        from profile_benchmark import run_profile_benchmark
+        benchmark_worker.call(self, run_profile_benchmark, callback=self.show_profile_results,
+                              on_error=lambda error: self.show_profile_results(None), busy=True)
+
+    def show_profile_results(self, results):
+        self.measure_button.config(state=NORMAL)
+        if results is None:
+            messagebox.showerror("Error", lang.trn.get("measure_failed"), parent=self)
+            return
+        from profile_benchmark import format_results
+        messagebox.showinfo(lang.trn.get("performance_profile"), format_results(results), parent=self)
+
+    # backup fields as currently saved; the folder button shows the directory in use
+    def show_backup_settings(self):
+        interval = settings.get("backup_interval")
+        self.backup_interval_var.set(self.backup_interval_names.get(interval, self.backup_interval_names[0]))
+        self.backup_keep_var.set(str(settings.get("backup_keep")))
+        self.backup_location = settings.get("backup_location")
+        from backup import backup_directory
+        self.backup_location_button.config(text=backup_directory(DatabaseCRUD.DB_NAME, self.backup_location))
+
+    def handle_backup_location_button(self):
+        from backup import backup_directory
+        directory = filedialog.askdirectory(parent=self, initialdir=backup_directory(DatabaseCRUD.DB_NAME, self.backup_location))
+        if directory:
+            self.backup_location = directory
+            self.backup_location_button.config(text=directory)
+
+    def handle_backup_now_button(self):
+        self.parent.start_backup(notify=True)
+
+    def handle_restore_button(self):
+        from backup import backup_directory
+        path = filedialog.askopenfilename(parent=self, initialdir=backup_directory(DatabaseCRUD.DB_NAME, settings.get("backup_location")),
+                                          filetypes=[("SQLite", "*.db"), ("All files", "*.*")])
+        if not path or not messagebox.askyesno(lang.trn.get("restore_backup"), lang.trn.get("restore_confirm"), parent=self):
+            return
+        # closes this window too
+        self.parent.start_restore(path)
 
     def handle_save_button(self):
-        global lang 
         self.grab_release()
-        if self.language_var.get() == "Türkçe":
-            lang = I18N("tr")
-            DatabaseCRUD.save_language("tr")
-        elif self.language_var.get() == "English":
-            lang = I18N("en")
-            DatabaseCRUD.save_language("en")
-        else:
-            lang = I18N("en") # default language is English
-            DatabaseCRUD.save_language("en")
+        language_codes = {name: code for code, name in self.language_names.items()}
+        language = language_codes.get(self.language_var.get(), "en") # default language is English
         try:
             font_size = int(self.font_size_var.get())
         except:
             messagebox.showerror("Error", lang.trn.get("failed_font_size"))
-            font_size = DatabaseCRUD.get_font_size()
+            font_size = settings.get("font_size")
+        try:
+            backup_keep = int(self.backup_keep_var.get())
+        except ValueError:
+            messagebox.showerror("Error", lang.trn.get("failed_backup_keep"))
+            backup_keep = settings.get("backup_keep")
+        backup_intervals = {name: hours for hours, name in self.backup_interval_names.items()}
+        profiles = {label: name for name, label in self.profile_names.items()}
 
-        font_family = self.font_family_var.get()
-        theme = self.theme_var.get()
-        success_font_size = DatabaseCRUD.save_font_size(font_size)
-        if not success_font_size:
-            messagebox.showerror("Error", lang.trn.get("failed_font_size"))
-        success_font_family = DatabaseCRUD.save_font_family(font_family)
-        if not success_font_family:
-            messagebox.showerror("Error", lang.trn.get("failed_font_family"))
-        success_theme = DatabaseCRUD.save_theme(theme)
-        if not success_theme:
-            messagebox.showerror("Error", lang.trn.get("failed_theme"))
-        if success_font_size and success_font_family and success_theme:
+        # one transaction for all fields, open windows re-style through their listeners
+        changes = settings.changes(language=language, font_size=font_size,
+                                   font_family=self.font_family_var.get(), theme=self.theme_var.get(),
+                                   backup_interval=backup_intervals.get(self.backup_interval_var.get(), 0),
+                                   backup_keep=backup_keep, backup_location=self.backup_location,
+                                   performance_profile=profiles.get(self.profile_var.get(), settings.get("performance_profile")))
+        self.save_button.config(state=DISABLED)
+        db_worker.call(self, DatabaseCRUD.save_settings, changes,
+                       callback=lambda success: self.handle_saved(success, changes), busy=True)
+
+    def handle_saved(self, success, changes):
+        if success:
+            settings.apply(changes)
             messagebox.showinfo(lang.trn.get("success"), lang.trn.get("settings_saved_successfully"))
-        self.parent.update_translations()
-        try:
-            self.parent.style.theme_use(theme)
-        except:
-            pass # addressing occasional bug upon second theme change
-        self.destroy()
+        else:
+            messagebox.showerror("Error", lang.trn.get("failed_settings"))
+        self.hide()
+
+    # show the settings as they are now, not as they were left the last time
+    def reset(self):
+        self.language_var.set(self.language_names[lang.lang])
+        self.theme_var.set(self.parent.style.theme_use())
+        self.font_size_var.set(str(settings.get("font_size")))
+        self.font_family_var.set(str(settings.get("font_family")))
+        self.profile_var.set(self.profile_names.get(settings.get("performance_profile"), settings.get("performance_profile")))
+        self.show_backup_settings()
+        self.save_button.config(state=NORMAL)
 
     def open_window(self):
         self.mainloop()
 
     def on_closing(self):
-        self.grab_release()
-        self.destroy()
+        self.hide()
+
+def main(argv=None):
+    global lang
+    profile = StartupProfile(StartupProfile.requested(argv), started=IMPORT_STARTED)
+    profile.mark("imports")
+    # backups, instrumentation, similar notes and the profile benchmark are imported by the
+    # handlers that use them, so none of them adds to the time before the first window
+    if os.environ.get("NOTES_DB_INSTRUMENT") == "1":
+        from instrumentation import configure_from_environment
+        configure_from_environment(DatabaseCRUD)
+    # None when an upgrade has large data updates left, the main window runs them in the background
+    upgraded = DatabaseCRUD.initialize_database(backfill=False)
+    profile.mark("database schema")
+    settings.load()
+    DatabaseCRUD.set_performance_profile(settings.get("performance_profile"))
+    profile.mark("settings")
+    lang = I18N(settings.get("language"))
+    profile.mark("translations")
+    root = MainWindow()
+    if upgraded is None:
+        root.start_migration()
+    profile.mark("main window")
+    if WindowPool.requested(argv):
+        root.windows.add_listener(WindowPool.report)
+    if profile.enabled:
+        def first_map(event):
+            if event.widget is root:
+                root.unbind("<Map>", bind_id)
+                profile.mark("first map")
+                profile.report()
+        bind_id = root.bind("<Map>", first_map, add="+")
+    root.open_window()
+    root.stop_background_work()
 
-root = MainWindow()
-root.open_window()
+if __name__ == "__main__":
+    main(sys.argv)
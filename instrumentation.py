@@ -0,0 +1,211 @@
+import atexit
+import csv
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from connection import ConnectionManager
+
+# upper bounds of the latency histogram buckets, the last bucket counts everything slower
+HISTOGRAM_BOUNDS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+# at most this many SQL statements are kept for one slow call
+MAX_STATEMENTS_PER_CALL = 50
+
+class MethodStats:
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+
+    def add(self, elapsed_ms, rows):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += rows
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    # upper bound of the bucket holding the given percentile
+    def percentile_ms(self, fraction):
+        target = self.calls * fraction
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return HISTOGRAM_BOUNDS_MS[index] if index < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return 0.0
+
+# rows returned by a call: list length, 1 for a single row (dictionary), otherwise 0
+def result_rows(result):
+    if isinstance(result, list):
+        return len(result)
+    if isinstance(result, dict):
+        return 1
+    return 0
+
+# opt-in timing of every public DatabaseCRUD method; while disabled the class is left untouched
+class QueryInstrumentation:
+    def __init__(self, slow_threshold_ms=100, max_slow_calls=200):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.enabled = False
+        self.stats = {}
+        self.slow_calls = deque(maxlen=max_slow_calls)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.originals = {}
+        self.target = None
+
+    def enable(self, target):
+        if self.enabled:
+            return
+        self.target = target
+        for name, attribute in list(vars(target).items()):
+            func = attribute.__func__ if isinstance(attribute, staticmethod) else attribute
+            if name.startswith("_") or not inspect.isfunction(func):
+                continue
+            self.originals[name] = attribute
+            wrap = self.wrap_generator if inspect.isgeneratorfunction(func) else self.wrap
+            setattr(target, name, staticmethod(wrap(name, func)))
+        ConnectionManager.set_trace_callback(self.trace)
+        self.enabled = True
+
+    def disable(self):
+        if not self.enabled:
+            return
+        for name, attribute in self.originals.items():
+            setattr(self.target, name, attribute)
+        self.originals = {}
+        ConnectionManager.set_trace_callback(None)
+        self.enabled = False
+
+    def reset(self):
+        with self.lock:
+            self.stats = {}
+            self.slow_calls.clear()
+
+    def wrap(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            outer = getattr(self.local, "statements", None)
+            statements = []
+            self.local.statements = statements
+            start = time.perf_counter()
+            result = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                self.local.statements = outer
+                if outer is not None:
+                    outer.extend(statements[:MAX_STATEMENTS_PER_CALL - len(outer)])
+                self.record(name, elapsed_ms, result_rows(result), statements)
+        return wrapper
+
+    # generators (iter_notes, iter_note_content) are timed from the first item until they are
+    # exhausted or closed, with one row per item; SQL is only collected while the generator
+    # runs, not while the caller handles an item
+    def wrap_generator(self, name, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            statements = []
+            rows = 0
+            start = time.perf_counter()
+            iterator = func(*args, **kwargs)
+            try:
+                while True:
+                    outer = getattr(self.local, "statements", None)
+                    collected = len(statements)
+                    self.local.statements = statements
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                    finally:
+                        self.local.statements = outer
+                        if outer is not None:
+                            outer.extend(statements[collected:][:MAX_STATEMENTS_PER_CALL - len(outer)])
+                    rows += 1
+                    yield item
+            finally:
+                iterator.close()
+                self.record(name, (time.perf_counter() - start) * 1000, rows, statements)
+        return wrapper
+
+    # sqlite3 trace callback: collects the SQL run by the instrumented call on this thread,
+    # the "-- ..." statements SQLite runs internally for virtual tables are skipped
+    def trace(self, statement):
+        statements = getattr(self.local, "statements", None)
+        if statements is not None and len(statements) < MAX_STATEMENTS_PER_CALL and not statement.startswith("--"):
+            statements.append(statement)
+
+    def record(self, name, elapsed_ms, rows, statements):
+        with self.lock:
+            self.stats.setdefault(name, MethodStats()).add(elapsed_ms, rows)
+            if elapsed_ms >= self.slow_threshold_ms:
+                self.slow_calls.append({
+                    'method': name,
+                    'elapsed_ms': round(elapsed_ms, 3),
+                    'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                    'statements': [statement.strip() for statement in statements],
+                })
+
+    # one dictionary per method, slowest total time first
+    def snapshot(self):
+        with self.lock:
+            rows = [{
+                'method': name,
+                'calls': stats.calls,
+                'total_ms': round(stats.total_ms, 3),
+                'mean_ms': round(stats.total_ms / stats.calls, 3) if stats.calls else 0.0,
+                'p95_ms': stats.percentile_ms(0.95),
+                'max_ms': round(stats.max_ms, 3),
+                'rows': stats.rows,
+                'histogram': dict(zip([f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"], stats.buckets)),
+            } for name, stats in self.stats.items()]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def dump_json(self, path):
+        with self.lock:
+            slow_calls = list(self.slow_calls)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({'methods': self.snapshot(), 'slow_calls': slow_calls}, f, indent=2)
+
+    def dump_csv(self, path):
+        columns = ['method', 'calls', 'total_ms', 'mean_ms', 'p95_ms', 'max_ms', 'rows']
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.snapshot())
+
+    # .csv paths get the per-method table, anything else the full JSON report
+    def dump(self, path):
+        if path.lower().endswith(".csv"):
+            self.dump_csv(path)
+        else:
+            self.dump_json(path)
+
+instrumentation = QueryInstrumentation()
+
+# NOTES_DB_INSTRUMENT=1 turns instrumentation on, NOTES_DB_SLOW_MS sets the slow-call
+# threshold and NOTES_DB_STATS=<file.json|file.csv> writes the stats at exit
+def configure_from_environment(target):
+    if os.environ.get("NOTES_DB_INSTRUMENT") != "1":
+        return
+    if os.environ.get("NOTES_DB_SLOW_MS"):
+        instrumentation.slow_threshold_ms = float(os.environ["NOTES_DB_SLOW_MS"])
+    instrumentation.enable(target)
+    stats_path = os.environ.get("NOTES_DB_STATS")
+    if stats_path:
+        atexit.register(instrumentation.dump, stats_path)
@@ -1,17 +1,72 @@
-import glob
+import os
+from collections import ChainMap
+
+LANGUAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "languages")
+FALLBACK_LANGUAGE = "en"
+
+# parse a .lang file of key=value lines; values may contain "=" themselves
+def parse_catalog(path):
+    catalog = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key, separator, value = line.partition("=")
+            if separator:
+                catalog[key.strip()] = value.strip()
+    return catalog
+
+# parsed catalogs kept in memory, a file is only parsed again if its mtime changed
+class CatalogCache:
+    def __init__(self, directory=LANGUAGES_DIR):
+        self.directory = directory
+        self.catalogs = {}
+        self.languages = None
+
+    def path(self, lang):
+        return os.path.join(self.directory, f"{lang}.lang")
+
+    def available(self):
+        if self.languages is None:
+            self.languages = sorted(name[:-len(".lang")] for name in os.listdir(self.directory) if name.endswith(".lang"))
+        return self.languages
+
+    def get(self, lang):
+        path = self.path(lang)
+        mtime = os.stat(path).st_mtime_ns
+        cached = self.catalogs.get(lang)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        catalog = parse_catalog(path)
+        self.catalogs[lang] = (mtime, catalog)
+        return catalog
 
 class I18N:
+    catalogs = CatalogCache()
+
     def __init__(self, lang):
-        if lang in self.get_available_languages():
-            self.trn = self.load_data_from_file(lang)
-        else:
+        self.set_language(lang)
+
+    # switch languages in place; keys missing from lang fall back to English
+    def set_language(self, lang):
+        if lang not in self.get_available_languages():
             raise NotImplementedError("Language not supported")
+        self.lang = lang
+        if lang == FALLBACK_LANGUAGE:
+            self.trn = ChainMap(self.load_data_from_file(lang))
+        else:
+            self.trn = ChainMap(self.load_data_from_file(lang), self.load_data_from_file(FALLBACK_LANGUAGE))
 
     @staticmethod
     def load_data_from_file(lang):
-        with open(f"languages/{lang}.lang", "r", encoding="utf-8") as f:
-            return dict([x.strip().split("=") for x in f.readlines()])
+        return I18N.catalogs.get(lang)
 
     @staticmethod
     def get_available_languages():
-        return [x.split("/")[1].split(".")[0] for x in glob.glob("languages/*.lang")]
+        return I18N.catalogs.available()
+
+    # language code -> display name, taken from each catalog's "language" key
+    @staticmethod
+    def language_names():
+        return {code: I18N.load_data_from_file(code).get("language", code) for code in I18N.get_available_languages()}
@@ -0,0 +1,42 @@
+# upgrade a database to the current schema version, or estimate how long that takes
+# usage: python migrate.py [--db notes.db] [--dry-run] [--batch-size 5000] [--sample-batches 3]
+import argparse
+import time
+
+from database import DatabaseCRUD
+
+def print_progress(migration, backfill, done, total):
+    print(f"\rversion {migration.version} {backfill.name}: {done}/{total} rows", end="")
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate the notes database")
+    parser.add_argument("--db", default=DatabaseCRUD.DB_NAME)
+    parser.add_argument("--dry-run", action="store_true", help="time the pending steps and roll them back")
+    parser.add_argument("--batch-size", type=int, default=DatabaseCRUD.MIGRATION_BATCH)
+    parser.add_argument("--sample-batches", type=int, default=3, help="backfill chunks timed per step in a dry run")
+    args = parser.parse_args()
+
+    DatabaseCRUD.DB_NAME = args.db
+    DatabaseCRUD.MIGRATION_BATCH = args.batch_size
+    migrator = DatabaseCRUD.migrator()
+    version = migrator.current_version()
+    if version is None:
+        raise SystemExit(1)
+    print(f"schema version {version}, current is {migrator.latest_version}")
+    if args.dry_run:
+        timings = migrator.estimate(args.sample_batches)
+        if timings is None:
+            raise SystemExit(1)
+        for timing in timings:
+            rows = "" if timing['rows'] is None else f"{timing['rows']} rows"
+            print(f"{timing['version']:>4}  {timing['phase']:<12}{rows:>14}{timing['estimated']:>10.1f}s")
+        print(f"estimated total: {sum(timing['estimated'] for timing in timings):.1f}s")
+        return
+    start = time.perf_counter()
+    if not migrator.upgrade(print_progress):
+        print()
+        raise SystemExit(1)
+    print(f"\nupgraded to version {migrator.current_version()} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import sqlite3
+import threading
+import time
+
+# one step of the schema history, applied to databases whose PRAGMA user_version is below
+# `version`: schema(cursor) runs in one transaction, then every backfill chunk by chunk,
+# then finish(cursor) in the transaction that records the new version
+class Migration:
+    def __init__(self, version, name, schema=None, backfills=(), finish=None):
+        self.version = version
+        self.name = name
+        self.schema = schema
+        self.backfills = list(backfills)
+        self.finish = finish
+
+# a data update too large for one transaction, run over `table` in id ranges of up to
+# batch_size rows; statement gets the range as (last id excluded, last id included),
+# before and after are statements run around every chunk (e.g. dropping a trigger)
+class Backfill:
+    def __init__(self, name, table, statement, before=(), after=()):
+        self.name = name
+        self.table = table
+        self.statement = statement
+        self.before = list(before)
+        self.after = list(after)
+
+# applies pending migrations in version order; several processes can upgrade the same file,
+# every transaction re-checks the version and where the backfills stopped
+class Migrator:
+    # the schema step and the last committed chunk of each backfill of unfinished migrations,
+    # so an interrupted upgrade resumes where it stopped
+    PROGRESS_TABLE = '''
+        CREATE TABLE IF NOT EXISTS migration_progress (
+            version INTEGER NOT NULL,
+            task TEXT NOT NULL,
+            last_id INTEGER NOT NULL,
+            PRIMARY KEY (version, task)
+        )
+    '''
+    SCHEMA_TASK = ':schema'
+
+    # connect() returns the shared connection (or None) and holds it until release() is called
+    def __init__(self, migrations, connect, release, batch_size=5000):
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+        self.connect = connect
+        self.release = release
+        self.batch_size = batch_size
+
+    @property
+    def latest_version(self):
+        return self.migrations[-1].version if self.migrations else 0
+
+    # PRAGMA user_version of the database, None when it cannot be read
+    def current_version(self):
+        conn = self.connect()
+        if conn:
+            try:
+                return conn.execute('PRAGMA user_version').fetchone()[0]
+            except sqlite3.Error as e:
+                print(f"Error reading schema version: {e}")
+                return None
+            finally:
+                self.release()
+        return None
+
+    # migrations the database has not been through yet
+    def pending(self, version=None):
+        version = self.current_version() if version is None else version
+        if version is None:
+            return []
+        return [migration for migration in self.migrations if migration.version > version]
+
+    # apply every pending migration; progress(migration, backfill, done, total) is called after
+    # each chunk, cancel is a threading.Event checked between chunks
+    # returns True when the schema is current, None when stopped (cancelled, or before the first
+    # chunk with stop_before_backfill) and False on errors
+    def upgrade(self, progress=None, cancel=None, stop_before_backfill=False):
+        version = self.current_version()
+        if version is None:
+            return False
+        for migration in self.pending(version):
+            if not self._run_schema(migration):
+                return False
+            for backfill in migration.backfills:
+                status = self._run_backfill(migration, backfill, progress, cancel, stop_before_backfill)
+                if status is not True:
+                    return status
+            if not self._run_finish(migration):
+                return False
+        return True
+
+    # run upgrade on a background thread, done(result) is called on that thread when it ends
+    def upgrade_in_background(self, progress=None, cancel=None, done=None):
+        def run():
+            result = self.upgrade(progress, cancel)
+            if done:
+                done(result)
+        thread = threading.Thread(target=run, name="database-migration", daemon=True)
+        thread.start()
+        return thread
+
+    # begin a write transaction and tell whether migration still has to be applied,
+    # another process may have finished it while this one waited for the lock
+    def _begin(self, cursor, migration):
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('PRAGMA user_version')
+        return cursor.fetchone()[0] < migration.version
+
+    def _run_schema(self, migration):
+        conn = self.connect()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                if self._begin(cursor, migration):
+                    cursor.execute(self.PROGRESS_TABLE)
+                    cursor.execute('SELECT 1 FROM migration_progress WHERE version = ? AND task = ?',
+                                   (migration.version, self.SCHEMA_TASK))
+                    if cursor.fetchone() is None:
+                        if migration.schema:
+                            migration.schema(cursor)
+                        cursor.execute('INSERT INTO migration_progress (version, task, last_id) VALUES (?, ?, 0)',
+                                       (migration.version, self.SCHEMA_TASK))
+                conn.commit()
+                return True
+            except sqlite3.Error as e:
+                print(f"Error migrating database to version {migration.version} ({migration.name}): {e}")
+                conn.rollback()
+                return False
+            finally:
+                self.release()
+        return False
+
+    def _run_backfill(self, migration, backfill, progress, cancel, stop_before_backfill):
+        done = 0
+        total = None
+        while True:
+            if cancel is not None and cancel.is_set():
+                return None
+            conn = self.connect()
+            if not conn:
+                return False
+            try:
+                cursor = conn.cursor()
+                if not self._begin(cursor, migration):
+                    conn.commit()
+                    return True
+                if total is None:
+                    total = self._remaining(cursor, migration, backfill)
+                if stop_before_backfill and total:
+                    conn.commit()
+                    return None
+                rows = self._run_chunk(cursor, migration, backfill)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error migrating database to version {migration.version} ({migration.name}): {e}")
+                conn.rollback()
+                return False
+            finally:
+                self.release()
+            if not rows:
+                return True
+            done += rows
+            if progress:
+                progress(migration, backfill, min(done, total), total)
+
+    # rows of the backfill's table after the point it stopped at
+    def _remaining(self, cursor, migration, backfill):
+        cursor.execute(f'SELECT count(*) FROM {backfill.table} WHERE id > ?',
+                       (self._last_id(cursor, migration, backfill),))
+        return cursor.fetchone()[0]
+
+    def _last_id(self, cursor, migration, backfill):
+        cursor.execute('SELECT last_id FROM migration_progress WHERE version = ? AND task = ?',
+                       (migration.version, backfill.name))
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    # update the next id range inside the caller's transaction, returns the number of rows in it
+    def _run_chunk(self, cursor, migration, backfill):
+        last_id = self._last_id(cursor, migration, backfill)
+        cursor.execute(f'SELECT count(*), max(id) FROM (SELECT id FROM {backfill.table} WHERE id > ? ORDER BY id LIMIT ?)',
+                       (last_id, self.batch_size))
+        rows, upper = cursor.fetchone()
+        if not rows:
+            return 0
+        for statement in backfill.before:
+            cursor.execute(statement)
+        cursor.execute(backfill.statement, (last_id, upper))
+        for statement in backfill.after:
+            cursor.execute(statement)
+        cursor.execute('INSERT OR REPLACE INTO migration_progress (version, task, last_id) VALUES (?, ?, ?)',
+                       (migration.version, backfill.name, upper))
+        return rows
+
+    def _run_finish(self, migration):
+        conn = self.connect()
+        if conn:
+            try:
+                cursor = conn.cursor()
+                if self._begin(cursor, migration):
+                    if migration.finish:
+                        migration.finish(cursor)
+                    cursor.execute('DELETE FROM migration_progress WHERE version = ?', (migration.version,))
+                    cursor.execute(f'PRAGMA user_version = {migration.version}')
+                conn.commit()
+                return True
+            except sqlite3.Error as e:
+                print(f"Error migrating database to version {migration.version} ({migration.name}): {e}")
+                conn.rollback()
+                return False
+            finally:
+                self.release()
+        return False
+
+    # dry run: time the pending migrations inside one transaction that is rolled back, so the
+    # database is left untouched; backfills run sample_batches chunks and are extrapolated to the
+    # rows left. returns one dictionary per phase: version, name, phase, rows, seconds (measured)
+    # and estimated seconds for the whole phase; None on errors
+    def estimate(self, sample_batches=3):
+        conn = self.connect()
+        if not conn:
+            return None
+        timings = []
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('PRAGMA user_version')
+            version = cursor.fetchone()[0]
+            cursor.execute(self.PROGRESS_TABLE)
+            for migration in self.pending(version):
+                start = time.perf_counter()
+                if migration.schema:
+                    migration.schema(cursor)
+                elapsed = time.perf_counter() - start
+                timings.append(self._timing(migration, 'schema', None, elapsed, elapsed))
+                for backfill in migration.backfills:
+                    remaining = self._remaining(cursor, migration, backfill)
+                    sampled = 0
+                    start = time.perf_counter()
+                    for _ in range(sample_batches):
+                        rows = self._run_chunk(cursor, migration, backfill)
+                        if not rows:
+                            break
+                        sampled += rows
+                    elapsed = time.perf_counter() - start
+                    estimated = elapsed * remaining / sampled if sampled else elapsed
+                    timings.append(self._timing(migration, backfill.name, remaining, elapsed, estimated))
+                start = time.perf_counter()
+                if migration.finish:
+                    migration.finish(cursor)
+                elapsed = time.perf_counter() - start
+                timings.append(self._timing(migration, 'finish', None, elapsed, elapsed))
+            return timings
+        except sqlite3.Error as e:
+            print(f"Error estimating migration: {e}")
+            return None
+        finally:
+            conn.rollback()
+            self.release()
+
+    @staticmethod
+    def _timing(migration, phase, rows, seconds, estimated):
+        return {'version': migration.version, 'name': migration.name, 'phase': phase,
+                'rows': rows, 'seconds': seconds, 'estimated': estimated}
@@ -0,0 +1,77 @@
+import sys
+import threading
+from collections import OrderedDict
+
+# least recently used note records keyed by id, bounded by their size in memory
+# rather than by count, so a few huge notes push out many small ones instead of piling up
+class NoteCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def record_size(note):
+        return sum(sys.getsizeof(value) for value in note.values())
+
+    # a copy of the cached record, or None; counts as a hit or a miss
+    def get(self, note_id):
+        with self.lock:
+            note = self.entries.get(note_id)
+            if note is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(note_id)
+            self.hits += 1
+            return dict(note)
+
+    def put(self, note):
+        with self.lock:
+            self._store(dict(note))
+
+    # write-through for edits: refresh the fields of a cached record, uncached ids are left alone
+    def update(self, note_id, **fields):
+        with self.lock:
+            note = self.entries.get(note_id)
+            if note is not None:
+                self._store(dict(note, **fields))
+
+    def invalidate(self, note_id):
+        with self.lock:
+            self._discard(note_id)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.total_bytes = 0
+
+    # records larger than the whole budget are not cached at all
+    def _store(self, note):
+        size = self.record_size(note)
+        self._discard(note['id'])
+        if size > self.max_bytes:
+            return
+        self.entries[note['id']] = note
+        self.sizes[note['id']] = size
+        self.total_bytes += size
+        while self.total_bytes > self.max_bytes:
+            self._discard(next(iter(self.entries)))
+
+    def _discard(self, note_id):
+        if self.entries.pop(note_id, None) is not None:
+            self.total_bytes -= self.sizes.pop(note_id)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -0,0 +1,94 @@
+import string
+from bisect import bisect_left, insort
+
+from timestamps import format_timestamp
+
+# SQLite's NOCASE folds ASCII letters only, titles are ordered the same way here
+NOCASE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+# list columns that can be sorted on (DatabaseCRUD.SORT_COLUMNS): the note field holding
+# the sort value, as passed back for the next page, and the matching sort key
+SORT_FIELDS = {'title': 'title', 'created': 'date_added', 'edited': 'date_last_edited', 'size': 'size'}
+SORT_KEYS = {
+    'title': lambda note: note['title'].translate(NOCASE),
+    'created': lambda note: note['date_added'],
+    'edited': lambda note: note['date_last_edited'],
+    'size': lambda note: note['size'],
+}
+
+# the rows of a notes list keyed by note id, kept sorted so a single change can be applied
+# to the Listbox in place; display indexes count from the top of the list
+class NoteListModel:
+    def __init__(self, sort_key, descending=False):
+        self.sort_key = sort_key
+        self.descending = descending
+        self.notes = {}
+        # ascending (sort key, id) pairs, read backwards when descending
+        self.keys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, note_id):
+        return note_id in self.notes
+
+    def key(self, note):
+        return (self.sort_key(note), note["id"])
+
+    def display_index(self, position):
+        return len(self.keys) - 1 - position if self.descending else position
+
+    def clear(self):
+        self.notes = {}
+        self.keys = []
+
+    # display index of a note, or None when it is not in the list
+    def index(self, note_id):
+        note = self.notes.get(note_id)
+        if note is None:
+            return None
+        return self.display_index(bisect_left(self.keys, self.key(note)))
+
+    def note_at(self, index):
+        position = len(self.keys) - 1 - index if self.descending else index
+        return self.notes[self.keys[position][1]]
+
+    # add a note, returns the display index it belongs at
+    def insert(self, note):
+        key = self.key(note)
+        insort(self.keys, key)
+        self.notes[note["id"]] = note
+        return self.display_index(bisect_left(self.keys, key))
+
+    # remove a note, returns the display index it had (None when it was not listed)
+    def remove(self, note_id):
+        index = self.index(note_id)
+        if index is None:
+            return None
+        note = self.notes.pop(note_id)
+        del self.keys[bisect_left(self.keys, self.key(note))]
+        return index
+
+    # replace a note whose fields changed, returns (old index or None, new index)
+    def update(self, note):
+        old_index = self.remove(note["id"])
+        return old_index, self.insert(note)
+
+    # Listbox label, the last edit date tells notes with the same title apart
+    @staticmethod
+    def label(note):
+        return f"{note['title']}  ·  {format_timestamp(note['date_last_edited'])}"
+
+    # cell values of a note in the sortable columns
+    @staticmethod
+    def row(note):
+        return (note['title'], format_timestamp(note['date_added']),
+                format_timestamp(note['date_last_edited']), format_size(note['size']))
+
+def format_size(size):
+    if size is None:
+        return ""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024 or unit == "MB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
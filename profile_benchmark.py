@@ -0,0 +1,125 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from compression import register_functions
+from connection import ConnectionManager
+from database import DatabaseCRUD
+from migrations import Migrator
+
+# what each phase of the workload counts
+PHASES = {
+    'commits': "single-note transactions",
+    'bulk insert': "notes inserted in one transaction",
+    'reads': "notes read by id",
+    'list pages': "pages of 100 notes, newest first",
+    'search': "full-text searches",
+}
+
+def make_notes(count, rng):
+    words = ["".join(rng.choice("aeioulmnrstkdp") for _ in range(rng.randint(3, 9))) for _ in range(2000)]
+    notes = []
+    for i in range(count):
+        content = " ".join(rng.choice(words) for _ in range(rng.randint(30, 300)))
+        notes.append((f"note {i} {rng.choice(words)}", content, i * 1000, i * 1000, len(content.encode('utf-8'))))
+    return notes, words
+
+def connect(path, profile):
+    conn = sqlite3.connect(path, timeout=ConnectionManager.BUSY_TIMEOUT)
+    ConnectionManager.apply_profile(conn, profile)
+    register_functions(conn)
+    return conn
+
+def rate(count, start):
+    return count / max(time.perf_counter() - start, 1e-9)
+
+# operations per second of one profile on a fresh database in directory
+def measure_profile(profile, notes, words, commits, reads, directory, seed):
+    rng = random.Random(seed)
+    tmp = tempfile.mkdtemp(prefix="notes-profile-", dir=directory)
+    path = os.path.join(tmp, "profile.db")
+    insert = '''
+        INSERT INTO notes (title, content, codec, date_added, date_last_edited, size)
+        VALUES (?, ?, NULL, ?, ?, ?)
+    '''
+    results = {}
+    try:
+        conn = connect(path, profile)
+        # the real schema, so triggers and indexes cost what they cost in the app
+        if not Migrator(DatabaseCRUD.migrations(), lambda: conn, lambda: None).upgrade():
+            raise sqlite3.DatabaseError("could not create the schema")
+
+        start = time.perf_counter()
+        for note in notes[:commits]:
+            conn.execute(insert, note)
+            conn.commit()
+        results['commits'] = rate(commits, start)
+
+        start = time.perf_counter()
+        conn.executemany(insert, notes[commits:])
+        conn.commit()
+        results['bulk insert'] = rate(len(notes) - commits, start)
+        conn.close()
+
+        # reads start on a new connection, with the page cache (not the OS cache) empty
+        conn = connect(path, profile)
+        start = time.perf_counter()
+        for _ in range(reads):
+            conn.execute('SELECT title, note_text(content, codec) FROM notes WHERE id = ?',
+                         (rng.randint(1, len(notes)),)).fetchone()
+        results['reads'] = rate(reads, start)
+
+        pages = max(1, reads // 100)
+        start = time.perf_counter()
+        for _ in range(pages):
+            conn.execute(f'''
+                SELECT {DatabaseCRUD.LIST_SELECT} FROM notes INDEXED BY idx_notes_last_edited
+                WHERE date_last_edited < ? ORDER BY date_last_edited DESC, id DESC LIMIT 100
+            ''', (rng.randint(0, len(notes)) * 1000,)).fetchall()
+        results['list pages'] = rate(pages, start)
+
+        searches = max(1, reads // 40)
+        start = time.perf_counter()
+        for _ in range(searches):
+            conn.execute('SELECT rowid FROM notes_fts WHERE notes_fts MATCH ? ORDER BY rank LIMIT 50',
+                         (rng.choice(words),)).fetchall()
+        results['search'] = rate(searches, start)
+        conn.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+# run the same workload under every profile, in a temporary database next to the notes
+# database by default so it measures the same disk. profiles take turns for `rounds` rounds
+# and keep their best rate per phase, so background load on the machine skews them less
+# returns {profile: {phase: per second}}, None on errors; progress(done, total) after each run
+def run_profile_benchmark(profiles=None, rounds=3, notes=3000, commits=200, reads=10000, directory=None, seed=0, progress=None):
+    profiles = list(profiles or ConnectionManager.PROFILES)
+    directory = directory or os.path.dirname(os.path.abspath(DatabaseCRUD.DB_NAME))
+    note_rows, words = make_notes(max(notes, commits + 1), random.Random(seed))
+    results = {profile: {} for profile in profiles}
+    for round_number in range(rounds):
+        for i, profile in enumerate(profiles):
+            try:
+                rates = measure_profile(profile, note_rows, words, commits, reads, directory, seed + round_number)
+            except (sqlite3.Error, OSError) as e:
+                print(f"Error measuring profile {profile}: {e}")
+                return None
+            for phase, per_second in rates.items():
+                results[profile][phase] = max(results[profile].get(phase, 0.0), per_second)
+            if progress:
+                progress(round_number * len(profiles) + i + 1, rounds * len(profiles))
+    return results
+
+# one line per profile and phase, with the speed relative to the first profile
+def format_results(results):
+    baseline = next(iter(results.values()))
+    lines = []
+    for profile, rates in results.items():
+        lines.append(profile)
+        for phase, per_second in rates.items():
+            lines.append(f"  {phase:<12}{per_second:>12.0f}/s{per_second / baseline[phase]:>8.2f}x")
+    return "\n".join(lines)
@@ -0,0 +1,32 @@
+# one-off: rewrite the note contents of an existing database with another codec
+# usage: python recompress.py [--db notes.db] [--codec zlib|lzma|none] [--threshold 4096]
+import argparse
+
+from compression import CODECS
+from database import DatabaseCRUD
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompress note contents")
+    parser.add_argument("--db", default=DatabaseCRUD.DB_NAME)
+    parser.add_argument("--codec", choices=sorted(CODECS) + ["none"], default=DatabaseCRUD.COMPRESSION_CODEC)
+    parser.add_argument("--threshold", type=int, default=DatabaseCRUD.COMPRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    DatabaseCRUD.DB_NAME = args.db
+    if not DatabaseCRUD.initialize_database():
+        raise SystemExit(1)
+    codec = None if args.codec == "none" else args.codec
+    rewritten = DatabaseCRUD.recompress_notes(codec, args.threshold,
+                                              progress=lambda last_id, count: print(f"\rup to note {last_id}: {count} rewritten", end=""))
+    print()
+    if rewritten is False:
+        raise SystemExit(1)
+    conn = DatabaseCRUD._get_connection()
+    try:
+        conn.execute("VACUUM")
+    finally:
+        DatabaseCRUD._release_connection()
+    print(f"Rewrote {rewritten} notes")
+
+if __name__ == "__main__":
+    main()
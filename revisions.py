@@ -0,0 +1,52 @@
+import json
+import zlib
+
+# a new keyframe is stored after this many deltas, or when a delta stops being small
+KEYFRAME_INTERVAL = 20
+MAX_DELTA_RATIO = 0.5
+# difflib is quadratic in the worst case, bigger texts are always stored in full
+MAX_DELTA_LINES = 20000
+
+def pack_text(text):
+    return zlib.compress(text.encode("utf-8"))
+
+def unpack_text(data):
+    return zlib.decompress(data).decode("utf-8")
+
+# line-based delta turning base into text: ["=", start, end] copies base lines, ["+", lines] inserts
+# difflib is imported here, only edits of notes with history need it
+def make_delta(base, text):
+    import difflib
+    base_lines = base.splitlines(keepends=True)
+    lines = text.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, base_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif j2 > j1:
+            ops.append(["+", lines[j1:j2]])
+    return zlib.compress(json.dumps(ops, separators=(",", ":")).encode("utf-8"))
+
+def apply_delta(base, delta):
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(zlib.decompress(delta)):
+        if op[0] == "=":
+            parts.extend(base_lines[op[1]:op[2]])
+        else:
+            parts.extend(op[1])
+    return "".join(parts)
+
+# decide how to store text given the note's latest keyframe
+# returns ("full", packed text) or ("delta", packed delta)
+def encode_revision(text, keyframe_text, deltas_since_keyframe):
+    full = pack_text(text)
+    if keyframe_text is None or deltas_since_keyframe >= KEYFRAME_INTERVAL:
+        return "full", full
+    if text.count("\n") > MAX_DELTA_LINES or keyframe_text.count("\n") > MAX_DELTA_LINES:
+        return "full", full
+    delta = make_delta(keyframe_text, text)
+    if len(delta) > len(full) * MAX_DELTA_RATIO:
+        return "full", full
+    return "delta", delta
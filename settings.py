@@ -0,0 +1,53 @@
+from connection import ConnectionManager
+from database import DatabaseCRUD
+
+# in-memory snapshot of the settings row, loaded once and saved in one transaction
+class SettingsStore:
+    DEFAULTS = {'font_size': 12, 'font_family': 'Helvetica', 'language': 'en', 'theme': 'superhero',
+                'backup_interval': 0, 'backup_keep': 5, 'backup_location': None,
+                'performance_profile': ConnectionManager.DEFAULT_PROFILE}
+
+    def __init__(self):
+        self.values = dict(self.DEFAULTS)
+        self.listeners = []
+
+    # read the settings row from the database, falling back to defaults
+    def load(self):
+        stored = DatabaseCRUD.get_settings()
+        if stored:
+            self.values.update({key: value for key, value in stored.items() if value is not None})
+        return self.values
+
+    def get(self, key):
+        return self.values[key]
+
+    # write only the fields that changed, then tell listeners what changed
+    def update(self, **new_values):
+        changes = self.changes(**new_values)
+        if not changes:
+            return True
+        if not DatabaseCRUD.save_settings(changes):
+            return False
+        self.apply(changes)
+        return True
+
+    # the subset of new_values that differs from the current snapshot
+    def changes(self, **new_values):
+        return {key: value for key, value in new_values.items() if self.values.get(key) != value}
+
+    # record changes that were already saved and notify listeners
+    def apply(self, changes):
+        self.values.update(changes)
+        for listener in list(self.listeners):
+            listener(changes)
+
+    # listeners are called with a dictionary of the changed fields
+    def subscribe(self, listener):
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+settings = SettingsStore()
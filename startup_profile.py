@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+
+# opt-in per-phase startup timing, enabled with --profile-startup or NOTES_PROFILE_STARTUP=1
+class StartupProfile:
+    def __init__(self, enabled, started=None):
+        self.enabled = enabled
+        self.started = started if started is not None else time.perf_counter()
+        self.last = self.started
+        self.phases = []
+
+    @staticmethod
+    def requested(argv=None):
+        argv = sys.argv if argv is None else argv
+        return "--profile-startup" in argv or os.environ.get("NOTES_PROFILE_STARTUP") == "1"
+
+    # record the time since the previous mark as phase `name`
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, (now - self.last) * 1000))
+        self.last = now
+
+    def report(self, stream=None):
+        if not self.enabled:
+            return
+        stream = stream or sys.stderr
+        print("startup phase                 ms", file=stream)
+        for name, elapsed_ms in self.phases:
+            print(f"{name:<26}{elapsed_ms:>8.1f}", file=stream)
+        print(f"{'time to first window':<26}{(self.last - self.started) * 1000:>8.1f}", file=stream)
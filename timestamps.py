@@ -0,0 +1,31 @@
+import time
+from datetime import datetime
+
+# notes, revisions and drafts store times as integer milliseconds since the Unix epoch,
+# schema versions before 6 stored local-time strings in this format
+LEGACY_FORMAT = '%Y-%m-%d %H:%M:%S'
+DISPLAY_FORMAT = '%Y-%m-%d %H:%M'
+
+def now_ms():
+    return time.time_ns() // 1000000
+
+# epoch milliseconds from an imported or stored value: integers (or their text, as read
+# from CSV) pass through, date strings without a zone are local time; None when unusable
+def to_epoch_ms(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip()
+    if text.lstrip("-").isdigit():
+        return int(text)
+    try:
+        return int(datetime.fromisoformat(text).timestamp() * 1000)
+    except ValueError:
+        return None
+
+# local time for display, empty for a missing value
+def format_timestamp(value, fmt=DISPLAY_FORMAT):
+    if value is None:
+        return ""
+    return datetime.fromtimestamp(value / 1000).strftime(fmt)
@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+import tkinter as tk
+
+# a secondary window that is hidden instead of destroyed, so opening it again only
+# resets its state; subclasses put their per-open setup in reset()
+class PooledWindow(tk.Toplevel):
+    # modal windows take the grab while they are shown
+    modal = True
+
+    def reset(self, *args):
+        pass
+
+    def show(self, *args):
+        self.reset(*args)
+        self.deiconify()
+        if self.modal:
+            self.grab_set()
+        self.focus_force()
+
+    def hide(self):
+        if self.modal:
+            self.grab_release()
+        self.withdraw()
+
+# secondary windows keyed by name, each built on first use and reused afterwards
+# listeners get (key, elapsed_ms, reused) for every open, timed until the window's first idle
+class WindowPool:
+    def __init__(self):
+        self.windows = {}
+        # windows built with an outdated language, rebuilt the next time they are opened hidden
+        self.stale = set()
+        self.listeners = []
+        self.timings = {}
+
+    # opt-in open latency report on stderr, enabled with --profile-windows or NOTES_PROFILE_WINDOWS=1
+    @staticmethod
+    def requested(argv=None):
+        argv = sys.argv if argv is None else argv
+        return "--profile-windows" in argv or os.environ.get("NOTES_PROFILE_WINDOWS") == "1"
+
+    @staticmethod
+    def report(key, elapsed_ms, reused, stream=None):
+        print(f"open {key:<14}{elapsed_ms:>8.1f} ms  {'reused' if reused else 'built'}", file=stream or sys.stderr)
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    # the window for key if it still exists
+    def get(self, key):
+        window = self.windows.get(key)
+        if window is None or not window.winfo_exists():
+            return None
+        return window
+
+    # the window for key if it is currently on screen
+    def visible(self, key):
+        window = self.get(key)
+        if window is None or not window.winfo_viewable():
+            return None
+        return window
+
+    # bring up the window for key: a visible one is raised, a hidden one is shown with args,
+    # otherwise factory(parent, *args) builds it; started is when the user asked for it
+    def open(self, key, factory, parent, *args, started=None):
+        started = time.perf_counter() if started is None else started
+        window = self.visible(key)
+        if window is not None:
+            window.lift()
+            window.focus_force()
+            return window
+        window = self.get(key)
+        if window is not None and key in self.stale:
+            window.destroy()
+            window = None
+        self.stale.discard(key)
+        reused = window is not None
+        if reused:
+            window.show(*args)
+        else:
+            window = factory(parent, *args)
+            self.windows[key] = window
+        window.after_idle(self.record, key, started, reused)
+        return window
+
+    def record(self, key, started, reused):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.timings.setdefault(key, []).append((elapsed_ms, reused))
+        for listener in list(self.listeners):
+            listener(key, elapsed_ms, reused)
+
+    # rebuild every window on its next open, e.g. after the language changed
+    def clear(self):
+        self.stale.update(self.windows)
+
+    # destroy every window, e.g. before the database they show is replaced
+    def close_all(self):
+        for window in self.windows.values():
+            if window.winfo_exists():
+                window.destroy()
+        self.windows.clear()
+        self.stale.clear()